@@ -0,0 +1,78 @@
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+DOCUMENTATION = '''
+    name: host_timing
+    type: aggregate
+    requirements:
+      - enabled in configuration (callbacks_enabled)
+    short_description: Reports the collection time of every host
+    description:
+        - Sums the task time of every host, including its per directory fetch units, and prints the
+          hosts from slowest to fastest at the end of the run, so a slow tool stands out.
+'''
+
+import time
+
+from ansible.plugins.callback import CallbackBase
+
+
+class CallbackModule(CallbackBase):
+    """
+    Reports the collection time of every host
+
+    The fetch units added by playbook.yml carry the name of their host in fetch_host,
+    their time is added to that host.
+    """
+    CALLBACK_VERSION = 2.0
+    CALLBACK_TYPE = 'aggregate'
+    CALLBACK_NAME = 'host_timing'
+    CALLBACK_NEEDS_ENABLED = True
+
+    def __init__(self):
+        super(CallbackModule, self).__init__()
+        # per (host name, task uuid): start time of the running task
+        self.started = {}
+        # per reported host: [task seconds, first start, last end, fetch units, failed]
+        self.hosts = {}
+
+    def report_name(self, host):
+        host_vars = host.get_vars()
+        name = host_vars.get('fetch_host', host.get_name())
+        toolname = host_vars.get('toolname')
+        return f"{name} ({toolname})" if toolname else name
+
+    def v2_runner_on_start(self, host, task):
+        self.started[(host.get_name(), task._uuid)] = time.time()
+
+    def finish(self, result, failed=False):
+        host = result._host
+        start = self.started.pop((host.get_name(), result._task._uuid), None)
+        if start is None:
+            return
+        end = time.time()
+        entry = self.hosts.setdefault(self.report_name(host), [0.0, start, end, set(), False])
+        entry[0] += end - start
+        entry[1] = min(entry[1], start)
+        entry[2] = max(entry[2], end)
+        if 'fetch_host' in host.get_vars():
+            entry[3].add(host.get_name())
+        entry[4] = entry[4] or failed
+
+    def v2_runner_on_ok(self, result):
+        self.finish(result)
+
+    def v2_runner_on_skipped(self, result):
+        self.finish(result)
+
+    def v2_runner_on_failed(self, result, ignore_errors=False):
+        self.finish(result, not ignore_errors)
+
+    def v2_runner_on_unreachable(self, result):
+        self.finish(result, True)
+
+    def v2_playbook_on_stats(self, stats):
+        self._display.banner("HOST TIMING")
+        for name, (busy, first, last, units, failed) in sorted(self.hosts.items(), key=lambda item: -item[1][0]):
+            status = " FAILED" if failed else ""
+            self._display.display(f"{name}: {busy:.2f}s of tasks, {last - first:.2f}s wall, {len(units)} directories{status}")
@@ -0,0 +1,65 @@
+import os
+import sys
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from src.Machines.registry import RUNNERS
+
+
+# Cold starts per runner, the fastest one is reported
+REPEAT = 5
+# Packages reported separately
+PACKAGES = ("numpy", "matplotlib")
+
+
+def importtime(tree, module):
+    """
+    Imports a runner module in a fresh interpreter with -X importtime.
+
+        Parameters
+        ----------
+            tree: str
+                the repository root the interpreter runs in
+            module: str
+                the runner module
+
+        Returns
+        -------
+            dict: the cumulative import time in microseconds of the runner and of the PACKAGES it loaded
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=tree, capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        fields = line[len("import time:"):].split("|")
+        try:
+            cumulative = int(fields[1])
+        except ValueError:
+            continue
+        name = fields[2].strip()
+        if name == module or name in PACKAGES:
+            times[name] = cumulative
+    return times
+
+
+def bench(tree):
+    """
+    Prints the cold import time of every runner in a repository tree.
+    """
+    print(tree)
+    print(f"{'runner':>10} {'total ms':>9} " + " ".join(f"{name + ' ms':>14}" for name in PACKAGES))
+    for machineType, (module, name) in RUNNERS.items():
+        runs = [importtime(tree, module) for _ in range(REPEAT)]
+        best = min(runs, key=lambda times: times[module])
+        packages = " ".join(f"{best[name] / 1000:>14.1f}" if name in best else f"{'-':>14}" for name in PACKAGES)
+        print(f"{machineType:>10} {best[module] / 1000:>9.1f} {packages}")
+
+
+if __name__ == '__main__':
+    # python3 scripts/bench_importtime.py [repository root ...]
+    # e.g. compare with an older version checked out by "git worktree add /tmp/old <commit>"
+    for tree in sys.argv[1:] or [ROOT]:
+        bench(os.path.abspath(tree))
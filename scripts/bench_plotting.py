@@ -0,0 +1,64 @@
+import os
+import sys
+import tempfile
+import timeit
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.renderer import PlotRenderer
+
+
+# Samples per trace, 1 ms logging over 2 min, 10 min and 1 h
+SIZES = (120_000, 600_000, 3_600_000)
+METHODS = ("none", "minmax", "lttb")
+
+
+def layout(fig):
+    """
+    Builds a one axes figure like the run axes of the pressure plot.
+    """
+    ax = fig.subplots(1, 1)
+    fig.set_size_inches(8, 8)
+    line, = ax.plot([], [], 'tab:blue')
+    return [ax], {"run": line}
+
+
+def trace(n):
+    """
+    Returns a pressure like trace: a noisy baseline with a pulse every 1000 samples.
+    """
+    rng = np.random.default_rng(n)
+    x = np.arange(n, dtype=np.float64)
+    y = 0.12 + rng.normal(0, 0.005, n)
+    y[::1000] += 0.1
+    return x, y
+
+
+def bench(n, method, folder):
+    """
+    Returns the seconds to decimate, draw and encode one trace and the size of the PNG file.
+    """
+    renderer = PlotRenderer(workers=1, decimation=method)
+    plot = renderer.acquire(("Bench",), layout)
+    x, y = trace(n)
+    path = os.path.join(folder, f"{method}-{n}.png")
+    start = timeit.default_timer()
+    plot.set_line("run", x, y)
+    plot.rescale()
+    renderer.render(plot, path)
+    return timeit.default_timer() - start, os.path.getsize(path)
+
+
+if __name__ == '__main__':
+    # Run from the repository root: python3 scripts/bench_plotting.py
+    with tempfile.TemporaryDirectory() as folder:
+        # The first figure loads the fonts, keep that out of the timings
+        bench(1000, "none", folder)
+        print(f"{'samples':>10} {'method':>8} {'seconds':>9} {'png KiB':>9} {'speedup':>8}")
+        for n in SIZES:
+            baseline = None
+            for method in METHODS:
+                seconds, size = bench(n, method, folder)
+                if baseline is None:
+                    baseline = seconds
+                print(f"{n:>10} {method:>8} {seconds:>9.3f} {size / 1024:>9.1f} {baseline / seconds:>7.1f}x")
@@ -0,0 +1,75 @@
+import os
+import sys
+import shutil
+import tempfile
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from src.staging import stage_file, METHODS
+
+
+# Sizes of the raw log in MiB, a day of 1 s logging is a few MiB, a long 1 ms run a few hundred
+SIZES = (4, 64, 512)
+# Files staged per size, like the raw logs of a batch
+FILES = 3
+
+
+def raw_log(path, size):
+    """
+    Writes a file of size MiB of pressure log like lines.
+    """
+    line = b"12:00:00.000 - 0.1234567 - 100 - Bench Recipe\n"
+    block = line * (1024 * 1024 // len(line) + 1)
+    with open(path, "wb") as file:
+        for _ in range(size):
+            file.write(block[:1024 * 1024])
+
+
+def used(folder):
+    """
+    Returns the bytes in use on the filesystem of a folder.
+    """
+    stat = os.statvfs(folder)
+    return (stat.f_blocks - stat.f_bfree) * stat.f_frsize
+
+
+def bench(sources, folder, method):
+    """
+    Returns the seconds to stage the sources into a folder, the extra disk space it took and the method that was used.
+    """
+    os.makedirs(folder)
+    os.sync()
+    before = used(folder)
+    start = timeit.default_timer()
+    if method == "shutil.copy2":
+        for source in sources:
+            shutil.copy2(source, folder)
+        placed = method
+    else:
+        for source in sources:
+            placed = stage_file(source, os.path.join(folder, os.path.basename(source)), METHODS[METHODS.index(method):])
+    seconds = timeit.default_timer() - start
+    os.sync()
+    extra = used(folder) - before
+    shutil.rmtree(folder)
+    return seconds, extra, placed
+
+
+if __name__ == '__main__':
+    # python3 scripts/bench_staging.py [folder]
+    # The folder should be on the filesystem of the data folders, the repository root by default
+    with tempfile.TemporaryDirectory(dir=sys.argv[1] if len(sys.argv) > 1 else ROOT) as folder:
+        print(f"{'MiB':>6} {'method':>16} {'used':>16} {'seconds':>9} {'extra MiB':>10} {'speedup':>8}")
+        for size in SIZES:
+            sources = [os.path.join(folder, f"raw-{size}-{i}.txt") for i in range(FILES)]
+            for source in sources:
+                raw_log(source, size)
+            baseline = None
+            for method in ("shutil.copy2",) + METHODS:
+                seconds, extra, placed = bench(sources, os.path.join(folder, "staged"), method)
+                if baseline is None:
+                    baseline = seconds
+                print(f"{size * FILES:>6} {method:>16} {placed:>16} {seconds:>9.4f} {extra / 2 ** 20:>10.1f} {baseline / seconds:>7.1f}x")
+            for source in sources:
+                os.remove(source)
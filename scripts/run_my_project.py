@@ -1,4 +1,5 @@
 import src.main
+from src.watcher import DataWatcher
 import timeit
 import time
 
@@ -39,11 +40,22 @@ if __name__ == '__main__':
     last_logged_time = 0
     cooldown_period = 60  # seconds
 
-    # Run the whole program in a loop
+    # Seconds between collection cycles, and how long new files have to be quiet before processing
+    idle_interval = 30
+    debounce = 10
+    # Seconds between refreshes of the live reports of machines whose runs are still being logged
+    live_interval = 60
+    watcher = DataWatcher(interval=idle_interval, debounce=debounce, live_interval=live_interval)
+
+    # Run the whole program in a loop, only processing machines whose data files changed and settled
     while True:
         try:
             start = timeit.default_timer()
-            src.main.main()
+            src.main.collect()
+            due = watcher.poll()
+            if due:
+                src.main.process(due)
+            src.main.maintain()
             stop = timeit.default_timer()
             print('Whole Loop Runtime: ', stop - start)
         except Exception as e:
@@ -54,4 +66,5 @@ if __name__ == '__main__':
                 logging.error(f"Exception occured: {e}", exc_info=True)
                 last_error = error_message
                 last_logged_time = current_time
-    
\ No newline at end of file
+
+        time.sleep(watcher.interval)
@@ -180,7 +180,7 @@ class SetupGUI:
                         keys = []
                         values = []
                         folder_path = os.path.join('src', 'Machines', realname, f"data({machine_name})")
-                        additional_items = ["Output_Text", "Output_Plots", "Output_Data", "process_stack.txt", "metadata.txt"]
+                        additional_items = ["Output_Text", "Output_Plots", "Output_Data", "metadata.txt"]
                         
                         os.makedirs(folder_path, exist_ok=True)
                         for item in additional_items:
@@ -1,9 +1,16 @@
 import os
+import numpy as np
+from datetime import datetime
 from abc import ABC, abstractmethod
+from src.dir_index import directory_index
+from src.live import LiveRun
 
 
 class Heating_Base(ABC):
 
+    # Layout of the heating logs of the machine (src/log_reader.py), set by every machine
+    logFormat = None
+
     def __init__(self, dataPath):
         # Heater Data (Floats in Celcius) and Time (Float in s)
         self.hTime = []
@@ -51,7 +58,7 @@ class Heating_Base(ABC):
         """
         path = self.heatingDirPath
         try:
-            self.dir_list = os.listdir(path)
+            self.dir_list = directory_index.names(path)
             self.parseTitles()
         except NotADirectoryError:
             print("DIRECTORY NOT FOUND, PROCESS ABORTED AT METHOD: readDir(). \n Hint: Try putting in a valid directory path.")
@@ -112,24 +119,90 @@ class Heating_Base(ABC):
             
             Returns
             -------
-                times[-1][0] (str): the file path of the most recent file
+                newest (str): the file path of the most recent file
         """
-        # tuples of (filename, creation time)
         self.readDir()
-        times = []
-        listFiles = self.dir_list
-        for i in listFiles:
-            filepath = os.path.join(self.heatingDirPath, i)
-            # get creation time
-            times.append((filepath, os.path.getctime(filepath)))
-        if times.__len__() == 0:
+        # newest entry by creation time, shared with every other check of this directory
+        newest = directory_index.newest(self.heatingDirPath)
+        if newest is None:
             print("NO FILES FOUND, PROCESS ABORTED AT METHOD: mostRecent(). \n Hint: Ansible may have trouble copying files.")
             return None
-        # sort by creation time
-        times.sort(key=lambda x: x[1])
-        return times[-1][0]
+        return newest
     
 
+    def parseLog(self, path, span=None):
+        """
+        Parses a heating log with the log format of the machine, used by the run cache when the log is not parsed yet.
+
+            Parameters
+            ----------
+                path: str
+                    the path to the heating log
+                span: tuple
+                    (start, end) byte offsets of the lines to parse, the whole log if None
+
+            Returns
+            -------
+                columns (dict): one array per heater series
+                meta (dict): the recipe name and the other values the log format takes from the log
+        """
+        return self.logFormat.parse(path, span)
+
+
+    def columnMax(self, column):
+        """
+        Helper method that returns the highest value of a column, never less than 0.
+
+            Parameters
+            ----------
+                column: numpy.ndarray
+                    the column of readings
+
+            Returns
+            -------
+                float: the maximum of the column, 0 if it is empty or has no positive value
+        """
+        if column.size == 0:
+            return 0
+        return max(0, float(column.max()))
+
+
+    def columnStats(self, columns):
+        """
+        Helper method that returns the highest and the last reading of every column of a finished
+        run, in the format of LiveRun.stats, so reportLines() reads both kinds of runs the same way.
+
+            Parameters
+            ----------
+                columns: dict
+                    one array per heater series, as returned by parseLog()
+
+            Returns
+            -------
+                dict: per numeric column name, {"max", "last"} of the readings
+        """
+        return {name: {"max": self.columnMax(values), "last": values[-1]}
+                for name, values in columns.items() if values.dtype.kind in "iuf" and values.size}
+
+
+    def columnMean(self, values):
+        """
+        Helper method that returns the average of a column, or of every column of a 2-D block in one reduction.
+        The values are added up in file order (np.cumsum), so the result is the same
+        as summing the readings one by one.
+
+            Parameters
+            ----------
+                values: numpy.ndarray
+                    a column of readings, or a block with one column per series
+
+            Returns
+            -------
+                float: the average of the column (list of floats, one per column, for a block)
+        """
+        return (np.cumsum(values, axis=0)[-1] / values.shape[0]).tolist()
+
+
     def ignoreRecipe(self):
         """
         Helper method that checks if the current recipe is in the ignore list.
@@ -181,6 +254,43 @@ class Heating_Base(ABC):
         """
         self.initialize()
         return self.sendDataRaw()
+
+
+    def runLive(self):
+        """
+        Follows the most recent heating log while it is still being written.
+        Only the lines appended since the last call are parsed into the running statistics,
+        the live report and plots in Live_Output are refreshed every REFRESH_SECONDS.
+
+            Parameters
+            ----------
+                None
+
+            Returns
+            -------
+                True (bool): if the live report and plots were refreshed
+                False (bool): if there was nothing to refresh
+        """
+        self.heatingFilePath = self.mostRecent()
+        if self.heatingFilePath is None or self.ignoreRecipe():
+            return False
+        live = LiveRun(self.dataPath, "Heating")
+        live.update(self.heatingFilePath, self.parseLog)
+        if not live.due():
+            return False
+
+        self.loadColumns(live.series(), live.meta)
+        self.outString = "----------------------------------------------\n\nLIVE HEATING REPORT AT " + datetime.now().strftime("%H:%M:%S") + " ON " + datetime.now().strftime("%m/%d/%Y") + "\n\n----------------------------------------------\n\n"
+        self.outString += "Readings So Far: " + str(live.rows) + "\n\n"
+        self.liveReport(live)
+        self.outString += "Recipe: " + self.recipe + "\n\n----------------------------------------------\n\n"
+        live.write_report("Heating Report.txt", self.outString)
+
+        # Same plots as a finished run, written next to the live report
+        self.plotpath = live.output_path
+        self.plotHeating()
+        live.mark_refreshed()
+        return True
     
 
 
@@ -204,6 +314,66 @@ class Heating_Base(ABC):
         pass
 
 
+    @abstractmethod
+    def loadColumns(self, columns, meta):
+        """
+        Sets the heater arrays and the recipe from parsed columns, of a whole log or of a live run.
+
+            Parameters
+            ----------
+                columns: dict
+                    one array per heater series, as returned by parseLog()
+                meta: dict
+                    the recipe name and other values taken from the log
+
+            Returns
+            -------
+                None
+        """
+        pass
+
+
+    def liveReport(self, live):
+        """
+        Adds the running statistics of a live run to outString, the same lines genReport() writes for a finished run.
+
+            Parameters
+            ----------
+                live: LiveRun
+                    the live run of the heating log
+
+            Returns
+            -------
+                None
+        """
+        completed, total = live.completed_cycles()
+        self.reportLines(live.stats, live.mean, completed, total)
+
+
+    @abstractmethod
+    def reportLines(self, stats, mean, completed, total):
+        """
+        Adds the temperatures, cycles and errors of a run to outString, for a finished run (readFile())
+        and for a live run (liveReport()) alike.
+
+            Parameters
+            ----------
+                stats: dict
+                    per column name, {"max", "last"} of the readings, like LiveRun.stats
+                mean: function
+                    returns the average of a column by name
+                completed: int
+                    the completed cycles
+                total: int
+                    the total cycles of the recipe
+
+            Returns
+            -------
+                None
+        """
+        pass
+
+
     @abstractmethod
     def genReport(self):
         """
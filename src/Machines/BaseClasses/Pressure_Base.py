@@ -1,9 +1,22 @@
 import os
+import numpy as np
+from datetime import datetime
 from abc import ABC, abstractmethod
+from src.dir_index import directory_index
+from src.log_reader import PRESSURE_LOG
+from src.live import LiveRun
+from src.base_pressure import BasePressureStore
+
+
+# Base pressures of the last runs shown on the pressure plot
+BASE_PRESSURE_RUNS = 100
 
 
 class Pressure_Base(ABC):
 
+    # Layout of the pressure logs of the machine, a machine with another layout sets its own
+    logFormat = PRESSURE_LOG
+
     def __init__(self, dataPath):
         """
         Constructor for the Pressure class.
@@ -52,7 +65,7 @@ class Pressure_Base(ABC):
         """
         path = self.pressureDirPath
         try:
-            self.dir_list = os.listdir(path)
+            self.dir_list = directory_index.names(path)
             self.parseTitles()
         except NotADirectoryError:
             print("DIRECTORY NOT FOUND, PROCESS ABORTED AT METHOD: readDir(). \n Hint: Try putting in a valid directory path.")
@@ -87,23 +100,146 @@ class Pressure_Base(ABC):
             #     self.ingredientStack.append("Unknown")
 
     
-    def loadBasePressure(self, file_path):
-        basePressures = []
-        dates = []
-        times = []
-        with open(file_path, "r") as file:
-            for line in file:
-                torr, date, time = line.strip().split()
-                basePressures.append(float(torr))
-                dates.append(date)
-                times.append(time)
-
-            if len(basePressures) > 100:
-                basePressures = basePressures[-100:]
-            file.close()
-        return basePressures, dates, times
+    def parseLog(self, path, span=None):
+        """
+        Parses a pressure log, used by the run cache when the log is not parsed yet.
+
+            Parameters
+            ----------
+                path: str
+                    the path to the pressure log
+                span: tuple
+                    (start, end) byte offsets of the lines to parse, the whole log if None
+
+            Returns
+            -------
+                columns (dict): the pTime, Pressure and cycles arrays
+                meta (dict): the recipe name
+        """
+        return self.logFormat.parse(path, span)
+
+
+    def loadColumns(self, columns, meta):
+        """
+        Sets the pressure arrays and the recipe from parsed columns, of a whole log or of a live run.
+
+            Parameters
+            ----------
+                columns: dict
+                    the pTime, Pressure and cycles arrays
+                meta: dict
+                    the recipe name
+
+            Returns
+            -------
+                None
+        """
+        self.pTime = columns["pTime"]
+        self.Pressure = columns["Pressure"]
+        self.cycles = columns["cycles"]
+        self.recipe = meta["recipe"]
+
+
+    def loadBasePressure(self):
+        """
+        Reads the base pressures of the last BASE_PRESSURE_RUNS runs from the end of the base pressure history.
+
+            Parameters
+            ----------
+                None
+
+            Returns
+            -------
+                basePressures (numpy.ndarray): the base pressures of the last runs, oldest first
+                times (numpy.ndarray): the local time of each of them, seconds since 1970-01-01
+        """
+        times, basePressures = BasePressureStore(self.dataPath).recent(BASE_PRESSURE_RUNS)
+        return basePressures, times
+
+
+    def saveBasePressure(self, basePressure):
+        """
+        Adds the base pressure of this run to the base pressure history of the machine.
+
+            Parameters
+            ----------
+                basePressure: float
+                    the base pressure in Torr
+
+            Returns
+            -------
+                None
+        """
+        BasePressureStore(self.dataPath).append(basePressure)
     
 
+    def layoutPressure(self, fig, rows):
+        """
+        Lays out a pressure figure once, plotting only replaces the line data.
+        With 2 rows: whole run and base pressures, with 3 rows the last 1500ms of the run sit in between.
+
+            Parameters
+            ----------
+                fig: matplotlib.figure.Figure
+                    the new figure
+                rows: int
+                    2 or 3
+
+            Returns
+            -------
+                axes (list): the axes of the figure
+                lines (dict): the "run", "last" (3 rows only) and "base" lines
+        """
+        import matplotlib.dates as mdates
+        ax = fig.subplots(rows, 1)
+        fig.suptitle('Pressure Data')
+        fig.set_size_inches(8, 8)
+        fig.supylabel('Pressure (Torr)')
+        lines = {}
+        lines["run"], = ax[0].plot([], [], 'tab:blue')
+        ax[0].set_xlabel('Time (ms)')
+        if rows == 3:
+            ax[1].set_title('Pressure Last 1500ms')
+            lines["last"], = ax[1].plot([], [], 'tab:orange', linestyle='solid')
+            ax[1].set_xlabel('Time (ms)')
+        base = ax[-1]
+        base.set_title('Base Pressure Last 60 Runs')
+        base.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d %H:%M'))
+        base.xaxis.set_major_locator(mdates.AutoDateLocator())
+        lines["base"], = base.plot([], [], 'tab:red', marker='o', linestyle='-')
+        base.set_xlabel('Date and Time')
+        return list(ax), lines
+
+
+    def fillPressure(self, plot, basePressures, times):
+        """
+        Puts the data of this run and the base pressures into a pressure figure from layoutPressure().
+
+            Parameters
+            ----------
+                plot: PlotTemplate
+                    the figure
+                basePressures: numpy.ndarray
+                    the base pressures of the last runs
+                times: numpy.ndarray
+                    the local time of each base pressure, seconds since 1970-01-01
+
+            Returns
+            -------
+                None
+        """
+        import matplotlib.dates as mdates
+        plot.set_line("run", self.pTime, self.Pressure)
+        if "last" in plot.lines:
+            plot.set_line("last", self.pTime[-1500:], self.Pressure[-1500:])
+        plot.set_line("base", mdates.date2num(times.astype(np.int64).astype("datetime64[s]")), basePressures)
+        plot.rescale()
+        # Apply auto formatting for the x-axis dates only on the base pressure subplot
+        for label in plot.axes[-1].get_xticklabels():
+            label.set_rotation(45)
+            label.set_horizontalalignment('right')
+
+
     def initialize(self):
         """
         Initializes the Pressure Data Stack with the most recent files.
@@ -130,22 +266,15 @@ class Pressure_Base(ABC):
             
             Returns
             -------
-                times[-1][0] (str): the file path of the most recent file
+                newest (str): the file path of the most recent file
         """
-        # tuples of (filename, creation time)
         self.readDir()
-        times = []
-        listFiles = self.dir_list
-        for i in listFiles:
-            filepath = os.path.join(self.pressureDirPath, i)
-            # get creation time
-            times.append((filepath, os.path.getctime(filepath)))
-        if times.__len__() == 0:
+        # newest entry by creation time, shared with every other check of this directory
+        newest = directory_index.newest(self.pressureDirPath)
+        if newest is None:
             print("NO FILES FOUND, PROCESS ABORTED AT METHOD: mostRecent(). \n Hint: Ansible may have trouble copying files.")
             return None
-        # sort by creation time
-        times.sort(key=lambda x: x[1])
-        return times[-1][0]
+        return newest
     
 
     def ignoreRecipe(self):
@@ -199,6 +328,45 @@ class Pressure_Base(ABC):
         """
         self.initialize()
         return self.sendDataRaw()
+
+
+    def runLive(self):
+        """
+        Follows the most recent pressure log while it is still being written.
+        Only the lines appended since the last call are parsed into the running statistics,
+        the live report and plot in Live_Output are refreshed every REFRESH_SECONDS.
+
+            Parameters
+            ----------
+                None
+
+            Returns
+            -------
+                True (bool): if the live report and plot were refreshed
+                False (bool): if there was nothing to refresh
+        """
+        self.pressureFilePath = self.mostRecent()
+        if self.pressureFilePath is None or self.ignoreRecipe():
+            return False
+        live = LiveRun(self.dataPath, "Pressure", "Pressure")
+        live.update(self.pressureFilePath, self.parseLog)
+        if not live.due():
+            return False
+
+        self.loadColumns(live.series(), live.meta)
+        completed, total = live.completed_cycles()
+        self.outString = "----------------------------------------------\n\nLIVE PRESSURE REPORT AT " + datetime.now().strftime("%H:%M:%S") + " ON " + datetime.now().strftime("%m/%d/%Y") + "\n\n----------------------------------------------\n\n"
+        self.outString += "Readings So Far: " + str(live.rows) + "\n\n"
+        self.outString += "Completed Cycles: " + str(completed) + "/" + str(total) + "\n\n"
+        self.outString += "Rolling Base Pressure: " + str(sum(live.recent) / len(live.recent)) + " Torr" + "\n\n"
+        self.outString += "Recipe: " + self.recipe + "\n\n----------------------------------------------\n\n"
+        live.write_report("Pressure Report.txt", self.outString)
+
+        # Same plot as a finished run, written next to the live report
+        self.plotpath = live.output_path
+        self.plotPressure()
+        live.mark_refreshed()
+        return True
     
 
 
@@ -1,17 +1,97 @@
 from datetime import datetime
 import os
-import shutil
-import hashlib
 from abc import ABC, abstractmethod
+from src.Machines.registry import read_register
+from src.checksum import checksum
+from src.renderer import get_renderer
+from src.blob_store import get_blob_store
+from src.archive import write_archive
+from src.parsed_run import remove_sidecar
 
 
+# Refresh the live reports and plots of runs that are still being logged, see src/live.py
+LIVE_ANALYSIS = True
+# Compression of the raw logs uploaded by raw machines, "zstd" or "gzip" to upload one compressed
+# archive per run (see src/archive.py), None to upload the logs as they are
+RAW_COMPRESSION = None
+
 
 class Runner_Base(ABC):
 
     def __init__(self):
         pass
 
+
+    def load_machines(self, machineType, register=None):
+        """
+        Finds all machines of one type in the register and whether each one uploads raw files.
+
+            Parameters
+            -----------
+                machineType: str
+                    the machine type to look for (first column of register.txt)
+                register: list
+                    already parsed register entries, read from register.txt if None
+
+            Returns
+            -------
+                list: the register entries (tuples) for this machine type
+                list: True for each entry that is registered as raw, False otherwise
+        """
+        if register is None:
+            register = read_register()
+        runMachine = []
+        raw = []
+        for m in register:
+            if m[0] == machineType:
+                runMachine.append(m)
+                raw.append(self.is_raw(m))
+        return runMachine, raw
+
+
+    def is_raw(self, machine):
+        """
+        Checks if a machine is registered to upload its raw files instead of processed output.
+
+            Parameters
+            -----------
+                machine: tuple
+                    the register entry of the machine
+
+            Returns
+            -------
+                bool: True if the machine is registered as raw, False otherwise
+        """
+        return "raw" in machine
+
     
+    def run_live(self, channels):
+        """
+        Refreshes the live reports and plots of a machine whose data files are still updating.
+        Each channel only parses the lines appended since the last cycle.
+
+            Parameters
+            -----------
+                channels: tuple
+                    the channel objects of the machine, shared with process()
+
+            Returns
+            -------
+                None
+        """
+        if not LIVE_ANALYSIS:
+            return
+        refreshed = False
+        for channel in channels:
+            try:
+                refreshed = channel.runLive() or refreshed
+            except (OSError, ValueError) as e:
+                # A half copied log is retried next cycle, the finished run is still processed as usual
+                print(f"[WARNING]: Live analysis failed for data path: {channel.dataPath}: {e}")
+        if refreshed:
+            get_renderer().flush()
+
+
     def changeName(self, filepath, append):
         """
         Changes the name of a file by appending a string to the file name.
@@ -36,12 +116,16 @@ class Runner_Base(ABC):
         except:
             print("Error: File not found, Rename failed")
             raise FileNotFoundError("File not found, Rename failed")
+        # The renamed log is not parsed again, drop the sidecar of its old name
+        remove_sidecar(filepath)
         return newpath
     
 
-    def copy_item(self, src, dst):
+    def copy_item(self, src, dst, link=False):
         """
         Copy an item (file or directory) from src to dst.
+        Files are added to the blob store and placed as hard links to their blob,
+        so contents that are already stored take no extra disk space.
         
             Parameters
             -----------
@@ -49,24 +133,49 @@ class Runner_Base(ABC):
                     the path to the source item
                 dst: str
                     the path to the destination item
+                link: bool
+                    True if src is never written again, it is then hard linked into the store instead of copied
 
             Returns
             -------
-                None
+                dict: per placed file path, the checksum of the file
         """
+        store = get_blob_store()
+        placed = {}
         if os.path.isdir(src):
-            try:
-                shutil.copytree(src, dst, dirs_exist_ok=True)
-            except FileNotFoundError as e:
-                raise e
+            for dirpath, dirnames, filenames in os.walk(src):
+                target = os.path.join(dst, os.path.relpath(dirpath, src))
+                os.makedirs(target, exist_ok=True)
+                for filename in filenames:
+                    path = os.path.join(target, filename)
+                    placed[path] = store.put(os.path.join(dirpath, filename), link)
+                    store.link(placed[path], path)
         else:
-            try:
-                shutil.copy2(src, dst)
-            except FileNotFoundError as e:
-                raise e
+            placed[dst] = store.put(src, link)
+            store.link(placed[dst], dst)
+        return placed
+
+
+    def write_manifest(self, dst_folder, placed):
+        """
+        Writes the manifest.json of a new folder in Output_Data, the upload queue reads the
+        checksums from it to skip the files that are already on the remote.
+
+            Parameters
+            -----------
+                dst_folder: str
+                    the path to the new folder
+                placed: dict
+                    per placed file path, the checksum of the file
+
+            Returns
+            -------
+                None
+        """
+        get_blob_store().write_manifest(dst_folder, {os.path.relpath(path, dst_folder): digest for path, digest in placed.items()})
             
     
-    def copy_sources_to_new_folder(self, src_items, base_dst_folder):
+    def copy_sources_to_new_folder(self, src_items, base_dst_folder, link=False):
         """
         Copies the contents of source items (files or folders) to a new folder in base_dst_folder.
         The new folder is named according to the current date and time.
@@ -77,6 +186,9 @@ class Runner_Base(ABC):
                     a list of paths to the source items
                 base_dst_folder: str
                     the path to the base destination folder
+                link: bool
+                    True if the source items are never written again (the renamed raw logs),
+                    they are then staged as hard links and take no extra disk space
 
             Returns
             -------
@@ -89,6 +201,7 @@ class Runner_Base(ABC):
         try:
             # Create destination folder
             os.makedirs(dst_folder, exist_ok=True)
+            placed = {}
             
             # Copy the contents of the source items to the destination folder
             for src in src_items:
@@ -97,7 +210,8 @@ class Runner_Base(ABC):
                 
                 item_name = os.path.basename(src)
                 dst_item = os.path.join(dst_folder, item_name)
-                self.copy_item(src, dst_item)
+                placed.update(self.copy_item(src, dst_item, link))
+            self.write_manifest(dst_folder, placed)
             
             print(f"Contents of {src_items} have been copied to '{dst_folder}'.")
             return dirname
@@ -107,6 +221,39 @@ class Runner_Base(ABC):
             raise e
         
 
+    def stage_raw(self, src_items, base_dst_folder):
+        """
+        Places the renamed raw logs of a run in a new folder in base_dst_folder, named according to
+        the current date and time. With RAW_COMPRESSION set they are packed into one compressed
+        archive, otherwise they are staged as they are.
+
+            Parameters
+            -----------
+                src_items: list
+                    a list of paths to the renamed raw logs
+                base_dst_folder: str
+                    the path to the base destination folder
+
+            Returns
+            -------
+                str: the name of the new folder created
+                list: [bytes of the logs, bytes of the archive], None if they were not compressed
+        """
+        if RAW_COMPRESSION is None:
+            return self.copy_sources_to_new_folder(src_items, base_dst_folder, link=True), None
+        dirname = datetime.now().strftime("%m:%d:%Y") + "~" + datetime.now().strftime("%H:%M")
+        dst_folder = os.path.join(base_dst_folder, dirname)
+        for src in src_items:
+            if not os.path.exists(src):
+                print(f"An error occurred: Source item '{src}' does not exist.")
+                raise FileNotFoundError(f"Source item '{src}' does not exist.")
+        os.makedirs(dst_folder, exist_ok=True)
+        archive, original, compressed = write_archive(src_items, os.path.join(dst_folder, "Raw-Data"), RAW_COMPRESSION)
+        # The archive is never written again, it is linked into the store like the raw logs
+        self.write_manifest(dst_folder, {archive: get_blob_store().put(archive, link=True)})
+        return dirname, [original, compressed]
+
+
     def copy_folder_contents(self, name, src_folder1, src_folder2, base_dst_folder):
         """
         Copies the contents of src_folder1 and src_folder2 to a new folder in base_dst_folder.
@@ -138,26 +285,20 @@ class Runner_Base(ABC):
             
             # Create destination folder
             os.makedirs(dst_folder, exist_ok=True)
+            placed = {}
             
             # Copy the contents of the first source folder to the destination folder
             for item in os.listdir(src_folder1):
                 src_item = os.path.join(src_folder1, item)
                 dst_item = os.path.join(dst_folder, item)
-                
-                if os.path.isdir(src_item):
-                    shutil.copytree(src_item, dst_item, dirs_exist_ok=True)
-                else:
-                    shutil.copy2(src_item, dst_item)
+                placed.update(self.copy_item(src_item, dst_item))
             
             # Copy the contents of the second source folder to the destination folder
             for item in os.listdir(src_folder2):
                 src_item = os.path.join(src_folder2, item)
                 dst_item = os.path.join(dst_folder, item)
-                
-                if os.path.isdir(src_item):
-                    shutil.copytree(src_item, dst_item, dirs_exist_ok=True)
-                else:
-                    shutil.copy2(src_item, dst_item)
+                placed.update(self.copy_item(src_item, dst_item))
+            self.write_manifest(dst_folder, placed)
             
             print(f"Contents of '{src_folder1}' and '{src_folder2}' have been copied to '{dst_folder}'.")
             return dirname
@@ -173,20 +314,19 @@ class Runner_Base(ABC):
         
             Parameters
             -----------
-                file_path: str
+                dataPath: str
                     The path to the file to calculate the checksum for.
 
             Returns
             -------
                 str: The checksum of the file contents.
         """
-        with open(dataPath, 'rb') as file:
-            file_content = file.read()
-            return hashlib.md5(file_content).hexdigest()
+        # Only new bytes of an appended log are hashed, unchanged files are answered from their stat data
+        return checksum(dataPath)
         
 
     @abstractmethod
-    def run(self):
+    def run(self, register=None):
         """
         Runs the algorithms for all machines of this type and uploads the results to the cloud storage.
         Handles checksums, ensures files are matching and new.
@@ -194,7 +334,8 @@ class Runner_Base(ABC):
 
             Parameters
             -----------
-                None
+                register: list
+                    already parsed register entries, read from register.txt if None
             
             Returns
             -------
@@ -203,6 +344,26 @@ class Runner_Base(ABC):
         pass
 
 
+    @abstractmethod
+    def process(self, machine, raw=False):
+        """
+        Runs the algorithms for one machine of this type and uploads the results to the cloud storage.
+        Only touches the files inside that machine's data folder, so different machines can be processed in parallel.
+
+            Parameters
+            -----------
+                machine: tuple
+                    the register entry of the machine
+                raw: bool
+                    True if the raw files are uploaded instead of the processed output
+
+            Returns
+            -------
+                None
+        """
+        pass
+
+
 def main():
     return
 
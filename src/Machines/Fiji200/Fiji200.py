@@ -1,11 +1,13 @@
 from src.Machines.Fiji200.Pressure import Pressure
 from src.Machines.Fiji200.Heating import Heating
 from src.Machines.Fiji200.Plasma import Plasma
-from src.uploader import Uploader
+from src.uploader import get_upload_queue
 
 import timeit
 import os
 from src.Machines.BaseClasses.Runner_Base import Runner_Base
+from src.stability import get_tracker
+from src.renderer import get_renderer
 
 
 class Fiji200(Runner_Base):
@@ -20,18 +22,24 @@ class Fiji200(Runner_Base):
     -------
     changeName(filepath, append):
         Changes the name of a file, specifically for renaming raw files.
-    copy_item(src, dst):
+    copy_item(src, dst, link=False):
         Copy an item (file or directory) from src to dst.
-    copy_sources_to_new_folder(src_items, base_dst_folder):
+    copy_sources_to_new_folder(src_items, base_dst_folder, link=False):
         Copies the contents of source items (files or folders) to a new folder in base_dst_folder.
+    stage_raw(src_items, base_dst_folder):
+        Places the renamed raw logs of a run in a new folder, compressed into one archive if RAW_COMPRESSION is set.
     copy_folder_contents(src_folder1, src_folder2, base_dst_folder):
         Copies the contents of src_folder1 and src_folder2 to a new folder in base_dst_folder.
-    verify_transfer(dataPath):
+    verify_transfer(dataPath, channels=None):
         Verifies that the transfer of source items to the destination folder was successful.
     calculate_checksum(dataPath):
         Calculate the checksum of the file contents.
-    has_stopped_updating(dataPath, max_no_change_cycles=3):
+    has_stopped_updating(dataPath, max_no_change_cycles=3, channels=None):
         Monitor a file for updates and return True if no updates are detected for max_no_change_cycles consecutive cycles.
+    run_live(channels):
+        Refreshes the live reports and plots of a machine whose data files are still updating.
+    process(machine, raw):
+        Runs the algorithms for one machine and uploads the results to the cloud storage
     run():
         Runs the Pressure, Heating, and Plasma algorithms for all Fiji200 machines
     """
@@ -52,7 +60,7 @@ class Fiji200(Runner_Base):
         pass
 
 
-    def verify_transfer(self, dataPath):
+    def verify_transfer(self, dataPath, channels=None):
         """
         Verifies that the transfer of source items to the destination folder was successful.
 
@@ -60,14 +68,14 @@ class Fiji200(Runner_Base):
             -----------
                 dataPath: str
                     the path to the data folder of the machine
+                channels: tuple
+                    the Pressure, Heating and Plasma objects of the machine, shared with process(), created if None
             
             Returns
             -------
                 bool: True if the files are synced, False otherwise
         """
-        p = Pressure(dataPath)
-        h = Heating(dataPath)
-        pl = Plasma(dataPath)
+        p, h, pl = channels if channels is not None else (Pressure(dataPath), Heating(dataPath), Plasma(dataPath))
         if os.path.basename(p.mostRecent()) == os.path.basename(h.mostRecent()) == os.path.basename(pl.mostRecent()):
             print(f"Machine data files are currently synced on local for data path: {dataPath}")
             return True
@@ -75,7 +83,7 @@ class Fiji200(Runner_Base):
             return False
 
 
-    def has_stopped_updating(self, dataPath, max_no_change_cycles=3):
+    def has_stopped_updating(self, dataPath, max_no_change_cycles=3, channels=None):
         """
         Monitor a file for updates and return True if no updates are detected
         for max_no_change_cycles consecutive cycles.
@@ -88,136 +96,131 @@ class Fiji200(Runner_Base):
                     Time in seconds to wait between checks.
                 max_no_change_cycles: int
                     Number of cycles to wait with no changes.
+                channels: tuple
+                    the Pressure, Heating and Plasma objects of the machine, shared with process(), created if None
 
             Returns
             -------
                 bool: True if the file stopped updating, False otherwise.
         """
-        pFile = Pressure(dataPath).mostRecent()
-        hFile = Heating(dataPath).mostRecent()
-        plFile = Plasma(dataPath).mostRecent()
+        p, h, pl = channels if channels is not None else (Pressure(dataPath), Heating(dataPath), Plasma(dataPath))
+        pFile = p.mostRecent()
+        hFile = h.mostRecent()
+        plFile = pl.mostRecent()
         pSum = self.calculate_checksum(pFile)
         hSum = self.calculate_checksum(hFile)
         plSum = self.calculate_checksum(plFile)
 
-        metadataPath = os.path.join(dataPath, "metadata.txt")
-
-        with open(metadataPath, 'a+') as file:
-            file.write(pSum + "\n")
-            file.write(hSum + "\n")
-            file.write(plSum + "\n")
-
-        with open(metadataPath, 'r') as file:
-            lines = [line.strip() for line in file.readlines() if line.strip()]
-            if len(lines) < (3 * max_no_change_cycles):
-                return False
-            lastCheck = lines[(-3 * max_no_change_cycles):]
-        # print("Last 9 Checksums: ", lastCheck)
-        # print("[DEBUG] Pressure Checksum: ", pSum)
-        # print("[DEBUG] Heating Checksum: ", hSum)
-        # print("[DEBUG] Plasma Checksum: ", plSum)
-        print("[DEBUG] Num of Matching Pressure Checksums: ", lastCheck.count(pSum))
-        print("[DEBUG] Num of Matching Heating Checksums: ", lastCheck.count(hSum))
-        print("[DEBUG] Num of Matching Plasma Checksums: ", lastCheck.count(plSum))
-        if (lastCheck.count(pSum) == max_no_change_cycles) and (lastCheck.count(hSum) == max_no_change_cycles) and (lastCheck.count(plSum) == max_no_change_cycles):
-            with open(metadataPath, 'w') as file:
-                file.write("")
+        # Checksums of the last max_no_change_cycles cycles, kept in a bounded ring buffer
+        tracker = get_tracker(os.path.join(dataPath, "metadata.txt"), 3, max_no_change_cycles)
+        stable = tracker.record((pSum, hSum, plSum))
+        if stable:
             return True
-        else:
-            return False
+        print("[DEBUG] Num of Matching Pressure Checksums: ", tracker.count(0, pSum))
+        print("[DEBUG] Num of Matching Heating Checksums: ", tracker.count(1, hSum))
+        print("[DEBUG] Num of Matching Plasma Checksums: ", tracker.count(2, plSum))
+        return False
 
 
-    def run(self):
+    def run(self, register=None):
         """
         Runs the Pressure, Heating, and Plasma algorithms for all Fiji200 machines and uploads the results to the cloud storage.
 
             Parameters
             -----------
-                None
+                register: list
+                    already parsed register entries, read from register.txt if None
             
             Returns
             -------
                 None
         """
         # RUN ALGS
-        start = timeit.default_timer()
-        file = open(os.path.join("src", "register.txt"), "r")
-        runMachine = []
-        raw = []
-        for line in file:
-            m = tuple(line.strip().split())
-            if m[0] == "Fiji200":
-                runMachine.append(m)
-                for i in range(len(m)):
-                    if m[i] == "raw":
-                        raw.append(True)
-                    else:
-                        raw.append(False)
-        file.close()
-        # Raw file handling
+        runMachine, raw = self.load_machines("Fiji200", register)
         for machine in runMachine:
-            dataPath = os.path.join("src", "Machines", f"{machine[0]}", f"data({machine[1]})")
-
-            if not self.has_stopped_updating(dataPath):
-                print(f"[NOTICE]: Machine data files are still updating OR awaiting new files\n skipping algs for data path: {dataPath}")
-                continue
-            if not self.verify_transfer(dataPath):
-                print(f"[WARNING]: Machine data files are NOT synced on local\n skipping algs for data path: {dataPath}")
-                continue
-
-            p = Pressure(dataPath)
-            h = Heating(dataPath)
-            pl = Plasma(dataPath)
-
-            # Uploading raw files
-            if raw[runMachine.index(machine)]:
-                newp = p.runRaw()
-                newh = h.runRaw()
-                newpl = p.runRaw()
-                # If new raw files are found, change their names and upload them
-                if newp and newh and newpl:
-                    newp = self.changeName(newp, "Pressure")
-                    newh = self.changeName(newh, "Heating")
-                    newpl = self.changeName(newpl, "Plasma")
-                    src_items = [newp, newh, newpl]
-                    dirname = self.copy_sources_to_new_folder(src_items,
-                                                              os.path.join(dataPath, "Output_Data"))
-                    file = open(os.path.join("src", "rclone.txt"), "r")
-                    root = file.readline().strip()
-                    if root == "":
-                        print("Cloud Storage Not Found, Skipping Upload...")
-                        file.close()
-                        return
+            self.process(machine, raw[runMachine.index(machine)])
+
+
+    def process(self, machine, raw=False):
+        """
+        Runs the Pressure, Heating, and Plasma algorithms for one Fiji200 machine and uploads the results to the cloud storage.
+
+            Parameters
+            -----------
+                machine: tuple
+                    the register entry of the machine
+                raw: bool
+                    True if the raw files are uploaded instead of the processed output
+            
+            Returns
+            -------
+                None
+        """
+        start = timeit.default_timer()
+        dataPath = os.path.join("src", "Machines", f"{machine[0]}", f"data({machine[1]})")
+
+        # One set of channel objects for the whole cycle, the checks and the algorithms share them
+        p = Pressure(dataPath)
+        h = Heating(dataPath)
+        pl = Plasma(dataPath)
+        channels = (p, h, pl)
+
+        if not self.has_stopped_updating(dataPath, channels=channels):
+            print(f"[NOTICE]: Machine data files are still updating OR awaiting new files\n skipping algs for data path: {dataPath}")
+            self.run_live(channels)
+            return
+        if not self.verify_transfer(dataPath, channels=channels):
+            print(f"[WARNING]: Machine data files are NOT synced on local\n skipping algs for data path: {dataPath}")
+            return
+
+        # Uploading raw files
+        if raw:
+            newp = p.runRaw()
+            newh = h.runRaw()
+            newpl = pl.runRaw()
+            # If new raw files are found, change their names and upload them
+            if newp and newh and newpl:
+                newp = self.changeName(newp, "Pressure")
+                newh = self.changeName(newh, "Heating")
+                newpl = self.changeName(newpl, "Plasma")
+                src_items = [newp, newh, newpl]
+                dirname, archived = self.stage_raw(src_items, os.path.join(dataPath, "Output_Data"))
+                file = open(os.path.join("src", "rclone.txt"), "r")
+                root = file.readline().strip()
+                if root == "":
+                    print("Cloud Storage Not Found, Skipping Upload...")
                     file.close()
-                    # UPLOAD TO CLOUD STORAGE
-                    up = Uploader(os.path.join(dataPath, "Output_Data", f"{dirname}"),
-                                    os.path.join(root, machine[0], machine[1], dirname))
-                    up.rclone()
-            # Uploading normal output files
-            else:
-                newp = p.run()
-                newh = h.run()
-                newpl = pl.run()
-                stop = timeit.default_timer()
-                print('Data Processing Runtime: ', stop - start)
-                if newp and newh and newpl:
-                    # ADD DATE TIME TO NEW DIRECTORY NAME
-                    out_plot = os.path.join(dataPath, "Output_Plots")
-                    out_text = os.path.join(dataPath, "Output_Text")
-                    dirname = self.copy_folder_contents(newh, out_plot, out_text,
-                                                        os.path.join(dataPath, "Output_Data"))
-                    # FIND ROOT DIRECTORY OF CLOUD STORAGE
-                    file = open(os.path.join("src", "rclone.txt"), "r")
-                    root = file.readline().strip()
-                    if root == "":
-                        print("Cloud Storage Not Found, Skipping Upload...")
-                        file.close()
-                        return
+                    return
+                file.close()
+                # UPLOAD TO CLOUD STORAGE, batched with the other machines on the upload thread
+                get_upload_queue().submit(os.path.join(dataPath, "Output_Data", f"{dirname}"), root,
+                                          os.path.join(machine[0], machine[1], dirname), archived=archived)
+        # Uploading normal output files
+        else:
+            newp = p.run()
+            newh = h.run()
+            newpl = pl.run()
+            # The plots are encoded on the render threads, wait for them before the outputs are copied
+            get_renderer().flush()
+            stop = timeit.default_timer()
+            print('Data Processing Runtime: ', stop - start)
+            if newp and newh and newpl:
+                # ADD DATE TIME TO NEW DIRECTORY NAME
+                out_plot = os.path.join(dataPath, "Output_Plots")
+                out_text = os.path.join(dataPath, "Output_Text")
+                dirname = self.copy_folder_contents(newh, out_plot, out_text,
+                                                    os.path.join(dataPath, "Output_Data"))
+                # FIND ROOT DIRECTORY OF CLOUD STORAGE
+                file = open(os.path.join("src", "rclone.txt"), "r")
+                root = file.readline().strip()
+                if root == "":
+                    print("Cloud Storage Not Found, Skipping Upload...")
                     file.close()
-                    # UPLOAD TO CLOUD STORAGE
-                    up = Uploader(os.path.join(dataPath, "Output_Data", f"{dirname}"),
-                                    os.path.join(root, machine[0], machine[1], dirname))
-                    up.rclone()
+                    return
+                file.close()
+                # UPLOAD TO CLOUD STORAGE, batched with the other machines on the upload thread
+                get_upload_queue().submit(os.path.join(dataPath, "Output_Data", f"{dirname}"), root,
+                                          os.path.join(machine[0], machine[1], dirname))
 
 
 # Main function for testing
@@ -1,6 +1,12 @@
-import matplotlib.pyplot as plt
 import os
+import numpy as np
 from datetime import datetime
+from src.processed_index import claim
+from src.renderer import get_renderer, empty_figure
+from src.log_reader import PLASMA_LOG
+from src.parsed_run import parsed_run
+from src.dir_index import directory_index
+from src.live import LiveRun
 
 
 class Plasma:
@@ -9,14 +15,14 @@ class Plasma:
         
         Attributes:
         -----------
-        rfTime : list
+        rfTime : numpy.ndarray
             Plasma Data (Float in Watts) and Time (Float in ms)
-        Plasma : list
+        Plasma : numpy.ndarray
             Plasma Data (Float in Watts) and Time (Float in ms)
-        PlasmaReflect : list
+        PlasmaReflect : numpy.ndarray
             Plasma Reflect Data (Float in Watts) and Time (Float in ms)
-        cycles : list
-            Cycles (int)
+        cycles : numpy.ndarray
+            Cycles (int32)
         dataPath : string
             Path from Tool-Data to the data folder of the machine
         plasmaFilePath : string
@@ -46,12 +52,18 @@ class Plasma:
         --------
         readDir():
             Reads through directory and prints out how many of each recipe is in the directory.
+        parseLog(path):
+            Parses a plasma log into arrays, called through the parsed run cache.
         readFile():
             Reads through the txt file and prints out the recipe, plasma, time, and cycles.
+        loadColumns(columns, meta):
+            Sets the plasma arrays and the recipe from parsed columns.
         parseTitles():
             Parses through the titles of the files and counts how many of each recipe is in the directory.
         genReport():
             Generates a report of the plasma data into output text file.
+        layoutPlasma(fig, rows):
+            Lays out the plasma figure template.
         plotPlasma():
             Plots the Plasma vs Time and saves it as a png file.
         initialize():
@@ -64,6 +76,8 @@ class Plasma:
             Runs the Plasma algorithm and returns whether or not there is new data.
         runRaw():
             Runs the Plasma algorithm and returns the file path.
+        runLive():
+            Refreshes the live report and plot of a log that is still being written.
         """
     
     def __init__(self, dataPath):
@@ -115,13 +129,32 @@ class Plasma:
         """
         path = self.plasmaDirPath
         try:
-            self.dir_list = os.listdir(path)
+            self.dir_list = directory_index.names(path)
             self.parseTitles()
         except NotADirectoryError:
             print("DIRECTORY NOT FOUND, PROCESS ABORTED AT: \"src/Machines/Fiji200/Plasma.py\" AT METHOD: readDir(). \n Hint: Try putting in a valid directory path.")
             raise NotADirectoryError
 
 
+    def parseLog(self, path, span=None):
+        """
+        Parses a plasma log, used by the run cache when the log is not parsed yet.
+
+            Parameters
+            ----------
+                path: str
+                    the path to the plasma log
+                span: tuple
+                    (start, end) byte offsets of the lines to parse, the whole log if None
+
+            Returns
+            -------
+                columns (dict): the rfTime, Plasma, PlasmaReflect and cycles arrays
+                meta (dict): the recipe name
+        """
+        return PLASMA_LOG.parse(path, span)
+
+
     def readFile(self):
         """
         Reads through the txt file and reads data into the rfTime, Plasma, outString, and cycles lists.
@@ -135,59 +168,25 @@ class Plasma:
                 None
         """
         path = self.plasmaFilePath
-        self.rfTime = []
-        self.Plasma = []
-        self.PlasmaReflect = []
-        self.cycles = []
-        self.recipe = ""
-   
-        checkPlasma = True
-        plasmaCycles = 0
-
-        # If the file is empty
-        empty = True
-        # Iterator to find line 1 of file, which contains the recipe name at the end
-        iter = 0
 
         try:
             foobar = open(path)
         except FileNotFoundError:
             print("FILE NOT FOUND, PROCESS ABORTED AT: \"src/Machines/Fiji200/Plasma.py\" AT METHOD: readFile(). \n Hint: Try putting in a valid file path.")
             raise FileNotFoundError
+        foobar.close()
+
+        # Parsed once per version of the file, shared with every other step that reads it
+        run = parsed_run(path, "Plasma", self.parseLog)
+        self.loadColumns(run.columns, run.meta)
+        # If the file is empty
+        empty = self.rfTime.__len__() == 0
 
-        # main loop to read through the file line by line
-        with open(path, "r") as file:
-            for line in file:
-                data = line.strip().replace(" - ", " ").split()
-                try:
-                    foobar = data[0]
-                except IndexError:
-                    continue
-                # Skip the first line of the file
-                if data[0] == "RF":
-                    continue
-
-                # If the file is not empty, record the data
-                empty = False
-                self.rfTime.append(float(data[0]))
-                self.Plasma.append(float(data[1]))
-                self.PlasmaReflect.append(float(data[2]))
-                self.cycles.append(int(data[3]))
-
-                # Find the cycles before plasma starts
-                if self.Plasma[-1] != 0 and checkPlasma:
-                    plasmaCycles = self.cycles[0] - self.cycles[-1] + 1
-                    checkPlasma = False
-                    
-                iter += 1
-                # Find the recipe name
-                if iter == 1:
-                    for i in range(data.__len__() - 4):
-                        self.recipe += data[i+4] + " "
-                    self.recipe = self.recipe.strip()
-                    # for key in self.ingredientStack:
-                    #     if self.recipe.find(key) != -1:
-                    #         self.recipe = key
+        # Find the cycles before plasma starts (first reading with plasma on)
+        plasmaCycles = 0
+        plasmaOn = np.flatnonzero(self.Plasma != 0)
+        if plasmaOn.size > 0:
+            plasmaCycles = self.cycles[0] - self.cycles[plasmaOn[0]] + 1
 
 
         # if the file is not empty, structure the report in outString
@@ -197,7 +196,28 @@ class Plasma:
             else:
                 self.outString += "Completed Cycles: " + str(self.cycles[0] - self.cycles[-1] + 1) + "/" + str(self.cycles[0]) + "\n\n"
             self.outString += "Cycles Before Plasma Starts: " + str(plasmaCycles) + "\n\n"
-        file.close()
+
+
+    def loadColumns(self, columns, meta):
+        """
+        Sets the plasma arrays and the recipe from parsed columns, of a whole log or of a live run.
+
+            Parameters
+            ----------
+                columns: dict
+                    the rfTime, Plasma, PlasmaReflect and cycles arrays
+                meta: dict
+                    the recipe name
+
+            Returns
+            -------
+                None
+        """
+        self.rfTime = columns["rfTime"]
+        self.Plasma = columns["Plasma"]
+        self.PlasmaReflect = columns["PlasmaReflect"]
+        self.cycles = columns["cycles"]
+        self.recipe = meta["recipe"]
 
 
     def parseTitles(self):
@@ -252,6 +272,37 @@ class Plasma:
         file.close()
 
 
+    def layoutPlasma(self, fig, rows):
+        """
+        Lays out a plasma figure once, plotting only replaces the line data.
+
+            Parameters
+            ----------
+                fig: matplotlib.figure.Figure
+                    the new figure
+                rows: int
+                    2, or 3 to add the last readings of the run
+
+            Returns
+            -------
+                axes (list): the axes of the figure
+                lines (dict): the "plasma", "reflect" and "last" (3 rows only) lines
+        """
+        ax = fig.subplots(rows, 1)
+        fig.suptitle('Plasma Data')
+        fig.set_size_inches(8, 8)
+        fig.supxlabel('Time (ms)')
+        fig.supylabel('Plasma (Watts)')
+        lines = {}
+        lines["plasma"], = ax[0].plot([], [], 'tab:blue')
+        ax[1].set_title('Plasma Reflect Data')
+        lines["reflect"], = ax[1].plot([], [], 'tab:orange')
+        if rows == 3:
+            ax[2].set_title('Plasma Last 1500ms')
+            lines["last"], = ax[2].plot([], [], 'tab:green', linestyle='solid')
+        return list(ax), lines
+
+
     def plotPlasma(self):
         """
         Plots the Plasma vs Time and saves it as a png file at self.plotpath.
@@ -270,47 +321,22 @@ class Plasma:
         except FileNotFoundError:
             pass
 
-        # Plotting the Plasma vs Time and Plasma Reflect vs Time
-        if (self.rfTime.__len__() > 0):
-            if (self.rfTime.__len__() < 400):
-                fig, ax = plt.subplots(2, 1)
-                fig.suptitle('Plasma Data')
-                fig.set_size_inches(8, 8)
-                fig.supxlabel('Time (ms)')
-                fig.supylabel('Plasma (Watts)')
-                ax[0].plot(self.rfTime, self.Plasma, 'tab:blue')
-                ax[1].set_title('Plasma Reflect Data')
-                ax[1].plot(self.rfTime, self.PlasmaReflect, 'tab:orange')
-                fig.tight_layout()
-                # plt.show()
-                fig.savefig(path)
+        renderer = get_renderer()
 
-            else:
-                lastP = self.Plasma[-400:]
-                lastT = self.rfTime[-400:]
-                fig, ax = plt.subplots(3, 1)
-                fig.suptitle('Plasma Data')
-                fig.set_size_inches(8, 8)
-                fig.supxlabel('Time (ms)')
-                fig.supylabel('Plasma (Watts)')
-                ax[0].plot(self.rfTime, self.Plasma, 'tab:blue')
-                ax[1].set_title('Plasma Reflect Data')
-                ax[1].plot(self.rfTime, self.PlasmaReflect, 'tab:orange')
-                ax[2].set_title('Plasma Last 1500ms')
-                ax[2].plot(lastT, lastP, 'tab:green', linestyle='solid')
-                fig.tight_layout()
-                # plt.show()
-                fig.savefig(path)
+        # Plotting the Plasma vs Time and Plasma Reflect vs Time, runs of 400 readings or more also get the last ones
+        if (self.rfTime.__len__() > 0):
+            rows = 2 if self.rfTime.__len__() < 400 else 3
+            plot = renderer.acquire(("Plasma", rows), lambda fig: self.layoutPlasma(fig, rows))
+            plot.set_line("plasma", self.rfTime, self.Plasma)
+            plot.set_line("reflect", self.rfTime, self.PlasmaReflect)
+            if rows == 3:
+                plot.set_line("last", self.rfTime[-400:], self.Plasma[-400:])
+            plot.rescale()
+            renderer.submit(plot, path)
 
         else:
-            fig = plt.figure()
-            fig.suptitle('Plasma Data')
-            fig.set_size_inches(8, 8)
-            fig.supxlabel('Time (s)')
-            fig.supylabel('Plasma (Watts)')
-            fig.tight_layout()
-            fig.savefig(path)
-            # plt.show()
+            plot = renderer.acquire(("Plasma", 0), empty_figure('Plasma Data', 'Time (s)', 'Plasma (Watts)'))
+            renderer.submit(plot, path)
             print("NO DATA TO PLOT, PROCESS ABORTED AT: \"src/Machines/Fiji200/Plasma.py\" AT METHOD: plotPlasma(). \n Hint: Try putting in a file with data.")
             return
 
@@ -341,22 +367,15 @@ class Plasma:
             
             Returns
             -------
-                times[-1][0] (str): the file path of the most recent file
+                newest (str): the file path of the most recent file
         """
-        # tuples of (filename, creation time)
         self.readDir()
-        times = []
-        listFiles = self.dir_list
-        for i in listFiles:
-            filepath = os.path.join(self.plasmaDirPath, i)
-            # get creation time
-            times.append((filepath, os.path.getctime(filepath)))
-        if times.__len__() == 0:
+        # newest entry by creation time, shared with every other check of this directory
+        newest = directory_index.newest(self.plasmaDirPath)
+        if newest is None:
             print("NO FILES FOUND, PROCESS ABORTED AT: \"src/Machines/Fiji200/Plasma.py\" AT METHOD: mostRecent(). \n Hint: Ansible may have trouble copying files.")
             return None
-        # sort by creation time
-        times.sort(key=lambda x: x[1])
-        return times[-1][0]
+        return newest
 
 
     def ignoreRecipe(self):
@@ -393,23 +412,11 @@ class Plasma:
                 True (bool): If there is new data
                 False (bool): If there is no new data
         """
-        stack = []
-        process_path = os.path.join(self.dataPath, "process_stack.txt")
-        with open(process_path, "r") as file:
-            stack = file.read().splitlines()
-            file.close()
         if self.ignoreRecipe():
             return False
-        elif stack.__len__() == 0:
-            with open(process_path, "a+") as file:
-                file.write(self.plasmaFilePath + "\n")
-                file.close()
-        elif stack.count(self.plasmaFilePath) > 0:
+        # Skip files that are already in the processed file index
+        if not claim(self.dataPath, "Plasma", self.plasmaFilePath):
             return False
-        else:
-            with open(process_path, "a+") as file:
-                file.write(self.plasmaFilePath + "\n")
-                file.close()
 
         self.genReport()
         self.plotPlasma()
@@ -430,23 +437,11 @@ class Plasma:
             -------
                 plasmaFilePath (str): The file path of the plasma data
         """
-        stack = []
-        process_path = os.path.join(self.dataPath, "process_stack.txt")
-        with open(process_path, "r") as file:
-            stack = file.read().splitlines()
-            file.close()
         if self.ignoreRecipe():
             return None
-        elif stack.__len__() == 0:
-            with open(process_path, "a+") as file:
-                file.write(self.plasmaFilePath + "\n")
-                file.close()
-        elif stack.count(self.plasmaFilePath) > 0:
+        # Skip files that are already in the processed file index
+        if not claim(self.dataPath, "Plasma", self.plasmaFilePath):
             return None
-        else:
-            with open(process_path, "a+") as file:
-                file.write(self.plasmaFilePath + "\n")
-                file.close()
 
         print("Sent data for:", self.plasmaFilePath)
         return self.plasmaFilePath
@@ -485,6 +480,51 @@ class Plasma:
         return self.sendDataRaw()
 
 
+    def runLive(self):
+        """
+        Follows the most recent plasma log while it is still being written.
+        Only the lines appended since the last call are parsed into the running statistics,
+        the live report and plot in Live_Output are refreshed every REFRESH_SECONDS.
+
+            Parameters
+            ----------
+                None
+
+            Returns
+            -------
+                True (bool): if the live report and plot were refreshed
+                False (bool): if there was nothing to refresh
+        """
+        self.plasmaFilePath = self.mostRecent()
+        if self.plasmaFilePath is None or self.ignoreRecipe():
+            return False
+        live = LiveRun(self.dataPath, "Plasma")
+        columns = live.update(self.plasmaFilePath, self.parseLog)
+        # The cycles before plasma are fixed by the first reading with plasma on, look for it until it shows up
+        if columns and "plasmaCycles" not in live.extra:
+            plasmaOn = np.flatnonzero(columns["Plasma"] != 0)
+            if plasmaOn.size > 0:
+                live.extra["plasmaCycles"] = int(live.stats["cycles"]["first"]) - int(columns["cycles"][plasmaOn[0]]) + 1
+                live.save()
+        if not live.due():
+            return False
+
+        self.loadColumns(live.series(), live.meta)
+        completed, total = live.completed_cycles()
+        self.outString = "----------------------------------------------\n\nLIVE PLASMA REPORT AT " + datetime.now().strftime("%H:%M:%S") + " ON " + datetime.now().strftime("%m/%d/%Y") + "\n\n----------------------------------------------\n\n"
+        self.outString += "Readings So Far: " + str(live.rows) + "\n\n"
+        self.outString += "Completed Cycles: " + str(completed) + "/" + str(total) + "\n\n"
+        self.outString += "Cycles Before Plasma Starts: " + str(live.extra.get("plasmaCycles", 0)) + "\n\n"
+        self.outString += "Recipe: " + self.recipe + "\n\n----------------------------------------------\n\n"
+        live.write_report("Plasma Report.txt", self.outString)
+
+        # Same plot as a finished run, written next to the live report
+        self.plotpath = live.output_path
+        self.plotPlasma()
+        live.mark_refreshed()
+        return True
+
+
 # Main function to test the Plasma class
 def main():
     plasma = Plasma("src/Machines/Fiji200/data(fiji1)")
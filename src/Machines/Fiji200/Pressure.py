@@ -1,8 +1,9 @@
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
 import os
 from datetime import datetime
 from src.Machines.BaseClasses.Pressure_Base import Pressure_Base
+from src.processed_index import claim
+from src.renderer import get_renderer, empty_figure
+from src.parsed_run import parsed_run
 
 
 class Pressure(Pressure_Base):
@@ -11,12 +12,12 @@ class Pressure(Pressure_Base):
         
         Attributes:
         -----------
-        pTime : list
+        pTime : numpy.ndarray
             Pressure Data (Float in Torr) and Time (Float in ms)
-        Pressure : list
+        Pressure : numpy.ndarray
             Pressure Data (Float in Torr) and Time (Float in ms)
-        cycles : list
-            Cycles (int)
+        cycles : numpy.ndarray
+            Cycles (int32)
         dataPath : string
             Path from Tool-Data to the data folder of the machine
         pressureFilePath : string
@@ -46,8 +47,12 @@ class Pressure(Pressure_Base):
         --------
         readDir():
             Reads through directory and prints out how many of each recipe is in the directory.
+        parseLog(path):
+            Parses a pressure log into arrays, called through the parsed run cache.
         readFile():
             Reads through the txt file and prints out the recipe, pressure, time, and cycles.
+        loadColumns(columns, meta):
+            Sets the pressure arrays and the recipe from parsed columns.
         parseTitles():
             Parses through the titles of the files and counts how many of each recipe is in the directory.
         genReport():
@@ -64,6 +69,8 @@ class Pressure(Pressure_Base):
             Runs the Pressure algorithm and returns whether or not there is new data.
         runRaw():
             Runs the Pressure algorithm and returns the file path.
+        runLive():
+            Refreshes the live report and plot of a log that is still being written.
         """
     
     def __init__(self, dataPath):
@@ -84,49 +91,19 @@ class Pressure(Pressure_Base):
                 None
         """
         path = self.pressureFilePath
-        self.pTime = []
-        self.Pressure = []
-        self.cycles = []
-        self.recipe = ""
-       
-        # If the file is empty
-        empty = True
-        # Iterator to find line 1 of file, which contains the recipe name at the end
-        iter = 0
 
         try:
             foobar = open(path)
         except FileNotFoundError:
             print("FILE NOT FOUND, PROCESS ABORTED AT: \"src/Machines/Fiji200/Pressure.py\" AT METHOD: readFile(). \n Hint: Try putting in a valid file path.")
             raise FileNotFoundError
+        foobar.close()
 
-        # main loop to read through the file line by line
-        with open(path, "r") as file:
-            for line in file:
-                data = line.strip().replace(" - ", " ").split()
-                try:
-                    foobar = data[0]
-                except IndexError:
-                    continue
-                # Skip the first line of the file
-                if data[0] == "Pressure":
-                    continue
-
-                # If the file is not empty, record the data
-                empty = False
-                self.pTime.append(float(data[0]))
-                self.Pressure.append(float(data[1]))
-                self.cycles.append(int(data[2]))
-
-                iter += 1
-                # Find the recipe name
-                if iter == 1:
-                    for i in range(data.__len__() - 3):
-                        self.recipe += data[i+3] + " "
-                    self.recipe = self.recipe.strip()
-                    # for key in self.ingredientStack:
-                    #     if self.recipe.find(key) != -1:
-                    #         self.recipe = key
+        # Parsed once per version of the file, shared with every other step that reads it
+        run = parsed_run(path, "Pressure", self.parseLog)
+        self.loadColumns(run.columns, run.meta)
+        # If the file is empty
+        empty = self.pTime.__len__() == 0
 
 
         # if the file is not empty, structure the report in outString
@@ -135,7 +112,6 @@ class Pressure(Pressure_Base):
                 self.outString += "Completed Cycles: " + str(self.cycles[0]) + "/" + str(self.cycles[0]) + "\n\n"
             else:
                 self.outString += "Completed Cycles: " + str(self.cycles[0] - self.cycles[-1] + 1) + "/" + str(self.cycles[0]) + "\n\n"
-        file.close()
 
 
     def genReport(self):
@@ -178,76 +154,19 @@ class Pressure(Pressure_Base):
         except FileNotFoundError:
             pass
 
-        basePressures, dates, times = self.loadBasePressure(os.path.join(self.dataPath, "base_pressure.txt"))
-        datetime_values = [
-                datetime.strptime(f"{date} {time}", '%Y-%m-%d %H:%M:%S')
-                for date, time in zip(dates, times)
-            ]
+        basePressures, times = self.loadBasePressure()
+        renderer = get_renderer()
 
-        # Plotting the Pressure vs Time
+        # Plotting the Pressure vs Time, runs of 1500 readings or more also get the last 1500ms
         if (self.pTime.__len__() > 0):
-            if (self.pTime.__len__() < 1500):
-                fig, ax = plt.subplots(2, 1)
-                fig.suptitle('Pressure Data')
-                fig.set_size_inches(8, 8)
-                # fig.supxlabel('Time (ms)')
-                fig.supylabel('Pressure (Torr)')
-                ax[0].plot(self.pTime, self.Pressure)
-                ax[0].set_xlabel('Time (ms)')
-
-                ax[1].set_title('Base Pressure Last 60 Runs')
-                ax[1].xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d %H:%M'))
-                ax[1].xaxis.set_major_locator(mdates.AutoDateLocator())
-                ax[1].plot(datetime_values, basePressures, 'tab:red', marker='o', linestyle='-')
-                ax[1].set_xlabel('Date and Time')
-
-                # Apply auto formatting for the x-axis dates only on the second subplot
-                plt.setp(ax[1].get_xticklabels(), rotation=45, ha='right')
-
-                # ax[1].set_ylabel('Pressure (Torr)')
-                fig.tight_layout()
-                # plt.show()
-                fig.savefig(path)
-
-            else:
-                lastP = self.Pressure[-1500:]
-                lastT = self.pTime[-1500:]
-                
-                fig, ax = plt.subplots(3, 1)
-                fig.suptitle('Pressure Data')
-                fig.set_size_inches(8, 8)
-                fig.supylabel('Pressure (Torr)')
-                
-                # First subplot
-                ax[0].plot(self.pTime, self.Pressure, 'tab:blue')
-                ax[0].set_xlabel('Time (ms)')
-
-                # Second subplot
-                ax[1].set_title('Pressure Last 1500ms')
-                ax[1].plot(lastT, lastP, 'tab:orange', linestyle='solid')
-                ax[1].set_xlabel('Time (ms)')
-
-                # Third subplot
-                ax[2].set_title('Base Pressure Last 60 Runs')
-                ax[2].xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d %H:%M'))
-                ax[2].xaxis.set_major_locator(mdates.AutoDateLocator())
-                ax[2].plot(datetime_values, basePressures, 'tab:red', marker='o', linestyle='-')
-                ax[2].set_xlabel('Date and Time')
-                
-                plt.setp(ax[2].get_xticklabels(), rotation=45, ha='right')
-
-                fig.tight_layout()
-                fig.savefig(path)
+            rows = 2 if self.pTime.__len__() < 1500 else 3
+            plot = renderer.acquire(("Pressure", rows), lambda fig: self.layoutPressure(fig, rows))
+            self.fillPressure(plot, basePressures, times)
+            renderer.submit(plot, path)
 
         else:
-            fig = plt.figure()
-            fig.suptitle('Pressure Data')
-            fig.set_size_inches(8, 8)
-            fig.supxlabel('Time (s)')
-            fig.supylabel('Pressure (Torr)')
-            fig.tight_layout()
-            fig.savefig(path)
-            # plt.show()
+            plot = renderer.acquire(("Pressure", 0), empty_figure('Pressure Data', 'Time (s)', 'Pressure (Torr)'))
+            renderer.submit(plot, path)
             print("NO DATA TO PLOT, PROCESS ABORTED AT: \"src/Machines/Fiji200/Pressure.py\" AT METHOD: plotPressure(). \n Hint: Try putting in a file with data.")
             return
     
@@ -265,33 +184,18 @@ class Pressure(Pressure_Base):
             -------
                 recipe (str): The recipe info
         """
-        stack = []
-        process_path = os.path.join(self.dataPath, "process_stack.txt")
-        with open(process_path, "r") as file:
-            stack = file.read().splitlines()
-            file.close()
         if self.ignoreRecipe():
             return False
-        elif stack.__len__() == 0:
-            with open(process_path, "a+") as file:
-                file.write(self.pressureFilePath + "\n")
-                file.close()
-        elif stack.count(self.pressureFilePath) > 0:
+        # Skip files that are already in the processed file index
+        if not claim(self.dataPath, "Pressure", self.pressureFilePath):
             return False
-        else:
-            with open(process_path, "a+") as file:
-                file.write(self.pressureFilePath + "\n")
-                file.close()
 
         self.genReport()
 
         # ADDITIONAL RECIPE EXCEPTIONS
         if os.path.basename(self.pressureFilePath.lower()).find("standby"):
-            with open(os.path.join(self.dataPath, "base_pressure.txt"), "a+") as file:
-                avg = (sum(self.Pressure[-60:]) / len(self.Pressure[-60:]))
-                
-                file.write(str(avg) + " " + datetime.now().strftime("%Y-%m-%d") + " " + datetime.now().strftime("%H:%M:%S") + "\n")
-                file.close()
+            avg = (sum(self.Pressure[-60:]) / len(self.Pressure[-60:]))
+            self.saveBasePressure(avg)
             
         # # IMPLEMENT RATE OF RISE EXCEPTION
         # if self.pressureFilePath.lower().split("/")[-1].find("rate of rise"):
@@ -315,23 +219,11 @@ class Pressure(Pressure_Base):
             -------
                 pressureFilePath (str): The file path of the pressure data
         """
-        stack = []
-        process_path = os.path.join(self.dataPath, "process_stack.txt")
-        with open(process_path, "r") as file:
-            stack = file.read().splitlines()
-            file.close()
         if self.ignoreRecipe():
             return None
-        elif stack.__len__() == 0:
-            with open(process_path, "a+") as file:
-                file.write(self.pressureFilePath + "\n")
-                file.close()
-        elif stack.count(self.pressureFilePath) > 0:
+        # Skip files that are already in the processed file index
+        if not claim(self.dataPath, "Pressure", self.pressureFilePath):
             return None
-        else:
-            with open(process_path, "a+") as file:
-                file.write(self.pressureFilePath + "\n")
-                file.close()
 
         print("Sent data successfully for:", self.pressureFilePath)
         return self.pressureFilePath
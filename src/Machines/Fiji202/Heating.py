@@ -1,7 +1,28 @@
-import matplotlib.pyplot as plt
 import os
+import numpy as np
 from datetime import datetime
 from src.Machines.BaseClasses.Heating_Base import Heating_Base
+from src.processed_index import claim
+from src.renderer import get_renderer, empty_figure
+from src.parsed_run import parsed_run
+from src.log_reader import LogFormat
+
+
+# Layout of the Fiji202 heating logs: time, 6 heaters, 5 precursors, 4 unused columns, cycle, recipe name
+HEATING_LOG = LogFormat("Heater", [
+    ("hTime", 0, "f8"),
+    ("cone", 1, "f8"),
+    ("reactor1", 2, "f8"),
+    ("reactor2", 3, "f8"),
+    ("chuck", 4, "f8"),
+    ("pDelivery", 5, "f8"),
+    ("aldValves", 6, "f8"),
+    ("precursor1", 7, "f8"),
+    ("precursor2", 8, "f8"),
+    ("precursor3", 9, "f8"),
+    ("precursor4", 10, "f8"),
+    ("precursor5", 11, "f8"),
+    ("cycles", 16, "i8")], recipe=17)
 
 
 class Heating(Heating_Base):
@@ -10,26 +31,26 @@ class Heating(Heating_Base):
 
     Attributes
     ----------
-    hTime : list
-        a list of the time data for the heater
-    cone : list
-        a list of the cone data for the heater
-    reactor1 : list
-        a list of the reactor1 data for the heater
-    reactor2 : list
-        a list of the reactor2 data for the heater
-    chuck : list
-        a list of the chuck data for the heater
-    pDelivery : list
-        a list of the pDelivery data for the heater
-    aldValves : list
-        a list of the aldValves data for the heater
+    hTime : numpy.ndarray
+        the time data for the heater
+    cone : numpy.ndarray
+        the cone data for the heater
+    reactor1 : numpy.ndarray
+        the reactor1 data for the heater
+    reactor2 : numpy.ndarray
+        the reactor2 data for the heater
+    chuck : numpy.ndarray
+        the chuck data for the heater
+    pDelivery : numpy.ndarray
+        the pDelivery data for the heater
+    aldValves : numpy.ndarray
+        the aldValves data for the heater
     precursors : list
-        a list of lists of the precursor data for the heater
+        a list of arrays of the precursor data for the heater
     numPrecursors : int
         the number of precursors in the data
-    cycles : list
-        a list of the cycles data for the heater
+    cycles : numpy.ndarray
+        the cycles data for the heater
     dataPath : str
         the path to the directory that contains the data for the machine
     heatingFilePath : str
@@ -59,14 +80,24 @@ class Heating(Heating_Base):
     -------
     readDir():
         Reads through directory and prints out how many of each recipe is in the directory
+    parseLog(path):
+        Parses a heating log into arrays, called through the parsed run cache.
     readFile():
         Reads through the txt file and prints out the recipe, pressure, time, and cycles
+    loadColumns(columns, meta):
+        Sets the heater arrays and the recipe from parsed columns
     parseTitles():
         Parses through the titles of the files and counts how many of each recipe is in the directory
-    averageTemp():
+    averageTemp(precursorMax, mean):
         Helper method to calculate the average temperature of each precursor
+    reportLines(stats, mean, completed, total):
+        Adds the temperatures, cycles and errors of a run to the report
     genReport():
         Generates the report and returns it as a string
+    layoutHeating(fig):
+        Lays out the non-precursor heating figure template
+    layoutPrecursors(fig):
+        Lays out the precursor heating figure template
     plotHeating():
         Generates a plot of the data and saves it to the Output_Plots directory
     initialize():
@@ -79,7 +110,11 @@ class Heating(Heating_Base):
         Runs the Heating algorithm
     runRaw():
         Runs the Heating algorithm
+    runLive():
+        Refreshes the live report and plots of a log that is still being written
     """
+
+    logFormat = HEATING_LOG
     
     def __init__(self, dataPath):
         """
@@ -107,126 +142,65 @@ class Heating(Heating_Base):
                 None
         """
         path = self.heatingFilePath
-        self.hTime = []
-        self.cone = []
-        self.reactor1 = []
-        self.reactor2 = []
-        self.chuck = []
-        self.pDelivery = []
-        self.aldValves = []
-        self.precursors = [[], [], [], [], []]
         self.numPrecursors = 0
-        self.cycles = []
-        self.recipe = ""
-
-        # Track Max Temp Values for each component
-        chuckMax = 0
-        reactor1Max = 0
-        reactor2Max = 0
-        precursorsMax = [0, 0, 0, 0, 0]
-        # If the file is empty
-        empty = True
-        # Iterator to find line 1 of file, which contains the recipe name at the end
-        iter = 0
 
         try:
             foobar = open(path)
         except FileNotFoundError:
             print("FILE NOT FOUND, PROCESS ABORTED AT: \"src/Machines/Fiji202/Heating.py\" AT METHOD: readFile(). \n Hint: Try putting in a valid file path.")
             raise FileNotFoundError
+        foobar.close()
 
-        # main loop to read through the file line by line
-        with open(path, "r") as file:
-            for line in file:
-                data = line.strip().split()
-                try:
-                    foobar = data[0]
-                except IndexError:
-                    continue
-                # Skip the first line of the file (only contains the header)
-                if data[0] == "Heater":
-                    continue
-                
-                # If the file is not empty, record the data line by line
-                empty = False
-                self.hTime.append(float(data[0]))
-                self.cone.append(float(data[1]))
-                self.reactor1.append(float(data[2]))
-                self.reactor2.append(float(data[3]))
-                self.chuck.append(float(data[4]))
-                self.pDelivery.append(float(data[5]))
-                self.aldValves.append(float(data[6]))
-                
-                # Check max temp values for each component
-                if float(data[2]) > reactor1Max:
-                    reactor1Max = float(data[2])
-                if float(data[3]) > reactor2Max:
-                    reactor2Max = float(data[3])
-                if float(data[4]) > chuckMax:
-                    chuckMax = float(data[4])
-
-                # Record precursor temperature data
-                for i in range(5):
-                    self.precursors[i].append(float(data[i + 7]))
-                    if float(data[i + 7]) > precursorsMax[i]:
-                        precursorsMax[i] =float(data[i + 7])
-
-                # record cycles data which is after the precursor data
-                self.cycles.append(int(data[16]))
-
-                iter += 1
-                # Find the recipe name
-                if iter == 1:
-                    for j in range(17, data.__len__()):
-                        self.recipe += data[j] + " "
-                    self.recipe = self.recipe.strip()
-                    # for key in self.ingredientStack:
-                    #     if self.recipe.find(key) != -1:
-                    #         self.recipe = key
-
-
-        # Error Message for Max Temp Exceeded for some components
-        errorMessage = ""
+        # Parsed once per version of the file, shared with every other step that reads it
+        run = parsed_run(path, "Heating", self.parseLog)
+        self.loadColumns(run.columns, run.meta)
+        # If the file is empty
+        empty = self.hTime.__len__() == 0
 
-        if reactor1Max >= 275:
-            errorMessage += f"Reactor 1 Max Temp Exceeded At {reactor1Max}" + "\u00b0 C" + "\n\n"
-        if reactor2Max >= 275:
-            errorMessage += f"Reactor 2 Max Temp Exceeded At {reactor2Max}" + "\u00b0 C" + "\n\n"
-        if chuckMax >= 275:
-            errorMessage += f"Chuck Max Temp Exceeded At {chuckMax}" + "\u00b0 C" + "\n\n"
-        for i in range(5):
-            if precursorsMax[i] >= 275:
-                errorMessage += f"Precursor {i+1} Max Temp Exceeded At {precursorsMax[i]}" + "\u00b0 C" + "\n\n"
-            if precursorsMax[i] != 0.0:
-                self.numPrecursors += 1
-                
-            
         # if the file is not empty, structure the report in outString
         if not empty:
-            if (self.cycles[0] - self.cycles[-1] + 1) > self.cycles[0]:
-                self.outString += "Completed Cycles: " + str(self.cycles[0]) + "/" + str(self.cycles[0]) + "\n\n"
-            else:
-                self.outString += "Completed Cycles: " + str(self.cycles[0] - self.cycles[-1] + 1) + "/" + str(self.cycles[0]) + "\n\n"
-            self.outString += "Number of Precursors Heated: " + str(self.numPrecursors) + "\n\n"
-            self.outString += "Cone Final Temp: " + str(self.cone[-1]) + "\u00b0 C" + "\n\n"
-            self.outString += "Reactor 1 Final Temp: " + str(self.reactor1[-1]) + "\u00b0 C" + "\n\n"
-            self.outString += "Reactor 2 Final Temp: " + str(self.reactor2[-1]) + "\u00b0 C" + "\n\n"
-            self.outString += "Chuck Final Temp: " + str(self.chuck[-1]) + "\u00b0 C" + "\n\n"
-            self.outString += "Precursor Delivery Final Temp: " + str(self.pDelivery[-1]) + "\u00b0 C" + "\n\n"
-            self.outString += "ALD Valves Final Temp: " + str(self.aldValves[-1]) + "\u00b0 C" + "\n\n"
-            self.averageTemp(precursorsMax)
-            if errorMessage != "":
-                self.outString += "ERRORS: \n" + errorMessage
-        file.close()
+            columns = run.columns
+            self.reportLines(self.columnStats(columns), lambda name: self.columnMean(columns[name]),
+                             min(self.cycles[0] - self.cycles[-1] + 1, self.cycles[0]), self.cycles[0])
 
 
-    def averageTemp(self, precursorMax):
+    def loadColumns(self, columns, meta):
         """
-        Helper method to calculate the average temperature of each precursor.
+        Sets the heater arrays and the recipe from parsed columns, of a whole log or of a live run.
 
             Parameters
             ----------
+                columns: dict
+                    one array per heater series, as returned by parseLog()
+                meta: dict
+                    the recipe name
+
+            Returns
+            -------
                 None
+        """
+        self.hTime = columns["hTime"]
+        self.cone = columns["cone"]
+        self.reactor1 = columns["reactor1"]
+        self.reactor2 = columns["reactor2"]
+        self.chuck = columns["chuck"]
+        self.pDelivery = columns["pDelivery"]
+        self.aldValves = columns["aldValves"]
+        self.precursors = [columns["precursor" + str(i + 1)] for i in range(5)]
+        self.cycles = columns["cycles"]
+        self.recipe = meta["recipe"]
+
+
+    def averageTemp(self, precursorMax, mean):
+        """
+        Helper method to calculate the average temperature of each precursor.
+
+            Parameters
+            ----------
+                precursorMax: list
+                    the highest reading of each precursor, precursors that never heated are left out
+                mean: function
+                    returns the average of a column by name
 
             Returns
             -------
@@ -235,14 +209,63 @@ class Heating(Heating_Base):
         for i in range(5):
             if precursorMax[i] == 0.0:
                 continue
-            else:
-                sum = 0
-                for j in self.precursors[i]:
-                    sum += j
-            self.outString += "Average Temp of Precursor " + str(i+1) + ": " + str(round(sum/self.precursors[i].__len__(), 1)) + "\u00b0 C" + "\n\n"
+            self.outString += "Average Temp of Precursor " + str(i+1) + ": " + str(round(mean("precursor" + str(i + 1)), 1)) + "\u00b0 C" + "\n\n"
             # print("Average Temp of Precursor", i+1, ":", str(round(sum/precursors[i].__len__(), 1)) +  "\u00b0 C")
 
 
+    def reportLines(self, stats, mean, completed, total):
+        """
+        Adds the temperatures, cycles and errors of a run to outString, for a finished run (readFile())
+        and for a live run (liveReport()) alike.
+
+            Parameters
+            ----------
+                stats: dict
+                    per column name, {"max", "last"} of the readings, like LiveRun.stats
+                mean: function
+                    returns the average of a column by name
+                completed: int
+                    the completed cycles
+                total: int
+                    the total cycles of the recipe
+
+            Returns
+            -------
+                None
+        """
+        # Max Temp Values for each component
+        reactor1Max = max(0, stats["reactor1"]["max"])
+        reactor2Max = max(0, stats["reactor2"]["max"])
+        chuckMax = max(0, stats["chuck"]["max"])
+        precursorsMax = [max(0, stats["precursor" + str(i + 1)]["max"]) for i in range(5)]
+
+        errorMessage = ""
+        if reactor1Max >= 275:
+            errorMessage += f"Reactor 1 Max Temp Exceeded At {reactor1Max}" + "\u00b0 C" + "\n\n"
+        if reactor2Max >= 275:
+            errorMessage += f"Reactor 2 Max Temp Exceeded At {reactor2Max}" + "\u00b0 C" + "\n\n"
+        if chuckMax >= 275:
+            errorMessage += f"Chuck Max Temp Exceeded At {chuckMax}" + "\u00b0 C" + "\n\n"
+        self.numPrecursors = 0
+        for i in range(5):
+            if precursorsMax[i] >= 275:
+                errorMessage += f"Precursor {i+1} Max Temp Exceeded At {precursorsMax[i]}" + "\u00b0 C" + "\n\n"
+            if precursorsMax[i] != 0.0:
+                self.numPrecursors += 1
+
+        self.outString += "Completed Cycles: " + str(completed) + "/" + str(total) + "\n\n"
+        self.outString += "Number of Precursors Heated: " + str(self.numPrecursors) + "\n\n"
+        self.outString += "Cone Final Temp: " + str(stats["cone"]["last"]) + "\u00b0 C" + "\n\n"
+        self.outString += "Reactor 1 Final Temp: " + str(stats["reactor1"]["last"]) + "\u00b0 C" + "\n\n"
+        self.outString += "Reactor 2 Final Temp: " + str(stats["reactor2"]["last"]) + "\u00b0 C" + "\n\n"
+        self.outString += "Chuck Final Temp: " + str(stats["chuck"]["last"]) + "\u00b0 C" + "\n\n"
+        self.outString += "Precursor Delivery Final Temp: " + str(stats["pDelivery"]["last"]) + "\u00b0 C" + "\n\n"
+        self.outString += "ALD Valves Final Temp: " + str(stats["aldValves"]["last"]) + "\u00b0 C" + "\n\n"
+        self.averageTemp(precursorsMax, mean)
+        if errorMessage != "":
+            self.outString += "ERRORS: \n" + errorMessage
+
+
     def genReport(self):
         """
         Generates a report of the heating data into output text file.
@@ -265,6 +288,68 @@ class Heating(Heating_Base):
         file.close()
 
 
+    def layoutHeating(self, fig):
+        """
+        Lays out the non-precursor heating figure once, plotting only replaces the line data.
+
+            Parameters
+            ----------
+                fig: matplotlib.figure.Figure
+                    the new figure
+
+            Returns
+            -------
+                axes (list): the axes of the figure
+                lines (dict): one line per heater, named after the attribute it plots
+        """
+        axs = fig.subplots(3, 2)
+        fig.suptitle('Non-Precursor Heating Data')
+        fig.supxlabel('Time (s)')
+        fig.supylabel('Temperature (C)')
+        fig.set_size_inches(8, 8)
+        lines = {}
+        lines["cone"], = axs[0, 0].plot([], [], 'tab:blue')
+        axs[0, 0].set_title('Cone')
+        lines["reactor1"], = axs[0, 1].plot([], [], 'tab:orange')
+        axs[0, 1].set_title('Reactor1')
+        lines["reactor2"], = axs[1, 0].plot([], [], 'tab:green')
+        axs[1, 0].set_title('Reactor2')
+        lines["chuck"], = axs[1, 1].plot([], [], 'tab:red')
+        axs[1, 1].set_title('Chuck')
+        lines["pDelivery"], = axs[2, 0].plot([], [], 'tab:purple')
+        axs[2, 0].set_title('Precursor Delivery')
+        lines["aldValves"], = axs[2, 1].plot([], [], 'tab:cyan')
+        axs[2, 1].set_title('ALD Valves')
+        return list(axs.flat), lines
+
+
+    def layoutPrecursors(self, fig):
+        """
+        Lays out the precursor heating figure once, plotting only replaces the line data.
+
+            Parameters
+            ----------
+                fig: matplotlib.figure.Figure
+                    the new figure
+
+            Returns
+            -------
+                axes (list): the axes of the figure
+                lines (dict): one line per precursor, numbered from 1
+        """
+        axs = fig.subplots(3, 2)
+        fig.suptitle('Precursor Heating Data')
+        fig.supxlabel('Time (s)')
+        fig.supylabel('Temperature (C)')
+        fig.set_size_inches(8, 8)
+        colors = ['tab:blue', 'tab:orange', 'tab:green', 'tab:red', 'tab:purple']
+        lines = {}
+        for i in range(5):
+            lines[i + 1], = axs[i // 2, i % 2].plot([], [], colors[i])
+            axs[i // 2, i % 2].set_title('Precursor ' + str(i+1))
+        return list(axs.flat), lines
+
+
     def plotHeating(self):
         """
         Generates a plot of the heating data and saves it to the Output_Plots directory.
@@ -288,54 +373,27 @@ class Heating(Heating_Base):
         except FileNotFoundError:
             pass
         
+        renderer = get_renderer()
+
         # Plotting the Heating Data
         # Graph the Non-Precursor Temperature Data
-        fig, axs = plt.subplots(3, 2)
-        fig.suptitle('Non-Precursor Heating Data')
-        fig.supxlabel('Time (s)')
-        fig.supylabel('Temperature (C)')
-        fig.set_size_inches(8, 8)
-        axs[0, 0].plot(self.hTime, self.cone, 'tab:blue')
-        axs[0, 0].set_title('Cone')
-        axs[0, 1].plot(self.hTime, self.reactor1, 'tab:orange')
-        axs[0, 1].set_title('Reactor1')
-        axs[1, 0].plot(self.hTime, self.reactor2, 'tab:green')
-        axs[1, 0].set_title('Reactor2')
-        axs[1, 1].plot(self.hTime, self.chuck, 'tab:red')
-        axs[1, 1].set_title('Chuck')
-        axs[2, 0].plot(self.hTime, self.pDelivery, 'tab:purple')
-        axs[2, 0].set_title('Precursor Delivery')
-        axs[2, 1].plot(self.hTime, self.aldValves, 'tab:cyan')
-        axs[2, 1].set_title('ALD Valves')
-        fig.tight_layout()
-        fig.savefig(np_path)
-        # plt.show()
-        
+        plot = renderer.acquire(("Heating", "Fiji202"), self.layoutHeating)
+        for name in plot.lines:
+            plot.set_line(name, self.hTime, getattr(self, name))
+        plot.rescale()
+        renderer.submit(plot, np_path)
+
         # Plotting the Precursor Data
         if self.numPrecursors > 0:
-            fig, axs = plt.subplots(3, 2)
-            fig.suptitle('Precursor Heating Data')
-            fig.supxlabel('Time (s)')
-            fig.supylabel('Temperature (C)')
-            fig.set_size_inches(8, 8)
-            colors = ['tab:blue', 'tab:orange', 'tab:green', 'tab:red', 'tab:purple']
+            plot = renderer.acquire(("Precursors", "Fiji202", 5), self.layoutPrecursors)
             for i in range(5):
-                if self.precursors[i].__len__() > 0:
-                    axs[i // 2, i % 2].plot(self.hTime, self.precursors[i], colors[i])
-                    axs[i // 2, i % 2].set_title('Precursor ' + str(i+1))
-            fig.tight_layout()
-            fig.savefig(p_path)
-            # plt.show()
+                plot.set_line(i + 1, self.hTime, self.precursors[i])
+            plot.rescale()
+            renderer.submit(plot, p_path)
 
         else:
-            fig = plt.figure()
-            fig.suptitle('Precursor Heating Data')
-            fig.set_size_inches(8, 8)
-            fig.supxlabel('Time (s)')
-            fig.supylabel('Temperature (C)')
-            fig.tight_layout()
-            fig.savefig(p_path)
-            # plt.show()
+            plot = renderer.acquire(("Precursors", 0), empty_figure('Precursor Heating Data', 'Time (s)', 'Temperature (C)'))
+            renderer.submit(plot, p_path)
             print("GRAPHING ABORTED AT: \"src/Machines/Fiji202/Heating.py\" AT METHOD: plotHeating(), No Precursor Data")
 
 
@@ -352,23 +410,11 @@ class Heating(Heating_Base):
                 True (bool): if there is new data
                 False (bool): if there is no new data
         """
-        stack = []
-        process_path = os.path.join(self.dataPath, "process_stack.txt")
-        with open(process_path, "r") as file:
-            stack = file.read().splitlines()
-            file.close()
         if self.ignoreRecipe():
             return False
-        elif stack.__len__() == 0:
-            with open(process_path, "a+") as file:
-                file.write(self.heatingFilePath + "\n")
-                file.close()
-        elif stack.count(self.heatingFilePath) > 0:
+        # Skip files that are already in the processed file index
+        if not claim(self.dataPath, "Heating", self.heatingFilePath):
             return False
-        else:
-            with open(process_path, "a+") as file:
-                file.write(self.heatingFilePath + "\n")
-                file.close()
 
         self.genReport()
         self.plotHeating()
@@ -389,24 +435,12 @@ class Heating(Heating_Base):
             -------
                 heatingFilePath (str): the file path of the new data
         """
-        stack = []
-        process_path = os.path.join(self.dataPath, "process_stack.txt")
         print("RECIPE:", self.recipe)
-        with open(process_path, "r") as file:
-            stack = file.read().splitlines()
-            file.close()
         if self.ignoreRecipe():
             return None
-        elif stack.__len__() == 0:
-            with open(process_path, "a+") as file:
-                file.write(self.heatingFilePath + "\n")
-                file.close()
-        elif stack.count(self.heatingFilePath) > 0:
+        # Skip files that are already in the processed file index
+        if not claim(self.dataPath, "Heating", self.heatingFilePath):
             return None
-        else:
-            with open(process_path, "a+") as file:
-                file.write(self.heatingFilePath + "\n")
-                file.close()
 
         print("Sent data Successfully for:", self.heatingFilePath)
         return self.heatingFilePath
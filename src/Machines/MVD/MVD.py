@@ -1,7 +1,9 @@
 from src.Machines.MVD.Pressure import Pressure
 from src.Machines.MVD.Heating import Heating
-from src.uploader import Uploader
+from src.uploader import get_upload_queue
 from src.Machines.BaseClasses.Runner_Base import Runner_Base
+from src.stability import get_tracker
+from src.renderer import get_renderer
 
 import timeit
 import os
@@ -19,19 +21,23 @@ class MVD(Runner_Base):
     -------
     changeName(filepath, append)
         Changes the name of a file by appending a string to the file name. 
-    copy_item(src, dst)
+    copy_item(src, dst, link=False)
         Copy an item (file or directory) from src to dst.
-    copy_sources_to_new_folder(src_items, base_dst_folder)
+    copy_sources_to_new_folder(src_items, base_dst_folder, link=False)
         Copies the contents of source items (files or folders) to a new folder in base_dst_folder.
+    stage_raw(src_items, base_dst_folder)
+        Places the renamed raw logs of a run in a new folder, compressed into one archive if RAW_COMPRESSION is set.
     copy_folder_contents(src_folder1, src_folder2, base_dst_folder)
         Copies the contents of src_folder1 and src_folder2 to a new folder in base_dst_folder.
-    verify_transfer(dataPath)
+    verify_transfer(dataPath, channels=None)
         Verifies that the transfer of source items to the destination folder was successful.
     calculate_checksum(file_path)
         Calculate the checksum of the file contents.
-    has_stopped_updating(file_path, max_no_change_cycles=3)
+    has_stopped_updating(file_path, max_no_change_cycles=3, channels=None)
         Monitor a file for updates and return True if no updates are detected
         for max_no_change_cycles consecutive cycles.
+    run_live(channels)
+        Refreshes the live reports and plots of a machine whose data files are still updating.
     run()
         Runs the Pressure and Heating algorithms for all MVD machines and uploads the results to the cloud storage.
     """
@@ -52,7 +58,7 @@ class MVD(Runner_Base):
         pass
 
 
-    def verify_transfer(self, dataPath):
+    def verify_transfer(self, dataPath, channels=None):
         """
         Verifies that the transfer of source items to the destination folder was successful.
 
@@ -60,13 +66,14 @@ class MVD(Runner_Base):
             -----------
                 dataPath: str
                     the path to the data folder for the machine
+                channels: tuple
+                    the Pressure and Heating objects of the machine, shared with process(), created if None
 
             Returns
             -------
                 bool: True if the files are synced, False otherwise
         """
-        p = Pressure(dataPath)
-        h = Heating(dataPath)
+        p, h = channels if channels is not None else (Pressure(dataPath), Heating(dataPath))
         if os.path.basename(p.mostRecent()) == os.path.basename(h.mostRecent()):
             print(f"Machine data files are currently synced on local for data path: {dataPath}")
             return True
@@ -74,7 +81,7 @@ class MVD(Runner_Base):
             return False
 
 
-    def has_stopped_updating(self, dataPath, max_no_change_cycles=3):
+    def has_stopped_updating(self, dataPath, max_no_change_cycles=3, channels=None):
         """
         Monitor a file for updates and return True if no updates are detected
         for max_no_change_cycles consecutive cycles.
@@ -87,127 +94,125 @@ class MVD(Runner_Base):
                     Time in seconds to wait between checks.
                 max_no_change_cycles: int
                     Number of cycles to wait with no changes.
+                channels: tuple
+                    the Pressure and Heating objects of the machine, shared with process(), created if None
 
             Returns
             -------
                 bool: True if the file stopped updating, False otherwise.
         """
-        pFile = Pressure(dataPath).mostRecent()
-        hFile = Heating(dataPath).mostRecent()
+        p, h = channels if channels is not None else (Pressure(dataPath), Heating(dataPath))
+        pFile = p.mostRecent()
+        hFile = h.mostRecent()
         pSum = self.calculate_checksum(pFile)
         hSum = self.calculate_checksum(hFile)
 
-        metadataPath = os.path.join(dataPath, "metadata.txt")
-
-        with open(metadataPath, 'a+') as file:
-            file.write(pSum + "\n")
-            file.write(hSum + "\n")
-
-        with open(metadataPath, 'r') as file:
-            lines = [line.strip() for line in file.readlines() if line.strip()]
-            if len(lines) < (2 * max_no_change_cycles):
-                return False
-            lastCheck = lines[(-2 * max_no_change_cycles):]
-        # print("Last 6 Checksums: ", lastCheck)
-        # print("[DEBUG] Pressure Checksum: ", pSum)
-        # print("[DEBUG] Heating Checksum: ", hSum)
-        print("[DEBUG] Num of Matching Pressure Checksums: ", lastCheck.count(pSum))
-        print("[DEBUG] Num of Matching Heating Checksums: ", lastCheck.count(hSum))
-        if (lastCheck.count(pSum) == max_no_change_cycles) and (lastCheck.count(hSum) == max_no_change_cycles):
-            with open(metadataPath, 'w') as file:
-                file.write("")
+        # Checksums of the last max_no_change_cycles cycles, kept in a bounded ring buffer
+        tracker = get_tracker(os.path.join(dataPath, "metadata.txt"), 2, max_no_change_cycles)
+        stable = tracker.record((pSum, hSum))
+        if stable:
             return True
-        else:
-            return False
+        print("[DEBUG] Num of Matching Pressure Checksums: ", tracker.count(0, pSum))
+        print("[DEBUG] Num of Matching Heating Checksums: ", tracker.count(1, hSum))
+        return False
 
 
-    def run(self):
+    def run(self, register=None):
         """
         Runs the Pressure and Heating algorithms for all MVD machines and uploads the results to the cloud storage.
 
             Parameters
             -----------
-                None
+                register: list
+                    already parsed register entries, read from register.txt if None
             
             Returns
             -------
                 None
         """
         # RUN ALGS
-        start = timeit.default_timer()
-        file = open(os.path.join("src", "register.txt"), "r")
-        runMachine = []
-        raw = []
-        for line in file:
-            m = tuple(line.strip().split())
-            if m[0] == "MVD":
-                runMachine.append(m)
-                for i in range(len(m)):
-                    if m[i] == "raw":
-                        raw.append(True)
-                    else:
-                        raw.append(False)
-        file.close()
-        # Raw file handling
+        runMachine, raw = self.load_machines("MVD", register)
         for machine in runMachine:
-            dataPath = os.path.join("src", "Machines", f"{machine[0]}", f"data({machine[1]})")
-
-            if not self.has_stopped_updating(dataPath):
-                print(f"[NOTICE]: Machine data files are still updating OR awaiting new files\n skipping algs for data path: {dataPath}")
-                continue
-            if not self.verify_transfer(dataPath):
-                print(f"[WARNING]: Machine data files are NOT synced on local\n skipping algs for data path: {dataPath}")
-                continue
-
-            p = Pressure(dataPath)
-            h = Heating(dataPath)
-            # Uploading raw files
-            if raw[runMachine.index(machine)]:
-                newp = p.runRaw()
-                newh = h.runRaw()
-                # If new raw files are found, change their names and upload them
-                if newp and newh:
-                    newp = self.changeName(newp, "Pressure")
-                    newh = self.changeName(newh, "Heating")
-                    src_items = [newp, newh]
-                    dirname = self.copy_sources_to_new_folder(src_items,
-                                                              os.path.join(dataPath, "Output_Data"))
-                    # FIND ROOT DIRECTORY OF CLOUD STORAGE
-                    file = open(os.path.join("src", "rclone.txt"), "r")
-                    root = file.readline().strip()
-                    if root == "":
-                        print("Cloud Storage Not Found, Skipping Upload...")
-                        file.close()
-                        return
+            self.process(machine, raw[runMachine.index(machine)])
+
+
+    def process(self, machine, raw=False):
+        """
+        Runs the Pressure and Heating algorithms for one MVD machine and uploads the results to the cloud storage.
+
+            Parameters
+            -----------
+                machine: tuple
+                    the register entry of the machine
+                raw: bool
+                    True if the raw files are uploaded instead of the processed output
+            
+            Returns
+            -------
+                None
+        """
+        start = timeit.default_timer()
+        dataPath = os.path.join("src", "Machines", f"{machine[0]}", f"data({machine[1]})")
+
+        # One set of channel objects for the whole cycle, the checks and the algorithms share them
+        p = Pressure(dataPath)
+        h = Heating(dataPath)
+        channels = (p, h)
+
+        if not self.has_stopped_updating(dataPath, channels=channels):
+            print(f"[NOTICE]: Machine data files are still updating OR awaiting new files\n skipping algs for data path: {dataPath}")
+            self.run_live(channels)
+            return
+        if not self.verify_transfer(dataPath, channels=channels):
+            print(f"[WARNING]: Machine data files are NOT synced on local\n skipping algs for data path: {dataPath}")
+            return
+
+        # Uploading raw files
+        if raw:
+            newp = p.runRaw()
+            newh = h.runRaw()
+            # If new raw files are found, change their names and upload them
+            if newp and newh:
+                newp = self.changeName(newp, "Pressure")
+                newh = self.changeName(newh, "Heating")
+                src_items = [newp, newh]
+                dirname, archived = self.stage_raw(src_items, os.path.join(dataPath, "Output_Data"))
+                # FIND ROOT DIRECTORY OF CLOUD STORAGE
+                file = open(os.path.join("src", "rclone.txt"), "r")
+                root = file.readline().strip()
+                if root == "":
+                    print("Cloud Storage Not Found, Skipping Upload...")
                     file.close()
-                    # UPLOAD TO CLOUD STORAGE
-                    up = Uploader(os.path.join(dataPath, "Output_Data", f"{dirname}"),
-                                    os.path.join(root, machine[0], machine[1], dirname))
-                    up.rclone()
-            # Uploading normal output files
-            else:
-                newp = p.run()
-                newh = h.run()
-                stop = timeit.default_timer()
-                print('Data Processing Runtime: ', stop - start)
-                if newp and newh:
-                    # ADD DATE TIME TO NEW DIRECTORY NAME
-                    out_plot = os.path.join(dataPath, "Output_Plots")
-                    out_text = os.path.join(dataPath, "Output_Text")
-                    dirname = self.copy_folder_contents(newh, out_plot, out_text,
-                                                        os.path.join(dataPath, "Output_Data"))
-                    # FIND ROOT DIRECTORY OF CLOUD STORAGE
-                    file = open(os.path.join("src", "rclone.txt"), "r")
-                    root = file.readline().strip()
-                    if root == "":
-                        print("Cloud Storage Not Found, Skipping Upload...")
-                        file.close()
-                        return
+                    return
+                file.close()
+                # UPLOAD TO CLOUD STORAGE, batched with the other machines on the upload thread
+                get_upload_queue().submit(os.path.join(dataPath, "Output_Data", f"{dirname}"), root,
+                                          os.path.join(machine[0], machine[1], dirname), archived=archived)
+        # Uploading normal output files
+        else:
+            newp = p.run()
+            newh = h.run()
+            # The plots are encoded on the render threads, wait for them before the outputs are copied
+            get_renderer().flush()
+            stop = timeit.default_timer()
+            print('Data Processing Runtime: ', stop - start)
+            if newp and newh:
+                # ADD DATE TIME TO NEW DIRECTORY NAME
+                out_plot = os.path.join(dataPath, "Output_Plots")
+                out_text = os.path.join(dataPath, "Output_Text")
+                dirname = self.copy_folder_contents(newh, out_plot, out_text,
+                                                    os.path.join(dataPath, "Output_Data"))
+                # FIND ROOT DIRECTORY OF CLOUD STORAGE
+                file = open(os.path.join("src", "rclone.txt"), "r")
+                root = file.readline().strip()
+                if root == "":
+                    print("Cloud Storage Not Found, Skipping Upload...")
                     file.close()
-                    # UPLOAD TO CLOUD STORAGE
-                    up = Uploader(os.path.join(dataPath, "Output_Data", f"{dirname}"),
-                                    os.path.join(root, machine[0], machine[1], dirname))
-                    up.rclone()
+                    return
+                file.close()
+                # UPLOAD TO CLOUD STORAGE, batched with the other machines on the upload thread
+                get_upload_queue().submit(os.path.join(dataPath, "Output_Data", f"{dirname}"), root,
+                                          os.path.join(machine[0], machine[1], dirname))
 
 
 def main():
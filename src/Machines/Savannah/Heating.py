@@ -1,7 +1,23 @@
-import matplotlib.pyplot as plt
 import os
+import numpy as np
 from datetime import datetime
 from src.Machines.BaseClasses.Heating_Base import Heating_Base
+from src.processed_index import claim
+from src.renderer import get_renderer, empty_figure
+from src.parsed_run import parsed_run
+from src.log_reader import LogFormat
+
+
+# Layout of the Savannah heating logs: time, 5 heaters, a precursor column per precursor up to the
+# first value >= 1000, 2 unused columns, cycle, recipe name
+HEATING_LOG = LogFormat("Heater", [
+    ("hTime", 0, "f8"),
+    ("trap", 1, "f8"),
+    ("stopValve", 2, "f8"),
+    ("outerHeater", 3, "f8"),
+    ("innerHeater", 4, "f8"),
+    ("pManifold", 5, "f8")],
+    block=("precursors", 6, 1000, "numPrecursors"), tail=[("cycles", 3, "i8")])
 
 
 class Heating(Heating_Base):
@@ -10,24 +26,26 @@ class Heating(Heating_Base):
 
     Attributes
     ----------
-    hTime : list
-        a list of the time data for the heater
-    trap : list
-        a list of the trap data for the heater
-    stopValve : list
-        a list of the stop valve data for the heater
-    outerHeater : list
-        a list of the outer heater data for the heater
-    innerHeater : list
-        a list of the inner heater data for the heater
-    pManifold : list
-        a list of the precursor manifold data for the heater
+    hTime : numpy.ndarray
+        the time data for the heater
+    trap : numpy.ndarray
+        the trap data for the heater
+    stopValve : numpy.ndarray
+        the stop valve data for the heater
+    outerHeater : numpy.ndarray
+        the outer heater data for the heater
+    innerHeater : numpy.ndarray
+        the inner heater data for the heater
+    pManifold : numpy.ndarray
+        the precursor manifold data for the heater
     precursors : list
-        a list of lists of the precursor data for the heater
+        a list of arrays of the precursor data for the heater
+    precursorBlock : numpy.ndarray
+        the precursor data for the heater, one column per precursor
     numPrecursors : int
         the number of precursors in the data
-    cycles : list
-        a list of the cycles data for the heater
+    cycles : numpy.ndarray
+        the cycles data for the heater
     dataPath : str
         the path to the directory that contains the data for the machine
     heatingFilePath : str
@@ -57,14 +75,24 @@ class Heating(Heating_Base):
     -------
     readDir():
         Reads through directory and prints out how many of each recipe is in the directory
+    parseLog(path):
+        Parses a heating log into arrays, called through the parsed run cache.
     readFile():
         Reads through the txt file and prints out the recipe, pressure, time, and cycles
+    loadColumns(columns, meta):
+        Sets the heater arrays and the recipe from parsed columns
     parseTitles():
         Parses through the titles of the files and counts how many of each recipe is in the directory
-    averageTemp():
+    averageTemp(mean):
         Helper method to calculate the average temperature of each precursor
+    reportLines(stats, mean, completed, total):
+        Adds the temperatures and cycles of a run to the report
     genReport():
         Generates the report and returns it as a string
+    layoutHeating(fig):
+        Lays out the non-precursor heating figure template
+    layoutPrecursors(fig, numPrecursors):
+        Lays out the precursor heating figure template
     plotHeating():
         Generates a plot of the data and saves it to the Output_Plots directory
     initialize():
@@ -77,7 +105,11 @@ class Heating(Heating_Base):
         Runs the Heating algorithm
     runRaw():
         Runs the Heating algorithm
+    runLive():
+        Refreshes the live report and plots of a log that is still being written
     """
+
+    logFormat = HEATING_LOG
     
     def __init__(self, dataPath):
         """
@@ -105,105 +137,105 @@ class Heating(Heating_Base):
                 None
         """
         path = self.heatingFilePath
-        self.hTime = []
-        self.trap = []
-        self.stopValve = []
-        self.outerHeater = []
-        self.innerHeater = []
-        self.pManifold = []
-        self.precursors = [[], [], [], [], []]
-        self.numPrecursors = 0
-        self.cycles = []
-        self.recipe = ""
-
-        # If the file is empty
-        empty = True
-        # Iterator to find line 1 of file, which contains the recipe name at the end
-        iter = 0
 
         try:
             foobar = open(path)
         except FileNotFoundError:
             print("FILE NOT FOUND, PROCESS ABORTE AT: \"src/Machines/Savannah/Heating.py\" AT METHOD: readFile(). \n Hint: Try putting in a valid file path.")
             raise FileNotFoundError
+        foobar.close()
 
-        # main loop to read through the file line by line
-        with open(path, "r") as file:
-            for line in file:
-                data = line.strip().split()
-                try:
-                    foobar = data[0]
-                except IndexError:
-                    continue
-                if data[0] == "Heater":
-                    continue
-                
-                # If the file is not empty, record the data
-                empty = False
-                self.hTime.append(float(data[0]))
-                self.trap.append(float(data[1]))
-                self.stopValve.append(float(data[2]))
-                self.outerHeater.append(float(data[3]))
-                self.innerHeater.append(float(data[4]))
-                self.pManifold.append(float(data[5]))
-                
-                # Find the number of precursors
-                index = 6
-                while float(data[index]) < 1000:
-                    index += 1
-                self.numPrecursors = index - 6
-                # Record the precursor data
-                for j in range(self.numPrecursors):
-                    self.precursors[j].append(float(data[j+6]))
-
-                # record cycles data which is after the precursor data
-                self.cycles.append(int(data[index+3]))
-
-                iter += 1
-                # Find the recipe name
-                if iter == 1:
-                    for j in range(index + 4, data.__len__(), 1):
-                        self.recipe += data[j] + " "
-                    self.recipe = self.recipe.strip()
-                    # for key in self.ingredientStack:
-                    #     if self.recipe.find(key) != -1:
-                    #         self.recipe = key
+        # Parsed once per version of the file, shared with every other step that reads it
+        run = parsed_run(path, "Heating", self.parseLog)
+        self.loadColumns(run.columns, run.meta)
+        # If the file is empty
+        empty = self.hTime.__len__() == 0
 
 
         # if the file is not empty, print out the data
         if not empty:
-            if (self.cycles[0] - self.cycles[-1] + 1) > self.cycles[0]:
-                self.outString += "Completed Cycles: " + str(self.cycles[0]) + "/" + str(self.cycles[0]) + "\n\n"
-            else:
-                self.outString += "Completed Cycles: " + str(self.cycles[0] - self.cycles[-1] + 1) + "/" + str(self.cycles[0]) + "\n\n"
-            self.outString += "Number of Precursors: " + str(self.numPrecursors) + "\n\n"
-            self.outString += "Inner Heater Final Temp: " + str(self.innerHeater[-1]) + "\u00b0 C" + "\n\n"
-            self.outString += "Outer Heater Final Temp: " + str(self.outerHeater[-1]) + "\u00b0 C" + "\n\n"
-            self.averageTemp()
-        file.close()
+            columns = run.columns
+            self.reportLines(self.columnStats(columns), lambda name: self.columnMean(columns[name]),
+                             min(self.cycles[0] - self.cycles[-1] + 1, self.cycles[0]), self.cycles[0])
 
 
-    def averageTemp(self):
+    def loadColumns(self, columns, meta):
         """
-        Helper method to calculate the average temperature of each precursor.
+        Sets the heater arrays and the recipe from parsed columns, of a whole log or of a live run.
 
             Parameters
             ----------
+                columns: dict
+                    one array per heater series, as returned by parseLog()
+                meta: dict
+                    the recipe name and the number of precursors
+
+            Returns
+            -------
                 None
+        """
+        self.hTime = columns["hTime"]
+        self.trap = columns["trap"]
+        self.stopValve = columns["stopValve"]
+        self.outerHeater = columns["outerHeater"]
+        self.innerHeater = columns["innerHeater"]
+        self.pManifold = columns["pManifold"]
+        self.numPrecursors = meta["numPrecursors"]
+        self.precursorBlock = columns["precursors"]
+        self.precursors = [self.precursorBlock[:, j] for j in range(self.numPrecursors)]
+        self.cycles = columns["cycles"]
+        self.recipe = meta["recipe"]
+
+
+    def averageTemp(self, mean):
+        """
+        Helper method to calculate the average temperature of each precursor.
+
+            Parameters
+            ----------
+                mean: function
+                    returns the average of a column by name
 
             Returns
             -------
                 None
         """
-        self.outString
+        if self.numPrecursors == 0:
+            return
+        # Average of every precursor column in one reduction
+        averages = mean("precursors")
         for i in range(self.numPrecursors):
-            sum = 0
-            for j in range(self.precursors[i].__len__()):
-                sum += self.precursors[i][j]
-            self.outString += "Average Temp of Precursor " + str(i+1) + ": " + str(round(sum/self.precursors[i].__len__(), 1)) + "\u00b0 C" + "\n\n"
+            self.outString += "Average Temp of Precursor " + str(i+1) + ": " + str(round(averages[i], 1)) + "\u00b0 C" + "\n\n"
             # print("Average Temp of Precursor", i+1, ":", str(round(sum/precursors[i].__len__(), 1)) +  "\u00b0 C")
 
 
+    def reportLines(self, stats, mean, completed, total):
+        """
+        Adds the temperatures and cycles of a run to outString, for a finished run (readFile())
+        and for a live run (liveReport()) alike.
+
+            Parameters
+            ----------
+                stats: dict
+                    per column name, {"max", "last"} of the readings, like LiveRun.stats
+                mean: function
+                    returns the average of a column by name
+                completed: int
+                    the completed cycles
+                total: int
+                    the total cycles of the recipe
+
+            Returns
+            -------
+                None
+        """
+        self.outString += "Completed Cycles: " + str(completed) + "/" + str(total) + "\n\n"
+        self.outString += "Number of Precursors: " + str(self.numPrecursors) + "\n\n"
+        self.outString += "Inner Heater Final Temp: " + str(stats["innerHeater"]["last"]) + "\u00b0 C" + "\n\n"
+        self.outString += "Outer Heater Final Temp: " + str(stats["outerHeater"]["last"]) + "\u00b0 C" + "\n\n"
+        self.averageTemp(mean)
+
+
     def genReport(self):
         """
         Generates a report of the heating data into output text file.
@@ -226,6 +258,68 @@ class Heating(Heating_Base):
         file.close()
 
 
+    def layoutHeating(self, fig):
+        """
+        Lays out the non-precursor heating figure once, plotting only replaces the line data.
+
+            Parameters
+            ----------
+                fig: matplotlib.figure.Figure
+                    the new figure
+
+            Returns
+            -------
+                axes (list): the axes of the figure
+                lines (dict): one line per heater, named after the attribute it plots
+        """
+        axs = fig.subplots(3, 2)
+        fig.suptitle('Non-Precursor Heating Data')
+        fig.supxlabel('Time (s)')
+        fig.supylabel('Temperature (C)')
+        fig.set_size_inches(8, 8)
+        lines = {}
+        lines["trap"], = axs[0, 0].plot([], [], 'tab:blue')
+        axs[0, 0].set_title('Trap/Pump')
+        lines["stopValve"], = axs[0, 1].plot([], [], 'tab:orange')
+        axs[0, 1].set_title('Stop Valve')
+        lines["outerHeater"], = axs[1, 0].plot([], [], 'tab:green')
+        axs[1, 0].set_title('Outer Heater')
+        lines["innerHeater"], = axs[1, 1].plot([], [], 'tab:red')
+        axs[1, 1].set_title('Inner Heater')
+        lines["pManifold"], = axs[2, 0].plot([], [], 'tab:purple')
+        axs[2, 0].set_title('Precursor Manifold')
+        return list(axs.flat), lines
+
+
+    def layoutPrecursors(self, fig, numPrecursors):
+        """
+        Lays out the precursor heating figure once, plotting only replaces the line data.
+
+            Parameters
+            ----------
+                fig: matplotlib.figure.Figure
+                    the new figure
+                numPrecursors: int
+                    the number of precursors, one row each
+
+            Returns
+            -------
+                axes (list): the axes of the figure
+                lines (dict): one line per precursor, numbered from 1
+        """
+        axs = fig.subplots(numPrecursors, 1, squeeze=False)[:, 0]
+        fig.suptitle('Precursor Heating Data')
+        fig.supxlabel('Time (s)')
+        fig.supylabel('Temperature (C)')
+        fig.set_size_inches(8, 8)
+        colors = ['tab:blue', 'tab:orange', 'tab:green', 'tab:red', 'tab:purple']
+        lines = {}
+        for i in range(numPrecursors):
+            lines[i + 1], = axs[i].plot([], [], colors[i])
+            axs[i].set_title('Precursor ' + str(i + 1))
+        return list(axs), lines
+
+
     def plotHeating(self):
         """
         Generates a plot of the heating data and saves it to the Output_Plots directory.
@@ -249,51 +343,28 @@ class Heating(Heating_Base):
         except FileNotFoundError:
             pass
         
+        renderer = get_renderer()
+
         # Plotting the Heating Data
         # Graph the Non-Precursor Temperature Data
-        fig, axs = plt.subplots(3, 2)
-        fig.suptitle('Non-Precursor Heating Data')
-        fig.supxlabel('Time (s)')
-        fig.supylabel('Temperature (C)')
-        fig.set_size_inches(8, 8)
-        axs[0, 0].plot(self.hTime, self.trap, 'tab:blue')
-        axs[0, 0].set_title('Trap/Pump')
-        axs[0, 1].plot(self.hTime, self.stopValve, 'tab:orange')
-        axs[0, 1].set_title('Stop Valve')
-        axs[1, 0].plot(self.hTime, self.outerHeater, 'tab:green')
-        axs[1, 0].set_title('Outer Heater')
-        axs[1, 1].plot(self.hTime, self.innerHeater, 'tab:red')
-        axs[1, 1].set_title('Inner Heater')
-        axs[2, 0].plot(self.hTime, self.pManifold, 'tab:purple')
-        axs[2, 0].set_title('Precursor Manifold')
-        fig.tight_layout()
-        fig.savefig(np_path)
-        # plt.show()
-        
+        plot = renderer.acquire(("Heating", "Savannah"), self.layoutHeating)
+        for name in plot.lines:
+            plot.set_line(name, self.hTime, getattr(self, name))
+        plot.rescale()
+        renderer.submit(plot, np_path)
+
         # Plotting the Precursor Data
         if self.numPrecursors > 0:
-            fig, axs = plt.subplots(self.numPrecursors, 1)
-            fig.suptitle('Precursor Heating Data')
-            fig.supxlabel('Time (s)')
-            fig.supylabel('Temperature (C)')
-            fig.set_size_inches(8, 8)
-            colors = ['tab:blue', 'tab:orange', 'tab:green', 'tab:red', 'tab:purple']
+            numPrecursors = self.numPrecursors
+            plot = renderer.acquire(("Precursors", "Savannah", numPrecursors), lambda fig: self.layoutPrecursors(fig, numPrecursors))
             for i in range(self.numPrecursors):
-                axs[i].plot(self.hTime, self.precursors[i], colors[i])
-                axs[i].set_title('Precursor ' + str(i + 1))
-            fig.tight_layout()
-            fig.savefig(p_path)
-            # plt.show()
+                plot.set_line(i + 1, self.hTime, self.precursors[i])
+            plot.rescale()
+            renderer.submit(plot, p_path)
 
         else:
-            fig = plt.figure()
-            fig.suptitle('Precursor Heating Data')
-            fig.set_size_inches(8, 8)
-            fig.supxlabel('Time (s)')
-            fig.supylabel('Temperature (C)')
-            fig.tight_layout()
-            fig.savefig(p_path)
-            # plt.show()
+            plot = renderer.acquire(("Precursors", 0), empty_figure('Precursor Heating Data', 'Time (s)', 'Temperature (C)'))
+            renderer.submit(plot, p_path)
             print("GRAPHING ABORTED AT: \"src/Machines/Savannah/Heating.py\" AT METHOD: plotHeating(), No Precursor Data")
 
 
@@ -309,23 +380,11 @@ class Heating(Heating_Base):
             -------
                 recipe (str): the name of the recipe for the machine
         """
-        stack = []
-        process_path = os.path.join(self.dataPath, "process_stack.txt")
-        with open(process_path, "r") as file:
-            stack = file.read().splitlines()
-            file.close()
         if self.ignoreRecipe():
             return False
-        elif stack.__len__() == 0:
-            with open(process_path, "a+") as file:
-                file.write(self.heatingFilePath + "\n")
-                file.close()
-        elif stack.count(self.heatingFilePath) > 0:
+        # Skip files that are already in the processed file index
+        if not claim(self.dataPath, "Heating", self.heatingFilePath):
             return False
-        else:
-            with open(process_path, "a+") as file:
-                file.write(self.heatingFilePath + "\n")
-                file.close()
 
         self.genReport()
         self.plotHeating()
@@ -346,24 +405,12 @@ class Heating(Heating_Base):
             -------
                 heatingFilePath (str): the file path of the new data
         """
-        stack = []
-        process_path = os.path.join(self.dataPath, "process_stack.txt")
         print("RECIPE:", self.recipe)
-        with open(process_path, "r") as file:
-            stack = file.read().splitlines()
-            file.close()
         if self.ignoreRecipe():
             return None
-        elif stack.__len__() == 0:
-            with open(process_path, "a+") as file:
-                file.write(self.heatingFilePath + "\n")
-                file.close()
-        elif stack.count(self.heatingFilePath) > 0:
+        # Skip files that are already in the processed file index
+        if not claim(self.dataPath, "Heating", self.heatingFilePath):
             return None
-        else:
-            with open(process_path, "a+") as file:
-                file.write(self.heatingFilePath + "\n")
-                file.close()
 
         print("Sent data for:", self.heatingFilePath)
         return self.heatingFilePath
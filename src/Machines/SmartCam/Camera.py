@@ -1,5 +1,6 @@
 import os
 from datetime import datetime
+from src.dir_index import directory_index
 
 
 class Camera:
@@ -25,7 +26,7 @@ class Camera:
         """
         path = self.cameraDirPath
         try:
-            self.dir_list = os.listdir(path)
+            self.dir_list = directory_index.names(path)
         except NotADirectoryError:
             print("DIRECTORY NOT FOUND, PROCESS ABORTED AT: \"src/Machines/SmartCam/Camera.py\" AT METHOD: readDir(). \n Hint: Try putting in a valid directory path.")
             raise NotADirectoryError
@@ -42,22 +43,15 @@ class Camera:
             
             Returns
             -------
-                times[-1][0] (str): the file path of the most recent file
+                newest (str): the file path of the most recent file
         """
-        # tuples of (filename, creation time)
         self.readDir()
-        times = []
-        listFiles = self.dir_list
-        for i in listFiles:
-            filepath = self.cameraDirPath + "/" + i
-            # get creation time
-            times.append((filepath, os.path.getctime(filepath)))
-        if times.__len__() == 0:
+        # newest entry by creation time, shared with every other check of this directory
+        newest = directory_index.newest(self.cameraDirPath)
+        if newest is None:
             print("NO FILES FOUND, PROCESS ABORTED AT: \"src/Machines/SmartCam/Camera.py\" AT METHOD: mostRecent(). \n Hint: Ansible may have trouble copying files.")
             return None
-        # sort by creation time
-        times.sort(key=lambda x: x[1])
-        return times[-1][0]
+        return newest
     
 
     def initialize(self):
@@ -0,0 +1,60 @@
+import importlib
+import os
+
+
+# Machine type (first column of register.txt) -> (runner module, runner class)
+RUNNERS = {
+    "Fiji200": ("src.Machines.Fiji200.Fiji200", "Fiji200"),
+    "Fiji202": ("src.Machines.Fiji202.Fiji202", "Fiji202"),
+    "MVD": ("src.Machines.MVD.MVD", "MVD"),
+    "Savannah": ("src.Machines.Savannah.Savannah", "Savannah"),
+    "SmartCam": ("src.Machines.SmartCam.SmartCam", "SmartCam"),
+}
+
+# Runner classes that have already been imported in this process
+_loaded = {}
+
+
+def read_register(path=os.path.join("src", "register.txt")):
+    """
+    Reads the register.txt file into a list of machine entries.
+
+        Parameters
+        ----------
+            path: str
+                the path to the register file
+
+        Returns
+        -------
+            list: one tuple of whitespace separated values per registered machine
+    """
+    register = []
+    with open(path, "r") as file:
+        for line in file:
+            values = tuple(line.strip().split())
+            if values:
+                register.append(values)
+    return register
+
+
+def get_runner(machineType):
+    """
+    Returns the Runner_Base subclass for a machine type, importing its module on first use only.
+
+        Parameters
+        ----------
+            machineType: str
+                the machine type as written in register.txt (e.g. Fiji200)
+
+        Returns
+        -------
+            type: the runner class for the machine type
+    """
+    if machineType in _loaded:
+        return _loaded[machineType]
+    if machineType not in RUNNERS:
+        raise KeyError(f"No runner registered for machine type '{machineType}'")
+    module_name, class_name = RUNNERS[machineType]
+    runner = getattr(importlib.import_module(module_name), class_name)
+    _loaded[machineType] = runner
+    return runner
@@ -0,0 +1,149 @@
+import os
+import gzip
+import shutil
+import tarfile
+import timeit
+import subprocess
+from contextlib import contextmanager
+
+
+# Compression level of the zstd archives, 10 compresses the numeric logs about as well as gzip -9 at a fraction of the time
+ZSTD_LEVEL = 10
+# Compression level of the gzip archives
+GZIP_LEVEL = 6
+# Threads of the compressor, 0 for one per CPU
+THREADS = 0
+# File name extension per compression
+EXTENSIONS = {"zstd": ".tar.zst", "gzip": ".tar.gz"}
+
+
+def compressor_command(compression):
+    """
+    Returns the command line of a multithreaded compressor on the PATH, zstd or pigz.
+
+        Parameters
+        ----------
+            compression: str
+                "zstd" or "gzip"
+
+        Returns
+        -------
+            list: the command that compresses stdin to stdout, None if the tool is not installed
+    """
+    if compression == "zstd" and shutil.which("zstd"):
+        return ["zstd", "-q", f"-T{THREADS}", f"-{ZSTD_LEVEL}", "-c"]
+    if compression == "gzip" and shutil.which("pigz"):
+        return ["pigz", f"-p{THREADS or os.cpu_count() or 1}", f"-{GZIP_LEVEL}", "-c"]
+    return None
+
+
+def resolve(compression):
+    """
+    Returns the compression that can be written here, zstd falls back to gzip without the zstandard
+    package or the zstd tool.
+
+        Parameters
+        ----------
+            compression: str
+                "zstd" or "gzip"
+
+        Returns
+        -------
+            str: "zstd" or "gzip"
+    """
+    if compression not in EXTENSIONS:
+        print(f"[WARNING]: Unknown compression {compression}, expected one of {tuple(EXTENSIONS)}")
+        raise ValueError(f"Unknown compression: {compression}")
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            if compressor_command("zstd") is None:
+                print("[WARNING]: Neither the zstandard package nor the zstd tool is installed, writing gzip instead")
+                return "gzip"
+    return compression
+
+
+@contextmanager
+def compressed_writer(file, compression):
+    """
+    Yields a writable stream that compresses into an open file as the data comes in.
+    The zstandard package and the zstd and pigz tools compress on every CPU, the gzip module on one.
+
+        Parameters
+        ----------
+            file: file object
+                the archive file, opened for binary writing
+            compression: str
+                "zstd" or "gzip", as returned by resolve()
+
+        Yields
+        ------
+            file object: the stream to write the uncompressed data to
+    """
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            zstandard = None
+        if zstandard is not None:
+            compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL, threads=-1 if THREADS == 0 else THREADS)
+            with compressor.stream_writer(file, closefd=False) as writer:
+                yield writer
+            return
+    command = compressor_command(compression)
+    if command is not None:
+        process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=file)
+        try:
+            yield process.stdin
+        finally:
+            process.stdin.close()
+            returncode = process.wait()
+        if returncode != 0:
+            print(f"[WARNING]: {command[0]} exited with {returncode}")
+            raise OSError(f"{command[0]} exited with {returncode}")
+        return
+    with gzip.GzipFile(fileobj=file, mode="wb", compresslevel=GZIP_LEVEL, mtime=0) as writer:
+        yield writer
+
+
+def write_archive(paths, archive_base, compression="zstd"):
+    """
+    Writes files into one compressed tar archive. The tar is streamed through the compressor,
+    the files are read in blocks and never held in memory whole.
+
+        Parameters
+        ----------
+            paths: list
+                the paths to the files, stored under their file names
+            archive_base: str
+                the path of the archive without the extension
+            compression: str
+                "zstd" or "gzip", zstd falls back to gzip if it cannot be written here
+
+        Returns
+        -------
+            str: the path of the archive
+            int: the bytes of the files
+            int: the bytes of the archive
+    """
+    compression = resolve(compression)
+    archive = archive_base + EXTENSIONS[compression]
+    temp = f"{archive}.{os.getpid()}.tmp"
+    start = timeit.default_timer()
+    try:
+        with open(temp, "wb") as file:
+            with compressed_writer(file, compression) as writer:
+                with tarfile.open(fileobj=writer, mode="w|", format=tarfile.PAX_FORMAT) as tar:
+                    for path in paths:
+                        tar.add(path, arcname=os.path.basename(path))
+        os.replace(temp, archive)
+    except BaseException:
+        if os.path.exists(temp):
+            os.remove(temp)
+        raise
+    original = sum(os.path.getsize(path) for path in paths)
+    compressed = os.path.getsize(archive)
+    print(f"[NOTICE]: Compressed {len(paths)} files ({original / (1024 * 1024):.1f} MiB) into {os.path.basename(archive)} "
+          f"({compressed / (1024 * 1024):.1f} MiB), {original / max(compressed, 1):.1f}x in {timeit.default_timer() - start:.2f}s")
+    return archive, original, compressed
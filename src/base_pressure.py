@@ -0,0 +1,163 @@
+import os
+import calendar
+import numpy as np
+from datetime import datetime
+
+
+# Text log of the base pressures inside data(<name>), one "torr date time" line per run
+TEXT_NAME = "base_pressure.txt"
+# Binary history of the same base pressures next to it, read by the plots
+STORE_NAME = "base_pressure.f8"
+# One record per run: the time as seconds since 1970-01-01 of the local clock (no time zone, like
+# the dates of the text log) and the base pressure in Torr
+RECORD = np.dtype([("time", "<f8"), ("torr", "<f8")])
+
+
+def wall_seconds(when):
+    """
+    Returns a local date and time as seconds since 1970-01-01 00:00, without a time zone.
+
+        Parameters
+        ----------
+            when: datetime
+                the date and time
+
+        Returns
+        -------
+            float: the seconds
+    """
+    return float(calendar.timegm(when.timetuple()))
+
+
+class BasePressureStore:
+    """
+    BasePressureStore keeps the base pressure of every run of a machine as fixed size records
+
+    Adding a run writes one 16 byte record to the end of the file and reading the last runs seeks
+    back from the end and reads only their records, so neither gets slower as the history grows.
+    The times are stored already parsed, the plots do not convert date strings. base_pressure.txt
+    is still written for people reading it, a machine that only has the text log (from before the
+    store existed) has it imported once on first use. A record cut short by a crash is dropped
+    before the next one is added.
+
+    Attributes:
+    -----------
+    dataPath: str
+        the path to the data folder of the machine
+    path: str
+        the path to the binary history
+    textPath: str
+        the path to the text log
+
+    Methods:
+    --------
+    import_text():
+        Builds the binary history from the text log
+    append(torr, when=None):
+        Adds the base pressure of a run
+    recent(count):
+        Returns the last base pressures
+    """
+
+
+    def __init__(self, dataPath):
+        """
+        Constructor for the BasePressureStore class
+
+            Parameters
+            -----------
+                dataPath: str
+                    the path to the data folder of the machine
+
+            Returns
+            -------
+                None
+        """
+        self.dataPath = dataPath
+        self.path = os.path.join(dataPath, STORE_NAME)
+        self.textPath = os.path.join(dataPath, TEXT_NAME)
+        if not os.path.exists(self.path):
+            self.import_text()
+
+
+    def import_text(self):
+        """
+        Builds the binary history from the text log, written under a temporary name and moved into place.
+
+            Parameters
+            -----------
+                None
+
+            Returns
+            -------
+                None
+        """
+        records = []
+        skipped = 0
+        try:
+            with open(self.textPath, "r") as file:
+                for line in file:
+                    try:
+                        torr, date, time = line.split()
+                        records.append((wall_seconds(datetime.strptime(f"{date} {time}", "%Y-%m-%d %H:%M:%S")), float(torr)))
+                    except ValueError:
+                        if line.strip():
+                            skipped += 1
+        except FileNotFoundError:
+            return
+        if skipped:
+            print(f"[WARNING]: Skipped {skipped} unreadable lines of {self.textPath}")
+        temp = f"{self.path}.{os.getpid()}.tmp"
+        np.array(records, dtype=RECORD).tofile(temp)
+        os.replace(temp, self.path)
+
+
+    def append(self, torr, when=None):
+        """
+        Adds the base pressure of a run to the binary history and the text log.
+
+            Parameters
+            -----------
+                torr: float
+                    the base pressure in Torr
+                when: datetime
+                    the local time of the run, now if None
+
+            Returns
+            -------
+                None
+        """
+        when = datetime.now() if when is None else when
+        with open(self.textPath, "a+") as file:
+            file.write(str(torr) + " " + when.strftime("%Y-%m-%d") + " " + when.strftime("%H:%M:%S") + "\n")
+        with open(self.path, "ab") as file:
+            size = file.seek(0, os.SEEK_END)
+            if size % RECORD.itemsize:
+                # A record cut short by a crash, drop it so the next ones stay aligned
+                file.truncate(size - size % RECORD.itemsize)
+            np.array([(wall_seconds(when), torr)], dtype=RECORD).tofile(file)
+
+
+    def recent(self, count):
+        """
+        Returns the last base pressures, read back from the end of the binary history.
+
+            Parameters
+            -----------
+                count: int
+                    the number of runs
+
+            Returns
+            -------
+                numpy.ndarray: the time of each run, seconds since 1970-01-01 of the local clock, oldest first
+                numpy.ndarray: the base pressure of each run in Torr
+        """
+        try:
+            with open(self.path, "rb") as file:
+                records = file.seek(0, os.SEEK_END) // RECORD.itemsize
+                first = max(0, records - count)
+                file.seek(first * RECORD.itemsize)
+                block = np.fromfile(file, dtype=RECORD, count=records - first)
+        except FileNotFoundError:
+            block = np.empty(0, dtype=RECORD)
+        return block["time"], block["torr"]
@@ -0,0 +1,376 @@
+import os
+import glob
+import json
+import time
+import sqlite3
+from src.checksum import checksum
+from src.staging import stage_file, METHODS
+
+
+# Content addressed store of the output files, relative to the repository root
+STORE_DIR = os.path.join("src", ".blobs")
+# File in every Output_Data/<dirname> folder listing the checksum of each file in it
+MANIFEST_NAME = "manifest.json"
+# The run folders whose manifests keep their blobs in the store, relative to the repository root
+OUTPUT_GLOB = os.path.join("src", "Machines", "*", "data(*)", "Output_Data", "*")
+# Seconds a new blob is kept without a manifest, the manifest of a run is written after its files are added
+PRUNE_GRACE_SECONDS = 3600
+
+
+class BlobStore:
+    """
+    BlobStore keeps one copy of every distinct output file, keyed by its MD5 checksum
+
+    The Output_Data/<dirname> folder of a run holds hard links to the blobs instead of copies, so a
+    plot or report that did not change between runs (e.g. the base pressure panel) takes its disk
+    space once. Copied blobs are written read-only, so nothing can change them in place through a link.
+    Every run folder gets a manifest.json with the checksum of each file, and a SQLite table
+    remembers which checksums were already uploaded to which rclone root and where they went, so the
+    upload queue only sends the files the remote does not have yet.
+
+    Attributes:
+    -----------
+    root: str
+        the folder of the store
+    conn: sqlite3.Connection
+        the connection of the current process to the upload table
+    pid: int
+        the process that opened conn, forked workers open their own connection
+
+    Methods:
+    --------
+    blob_path(digest):
+        Returns the path of a blob
+    put(path, link=False):
+        Adds a file to the store
+    link(digest, dst):
+        Places a blob at a path
+    add(src, dst):
+        Adds a file to the store and places it at dst, a drop-in for shutil.copy2
+    write_manifest(folder, files):
+        Writes the manifest of a run folder
+    read_manifest(folder):
+        Reads the manifest of a run folder
+    remote_path(root, digest):
+        Returns where a blob was uploaded under an rclone root
+    record(root, uploads):
+        Remembers uploaded blobs
+    forget(root, digests):
+        Forgets uploaded blobs that are no longer on the remote
+    prune(folders, grace=PRUNE_GRACE_SECONDS):
+        Removes the blobs no run folder uses any more
+    """
+
+
+    def __init__(self, root=STORE_DIR):
+        """
+        Constructor for the BlobStore class
+
+            Parameters
+            -----------
+                root: str
+                    the folder of the store
+
+            Returns
+            -------
+                None
+        """
+        self.root = root
+        self.conn = None
+        self.pid = None
+
+
+    def connect(self):
+        """
+        Returns the connection of this process, creating the upload table on first use.
+
+            Parameters
+            -----------
+                None
+
+            Returns
+            -------
+                sqlite3.Connection: the connection to the upload table
+        """
+        if self.conn is None or self.pid != os.getpid():
+            os.makedirs(self.root, exist_ok=True)
+            self.conn = sqlite3.connect(os.path.join(self.root, "uploaded.db"), timeout=30)
+            self.pid = os.getpid()
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            with self.conn:
+                self.conn.execute("CREATE TABLE IF NOT EXISTS uploaded ("
+                                  "root TEXT, digest TEXT, remote TEXT, uploaded_at REAL, "
+                                  "PRIMARY KEY (root, digest)) WITHOUT ROWID")
+        return self.conn
+
+
+    def blob_path(self, digest):
+        """
+        Returns the path of a blob, blobs are spread over 256 folders by their first two hex digits.
+
+            Parameters
+            -----------
+                digest: str
+                    the hex MD5 checksum of the blob
+
+            Returns
+            -------
+                str: the path of the blob
+        """
+        return os.path.join(self.root, "objects", digest[:2], digest)
+
+
+    def put(self, path, link=False):
+        """
+        Adds a file to the store, a file whose contents are already stored is not copied again.
+        By default the file is reflinked or copied rather than linked, the reports are rewritten in
+        place by the next run. Files that are never written again, like the renamed raw logs, can be
+        hard linked into the store, they then take no extra disk space. A linked blob keeps the
+        permissions of the file, they share one inode and the file stays writable where it was collected.
+
+            Parameters
+            -----------
+                path: str
+                    the path to the file
+                link: bool
+                    True to hard link the file into the store when it is on the same filesystem
+
+            Returns
+            -------
+                str: the hex MD5 checksum of the file
+        """
+        digest = checksum(path)
+        blob = self.blob_path(digest)
+        if not os.path.exists(blob):
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            temp = f"{blob}.{os.getpid()}.tmp"
+            if stage_file(path, temp, METHODS if link else METHODS[1:]) != "link":
+                os.chmod(temp, 0o444)
+            os.replace(temp, blob)
+        return digest
+
+
+    def link(self, digest, dst):
+        """
+        Places a blob at a path as a hard link, reflinked or copied if the path is on another filesystem.
+
+            Parameters
+            -----------
+                digest: str
+                    the hex MD5 checksum of the blob
+                dst: str
+                    the path to place the blob at, replaced if it exists
+
+            Returns
+            -------
+                None
+        """
+        stage_file(self.blob_path(digest), dst)
+
+
+    def add(self, src, dst):
+        """
+        Adds a file to the store and places it at dst, takes the arguments of shutil.copy2.
+
+            Parameters
+            -----------
+                src: str
+                    the path to the file
+                dst: str
+                    the path to place it at, or a folder to place it in
+
+            Returns
+            -------
+                str: the path it was placed at
+        """
+        if os.path.isdir(dst):
+            dst = os.path.join(dst, os.path.basename(src))
+        self.link(self.put(src), dst)
+        return dst
+
+
+    def write_manifest(self, folder, files):
+        """
+        Writes the manifest of a run folder.
+
+            Parameters
+            -----------
+                folder: str
+                    the run folder
+                files: dict
+                    per path relative to the folder, the checksum of the file
+
+            Returns
+            -------
+                None
+        """
+        with open(os.path.join(folder, MANIFEST_NAME), "w") as file:
+            json.dump({"files": files}, file, indent=1, sort_keys=True)
+
+
+    def read_manifest(self, folder):
+        """
+        Reads the manifest of a run folder.
+
+            Parameters
+            -----------
+                folder: str
+                    the run folder
+
+            Returns
+            -------
+                dict: per path relative to the folder, the checksum of the file, empty if there is no manifest
+        """
+        try:
+            with open(os.path.join(folder, MANIFEST_NAME), "r") as file:
+                return json.load(file).get("files", {})
+        except (OSError, ValueError):
+            return {}
+
+
+    def remote_path(self, root, digest):
+        """
+        Returns where a blob was uploaded under an rclone root.
+
+            Parameters
+            -----------
+                root: str
+                    the rclone root
+                digest: str
+                    the hex MD5 checksum of the blob
+
+            Returns
+            -------
+                str: the path of the uploaded file relative to root, None if the blob was never uploaded there
+        """
+        row = self.connect().execute("SELECT remote FROM uploaded WHERE root = ? AND digest = ?", (root, digest)).fetchone()
+        return None if row is None else row[0]
+
+
+    def record(self, root, uploads):
+        """
+        Remembers uploaded blobs, the first upload of a blob stays the one that is pointed to.
+
+            Parameters
+            -----------
+                root: str
+                    the rclone root
+                uploads: dict
+                    per checksum, the path of the uploaded file relative to root
+
+            Returns
+            -------
+                None
+        """
+        conn = self.connect()
+        now = time.time()
+        with conn:
+            conn.executemany("INSERT OR IGNORE INTO uploaded VALUES (?, ?, ?, ?)",
+                             [(root, digest, remote, now) for digest, remote in uploads.items()])
+
+
+    def forget(self, root, digests):
+        """
+        Forgets uploaded blobs, e.g. because their upload was moved or deleted on the remote,
+        so the next run folder with their contents uploads them again.
+
+            Parameters
+            -----------
+                root: str
+                    the rclone root
+                digests: set
+                    the hex MD5 checksums of the blobs
+
+            Returns
+            -------
+                None
+        """
+        conn = self.connect()
+        with conn:
+            conn.executemany("DELETE FROM uploaded WHERE root = ? AND digest = ?", [(root, digest) for digest in digests])
+
+
+    def prune(self, folders, grace=PRUNE_GRACE_SECONDS):
+        """
+        Removes the blobs that are neither listed in the manifest of a run folder nor hard linked
+        from anywhere else, e.g. once old Output_Data folders were deleted. Blobs (and temporary files)
+        younger than grace are kept, a runner may be adding the files of a run whose manifest is not written yet.
+        The upload table is left as it is, the uploaded files are still on the remote.
+
+            Parameters
+            -----------
+                folders: list
+                    the run folders whose manifests keep their blobs
+                grace: float
+                    seconds a new blob is kept without a manifest
+
+            Returns
+            -------
+                int: the number of files removed
+                int: the bytes freed
+        """
+        used = set()
+        for folder in folders:
+            used.update(self.read_manifest(folder).values())
+        now = time.time()
+        removed = 0
+        freed = 0
+        for dirpath, dirnames, filenames in os.walk(os.path.join(self.root, "objects")):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                try:
+                    info = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                if not filename.endswith(".tmp") and (filename in used or info.st_nlink > 1):
+                    continue
+                if now - info.st_ctime < grace:
+                    continue
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    continue
+                removed += 1
+                freed += info.st_size
+        return removed, freed
+
+
+# Store shared by all runners in this process
+_store = None
+
+
+def get_blob_store():
+    """
+    Returns the blob store of this process, creating it on first use.
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            BlobStore: the blob store
+    """
+    global _store
+    if _store is None:
+        _store = BlobStore()
+    return _store
+
+
+def prune_blobs(pattern=OUTPUT_GLOB):
+    """
+    Removes the blobs of the store of this process that no run folder uses any more.
+
+        Parameters
+        ----------
+            pattern: str
+                glob pattern of the run folders, relative to the repository root
+
+        Returns
+        -------
+            int: the number of files removed
+    """
+    removed, freed = get_blob_store().prune(glob.glob(pattern))
+    if removed:
+        print(f"[NOTICE]: Removed {removed} unused blobs ({freed / (1024 * 1024):.1f} MiB) from the blob store")
+    return removed
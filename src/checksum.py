@@ -0,0 +1,140 @@
+import os
+import hashlib
+from collections import OrderedDict
+
+
+# Bytes read per call when hashing a file
+BUFFER_SIZE = 1024 * 1024
+# Bytes before the previous end of file that are re-read to check that a log was only appended to
+TAIL_SIZE = 4096
+
+
+class ChecksumCache:
+    """
+    ChecksumCache calculates MD5 checksums of data files, reusing the work done on earlier calls
+
+    The (size, mtime_ns, inode) of a file is compared first, an unchanged file costs one stat call.
+    A file that only grew (append-only logs) is hashed from where the last call stopped, after
+    checking that the bytes just before the old end of file did not change. Anything else is
+    streamed through the hash again in BUFFER_SIZE chunks, the file is never read into memory whole.
+    The checksums are the same as hashlib.md5 of the whole file.
+
+    Attributes:
+    -----------
+    entries: OrderedDict
+        per file path: (size, mtime_ns, inode, md5 state, last TAIL_SIZE bytes hashed)
+    max_entries: int
+        the number of files remembered, least recently used files are forgotten first
+
+    Methods:
+    --------
+    checksum(path):
+        Returns the MD5 checksum of a file
+    """
+
+
+    def __init__(self, max_entries=256):
+        """
+        Constructor for the ChecksumCache class
+
+            Parameters
+            -----------
+                max_entries: int
+                    the number of files remembered
+
+            Returns
+            -------
+                None
+        """
+        self.entries = OrderedDict()
+        self.max_entries = max_entries
+
+
+    def checksum(self, path):
+        """
+        Returns the MD5 checksum of a file, only hashing the bytes that are new since the last call.
+
+            Parameters
+            -----------
+                path: str
+                    the path to the file
+
+            Returns
+            -------
+                str: the hex MD5 checksum of the file contents
+        """
+        stat = os.stat(path)
+        entry = self.entries.get(path)
+        if entry is not None:
+            size, mtime_ns, inode, hasher, tail = entry
+            if (size, mtime_ns, inode) == (stat.st_size, stat.st_mtime_ns, stat.st_ino):
+                self.entries.move_to_end(path)
+                return hasher.hexdigest()
+
+        with open(path, "rb") as file:
+            if entry is not None and inode == stat.st_ino and size < stat.st_size and self._same_tail(file, size, tail):
+                # Append-only growth, continue hashing after the old end of file
+                hasher = hasher.copy()
+                offset = size
+            else:
+                hasher = hashlib.md5()
+                tail = b""
+                offset = 0
+            file.seek(offset)
+            # Only hash up to the size that was stat'ed so the cache key matches the contents
+            remaining = stat.st_size - offset
+            while remaining > 0:
+                chunk = file.read(min(BUFFER_SIZE, remaining))
+                if not chunk:
+                    break
+                hasher.update(chunk)
+                tail = (tail + chunk)[-TAIL_SIZE:]
+                offset += len(chunk)
+                remaining -= len(chunk)
+
+        self.entries[path] = (offset, stat.st_mtime_ns, stat.st_ino, hasher, tail)
+        self.entries.move_to_end(path)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return hasher.hexdigest()
+
+
+    def _same_tail(self, file, size, tail):
+        """
+        Helper: Checks that the bytes before the old end of file are still the ones that were hashed.
+
+            Parameters
+            -----------
+                file: file object
+                    the open file
+                size: int
+                    the old end of file
+                tail: bytes
+                    the last bytes hashed before the old end of file
+
+            Returns
+            -------
+                bool: True if the bytes are unchanged, False otherwise
+        """
+        file.seek(size - len(tail))
+        return file.read(len(tail)) == tail
+
+
+# Cache shared by all runners in this process
+_cache = ChecksumCache()
+
+
+def checksum(path):
+    """
+    Returns the MD5 checksum of a file using the checksum cache of this process.
+
+        Parameters
+        ----------
+            path: str
+                the path to the file
+
+        Returns
+        -------
+            str: the hex MD5 checksum of the file contents
+    """
+    return _cache.checksum(path)
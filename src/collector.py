@@ -0,0 +1,612 @@
+import os
+import stat
+import queue
+import shutil
+import threading
+import timeit
+import zlib
+import yaml
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Hosts file shared with the ansible collection
+HOSTS_PATH = os.path.join("ansible", "hosts.yml")
+# Files downloaded at the same time over all hosts
+TRANSFERS = 8
+# SFTP channels opened per host on its SSH connection
+SESSIONS_PER_HOST = 4
+# Seconds to wait for a host before it is skipped for this cycle
+CONNECT_TIMEOUT = 10
+# Bytes before the local end of file that are read again to check a log was only appended to
+ANCHOR_SIZE = 4096
+# Bytes requested per read of an appended range
+CHUNK_SIZE = 1024 * 1024
+
+
+class Host:
+    """
+    Host is one entry of ansible/hosts.yml
+
+    Attributes:
+    -----------
+    name: str
+        the inventory name of the host (host1, host2, ...)
+    address: str
+        ansible_host, the IP address or name of the host
+    user: str
+        ansible_user, the login user
+    port: int
+        ansible_port, 22 if not set
+    key_file: str
+        ansible_ssh_private_key_file, None to use the SSH agent and default keys
+    windows: bool
+        True if ansible_shell_type is powershell or cmd
+    local: bool
+        True if ansible_connection is local, the directories are then read from this machine
+    toolname: str
+        the name of the tool running on the host
+    directories: list
+        dicts with the src directory on the host and the local dest directory
+    """
+
+
+    def __init__(self, name, values):
+        """
+        Constructor for the Host class
+
+            Parameters
+            -----------
+                name: str
+                    the inventory name of the host
+                values: dict
+                    the variables of the host in hosts.yml
+
+            Returns
+            -------
+                None
+        """
+        self.name = name
+        self.address = values.get("ansible_host", name)
+        self.user = values.get("ansible_user")
+        self.port = int(values.get("ansible_port", 22))
+        self.key_file = values.get("ansible_ssh_private_key_file")
+        self.windows = values.get("ansible_shell_type") in ("powershell", "cmd")
+        self.local = values.get("ansible_connection") == "local"
+        self.toolname = values.get("toolname", "")
+        self.directories = values.get("directories") or []
+
+
+    def remote_path(self, path):
+        """
+        Returns a path on the host as the SFTP server expects it. The OpenSSH server on Windows
+        takes drive paths as /C:/Data/... with forward slashes.
+
+            Parameters
+            -----------
+                path: str
+                    the path as written in hosts.yml
+
+            Returns
+            -------
+                str: the SFTP path
+        """
+        if self.windows:
+            path = path.replace("\\", "/")
+            if len(path) > 1 and path[1] == ":":
+                path = "/" + path
+        return path
+
+
+def read_hosts(path=HOSTS_PATH):
+    """
+    Reads the hosts of the ansible inventory.
+
+        Parameters
+        ----------
+            path: str
+                the path to hosts.yml
+
+        Returns
+        -------
+            list: a Host per host of the "all" group, empty if the file is empty
+    """
+    with open(path, "r") as file:
+        inventory = yaml.safe_load(file) or {}
+    hosts = (inventory.get("all") or {}).get("hosts") or {}
+    return [Host(name, values or {}) for name, values in hosts.items()]
+
+
+class LocalEntry:
+    """
+    LocalEntry has the fields of paramiko's SFTPAttributes used by the collector
+    """
+
+
+    def __init__(self, entry):
+        info = entry.stat()
+        self.filename = entry.name
+        self.st_size = info.st_size
+        self.st_mtime = info.st_mtime
+        self.st_mode = info.st_mode
+
+
+class LocalSession:
+    """
+    LocalSession reads the directories of an ansible_connection: local host like an SFTP session,
+    it stands in for SSH in tests and for tools whose data folder is mounted on the collector
+
+    Methods:
+    --------
+    listdir_attr(path):
+        Returns the entries of a directory
+    get(remotepath, localpath):
+        Copies a file
+    open(filename, mode):
+        Opens a file
+    close():
+        Does nothing
+    """
+
+
+    def listdir_attr(self, path):
+        with os.scandir(path) as it:
+            return [LocalEntry(entry) for entry in it]
+
+
+    def get(self, remotepath, localpath):
+        shutil.copyfile(remotepath, localpath)
+
+
+    def open(self, filename, mode="r"):
+        return open(filename, mode)
+
+
+    def close(self):
+        pass
+
+
+class HostPool:
+    """
+    HostPool keeps the SSH connection and SFTP channels of one host open between cycles
+
+    The SFTP channels share the single SSH connection of the host. A channel is borrowed for one
+    listing or transfer and given back, so at most SESSIONS_PER_HOST requests run on a host at once.
+    A connection that broke is closed and opened again on the next borrow.
+
+    Attributes:
+    -----------
+    host: Host
+        the host
+    size: int
+        the number of SFTP channels
+    client: paramiko.SSHClient
+        the SSH connection, None until first use or after an error
+    idle: queue.Queue
+        the channels that are not borrowed
+    opened: int
+        the number of channels opened on the current connection
+    owner: dict
+        per open channel, the connection it was opened on
+    lock: threading.Lock
+        guards client, opened and owner
+
+    Methods:
+    --------
+    borrow():
+        Returns an SFTP channel of the host, connecting if needed
+    give_back(session, broken=False):
+        Returns a channel to the pool, or drops the connection if it broke
+    close():
+        Closes the channels and the SSH connection
+    """
+
+
+    def __init__(self, host, size=SESSIONS_PER_HOST):
+        """
+        Constructor for the HostPool class
+
+            Parameters
+            -----------
+                host: Host
+                    the host
+                size: int
+                    the number of SFTP channels
+
+            Returns
+            -------
+                None
+        """
+        self.host = host
+        self.size = size
+        self.client = None
+        self.idle = queue.Queue()
+        self.opened = 0
+        self.owner = {}
+        self.lock = threading.Lock()
+
+
+    def connect(self):
+        """
+        Helper: Opens the SSH connection of the host with the keys used by ansible.
+        Hosts have to be in known_hosts, like with ansible's host key checking.
+        """
+        try:
+            import paramiko
+        except ImportError:
+            print("[WARNING]: The sftp collector needs paramiko, install it with: pip install paramiko")
+            raise
+        client = paramiko.SSHClient()
+        client.load_system_host_keys()
+        client.set_missing_host_key_policy(paramiko.RejectPolicy())
+        client.connect(self.host.address, port=self.host.port, username=self.host.user,
+                       key_filename=self.host.key_file, timeout=CONNECT_TIMEOUT)
+        # Keeps the connection open through NAT and firewalls between cycles
+        client.get_transport().set_keepalive(30)
+        return client
+
+
+    def borrow(self):
+        """
+        Returns an SFTP channel of the host, opening the connection or a new channel if none is idle.
+
+            Parameters
+            -----------
+                None
+
+            Returns
+            -------
+                paramiko.SFTPClient: the channel (a LocalSession for local hosts)
+        """
+        if self.host.local:
+            return LocalSession()
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self.lock:
+            if self.opened < self.size:
+                if self.client is None:
+                    self.client = self.connect()
+                session = self.client.open_sftp()
+                self.owner[session] = self.client
+                self.opened += 1
+                return session
+        return self.idle.get(timeout=CONNECT_TIMEOUT * 6)
+
+
+    def give_back(self, session, broken=False):
+        """
+        Returns a channel to the pool. A broken channel takes its connection and the idle channels
+        on it down, channels of an old connection are closed when they come back.
+
+            Parameters
+            -----------
+                session: paramiko.SFTPClient
+                    the borrowed channel
+                broken: bool
+                    True if the channel raised a connection error
+
+            Returns
+            -------
+                None
+        """
+        if self.host.local:
+            return
+        with self.lock:
+            current = self.owner.pop(session, None) is self.client and self.client is not None
+            if current and not broken:
+                self.owner[session] = self.client
+                self.idle.put(session)
+                return
+            session.close()
+            if current:
+                self.drop()
+
+
+    def drop(self):
+        """
+        Helper: Closes the idle channels and the SSH connection, the lock must be held.
+        """
+        while not self.idle.empty():
+            idle = self.idle.get_nowait()
+            self.owner.pop(idle, None)
+            idle.close()
+        self.opened = 0
+        if self.client is not None:
+            self.client.close()
+            self.client = None
+
+
+    def close(self):
+        """
+        Closes the channels and the SSH connection.
+
+            Parameters
+            -----------
+                None
+
+            Returns
+            -------
+                None
+        """
+        with self.lock:
+            self.drop()
+
+
+class Collector:
+    """
+    Collector copies the newest file of every host directory in ansible/hosts.yml to the collector
+
+    Like the fetch playbook only the most recent file of a directory is pulled, and only if the
+    local copy is missing or differs in size or modification time. Each directory costs one
+    listing request, the transfers of all hosts run concurrently on pooled SFTP channels that
+    stay open between cycles.
+    In tail mode a log that is still being written is not fetched again in full: only the bytes
+    appended since the last cycle are pulled and added to the local copy, see append().
+
+    Attributes:
+    -----------
+    hosts_path: str
+        the path to hosts.yml
+    transfers: int
+        the number of files downloaded at the same time
+    tail: bool
+        True to append the new bytes of growing logs instead of fetching them in full
+    pools: dict
+        per (address, port, user), the HostPool of that host
+    seen: dict
+        per local file, (size, mtime) of the remote file in the last cycle
+
+    Methods:
+    --------
+    collect():
+        Pulls the new files of every host directory and prints the time spent per host
+    fetch(host, directory):
+        Pulls the newest file of one directory if it is new or changed
+    append(session, remotepath, target, localSize, remoteSize, complete):
+        Appends the bytes a remote log grew by to the local copy
+    close():
+        Closes all connections
+    """
+
+
+    def __init__(self, hosts_path=HOSTS_PATH, transfers=TRANSFERS, tail=False):
+        """
+        Constructor for the Collector class
+
+            Parameters
+            -----------
+                hosts_path: str
+                    the path to hosts.yml
+                transfers: int
+                    the number of files downloaded at the same time
+                tail: bool
+                    True to append the new bytes of growing logs instead of fetching them in full
+
+            Returns
+            -------
+                None
+        """
+        self.hosts_path = hosts_path
+        self.transfers = transfers
+        self.tail = tail
+        self.pools = {}
+        self.seen = {}
+
+
+    def pool(self, host):
+        """
+        Helper: Returns the HostPool of a host, reusing the pool of earlier cycles.
+        """
+        key = (host.address, host.port, host.user, host.local)
+        if key not in self.pools:
+            self.pools[key] = HostPool(host)
+        return self.pools[key]
+
+
+    def fetch(self, host, directory):
+        """
+        Pulls the newest file of one directory if the local copy is missing or differs in size or
+        modification time. The file is written under a temporary name and moved into place (removed
+        again if the download fails), the local modification time is set to the remote one for the
+        comparison of the next cycle.
+
+            Parameters
+            -----------
+                host: Host
+                    the host
+                directory: dict
+                    src, the directory on the host, and dest, the local directory
+
+            Returns
+            -------
+                int: the number of bytes downloaded, 0 if nothing changed
+        """
+        pool = self.pool(host)
+        session = pool.borrow()
+        broken = False
+        try:
+            src = host.remote_path(directory["src"])
+            files = [entry for entry in session.listdir_attr(src) if stat.S_ISREG(entry.st_mode)]
+            if not files:
+                return 0
+            newest = max(files, key=lambda entry: entry.st_mtime)
+            target = os.path.join(directory["dest"], newest.filename)
+            remotepath = f"{src.rstrip('/')}/{newest.filename}"
+            # The remote file did not change since the last cycle, it is complete up to its last byte
+            complete = self.seen.get(target) == (newest.st_size, newest.st_mtime)
+            self.seen[target] = (newest.st_size, newest.st_mtime)
+            try:
+                local = os.stat(target)
+                if local.st_size == newest.st_size and int(local.st_mtime) == int(newest.st_mtime):
+                    return 0
+                localSize = local.st_size
+            except FileNotFoundError:
+                localSize = 0
+            os.makedirs(directory["dest"], exist_ok=True)
+            if self.tail and localSize <= newest.st_size:
+                size = self.append(session, remotepath, target, localSize, newest.st_size, complete)
+                if size is not None:
+                    if complete:
+                        os.utime(target, (newest.st_mtime, newest.st_mtime))
+                    return size
+            temp = os.path.join(directory["dest"], f".{newest.filename}.part")
+            try:
+                session.get(remotepath, temp)
+                os.utime(temp, (newest.st_mtime, newest.st_mtime))
+                os.replace(temp, target)
+            except BaseException:
+                # A partial download is never left behind for the runners to pick up
+                if os.path.exists(temp):
+                    os.remove(temp)
+                raise
+            return newest.st_size
+        except Exception as e:
+            # A missing or unreadable directory leaves the connection usable, anything else drops it
+            broken = not isinstance(e, (FileNotFoundError, PermissionError))
+            raise
+        finally:
+            pool.give_back(session, broken)
+
+
+    def append(self, session, remotepath, target, localSize, remoteSize, complete):
+        """
+        Appends the bytes a remote log grew by to the local copy.
+        The read starts ANCHOR_SIZE bytes before the local end of file. The checksum of that overlap
+        has to match the checksum of the local tail, otherwise the remote log was rewritten and None
+        is returned so the file is fetched in full. Only whole lines are appended while the log is
+        still growing, the parsers never see half a line, the rest follows once the log stopped changing.
+
+            Parameters
+            -----------
+                session: paramiko.SFTPClient
+                    the channel to the host
+                remotepath: str
+                    the path to the log on the host
+                target: str
+                    the path to the local copy
+                localSize: int
+                    the size of the local copy
+                remoteSize: int
+                    the size of the remote log
+                complete: bool
+                    True if the remote log did not change since the last cycle, the last line is then appended too
+
+            Returns
+            -------
+                int: the number of bytes appended, None if the local copy is not a prefix of the remote log
+                (a missing local copy is an empty prefix, a new log is written line by line as well)
+        """
+        start = max(0, localSize - ANCHOR_SIZE)
+        anchor = b""
+        if localSize:
+            with open(target, "rb") as file:
+                file.seek(start)
+                anchor = file.read(localSize - start)
+        with session.open(remotepath, "rb") as remote:
+            remote.seek(start)
+            if zlib.adler32(remote.read(len(anchor))) != zlib.adler32(anchor):
+                return None
+            written = 0
+            pending = b""
+            remaining = remoteSize - localSize
+            with open(target, "ab") as file:
+                while remaining > 0:
+                    chunk = remote.read(min(CHUNK_SIZE, remaining))
+                    if not chunk:
+                        break
+                    remaining -= len(chunk)
+                    pending += chunk
+                    end = len(pending) if complete and remaining == 0 else pending.rfind(b"\n") + 1
+                    if end:
+                        file.write(pending[:end])
+                        written += end
+                        pending = pending[end:]
+        return written
+
+
+    def collect(self):
+        """
+        Pulls the new files of every host directory and prints the time spent per host.
+        A host that cannot be reached is reported and skipped, the other hosts are still collected.
+
+            Parameters
+            -----------
+                None
+
+            Returns
+            -------
+                dict: per host name, (seconds, files downloaded, bytes downloaded, errors)
+        """
+        hosts = read_hosts(self.hosts_path)
+        report = {host.name: [0.0, 0, 0, 0] for host in hosts}
+        lock = threading.Lock()
+
+        def job(host, directory):
+            start = timeit.default_timer()
+            try:
+                size = self.fetch(host, directory)
+                error = 0
+            except Exception as e:
+                print(f"[WARNING]: Could not collect {directory.get('src')} from {host.name} ({host.address}): {e}")
+                size = 0
+                error = 1
+            with lock:
+                entry = report[host.name]
+                entry[0] += timeit.default_timer() - start
+                entry[1] += 1 if size else 0
+                entry[2] += size
+                entry[3] += error
+
+        with ThreadPoolExecutor(max_workers=self.transfers, thread_name_prefix="collect") as executor:
+            for host in hosts:
+                for directory in host.directories:
+                    executor.submit(job, host, directory)
+
+        for host in sorted(hosts, key=lambda host: -report[host.name][0]):
+            seconds, files, size, errors = report[host.name]
+            status = f", {errors} errors" if errors else ""
+            print(f"[NOTICE]: {host.name} ({host.toolname}): {len(host.directories)} directories, {files} files, "
+                  f"{size / 1048576:.2f} MiB in {seconds:.2f}s{status}")
+        return {name: tuple(entry) for name, entry in report.items()}
+
+
+    def close(self):
+        """
+        Closes all connections.
+
+            Parameters
+            -----------
+                None
+
+            Returns
+            -------
+                None
+        """
+        for pool in self.pools.values():
+            pool.close()
+        self.pools.clear()
+
+
+# Collector shared by all cycles of this process, its connections stay open between cycles
+_collector = None
+
+
+def get_collector(tail=False):
+    """
+    Returns the collector of this process.
+
+        Parameters
+        ----------
+            tail: bool
+                True to append the new bytes of growing logs instead of fetching them in full
+
+        Returns
+        -------
+            Collector: the collector
+    """
+    global _collector
+    if _collector is None:
+        _collector = Collector()
+    _collector.tail = tail
+    return _collector
@@ -0,0 +1,117 @@
+import numpy as np
+
+
+# Methods known to decimate()
+METHODS = ("minmax", "lttb", "none")
+
+
+def minmax_envelope(x, y, buckets):
+    """
+    Reduces a trace to the minimum and maximum of each bucket, in their original order.
+    The logs are sampled at a fixed interval, so buckets of equal sample count are buckets of
+    equal width on the time axis. With one bucket per pixel column the envelope is drawn exactly
+    like the full trace, every spike and the overall minimum and maximum are kept.
+
+        Parameters
+        ----------
+            x: numpy.ndarray
+                the x values of the trace
+            y: numpy.ndarray
+                the y values of the trace
+            buckets: int
+                the number of buckets, the result has at most 2 * buckets + 2 points
+
+        Returns
+        -------
+            numpy.ndarray: the x values of the kept points
+            numpy.ndarray: the y values of the kept points
+    """
+    n = len(y)
+    size = -(-n // buckets)
+    # Pad with the last value up to whole buckets, padded positions are clipped back onto it
+    padded = np.empty(buckets * size, dtype=y.dtype)
+    padded[:n] = y
+    padded[n:] = y[-1]
+    rows = padded.reshape(buckets, size)
+    starts = np.arange(buckets) * size
+    keep = np.concatenate(([0, n - 1], starts + rows.argmin(axis=1), starts + rows.argmax(axis=1)))
+    keep = np.unique(np.minimum(keep, n - 1))
+    return x[keep], y[keep]
+
+
+def lttb(x, y, threshold):
+    """
+    Reduces a trace with Largest-Triangle-Three-Buckets: the first and last points are kept and from
+    every bucket in between the point forming the largest triangle with the point kept before it and
+    the average of the next bucket. The shape is followed closely, but single spikes can be dropped.
+
+        Parameters
+        ----------
+            x: numpy.ndarray
+                the x values of the trace
+            y: numpy.ndarray
+                the y values of the trace
+            threshold: int
+                the number of points kept, at least 3
+
+        Returns
+        -------
+            numpy.ndarray: the x values of the kept points
+            numpy.ndarray: the y values of the kept points
+    """
+    n = len(y)
+    xf = np.asarray(x, dtype=np.float64)
+    yf = np.asarray(y, dtype=np.float64)
+    # Bucket edges of the n - 2 inner points
+    edges = (np.arange(threshold - 1) * ((n - 2) / (threshold - 2))).astype(np.int64) + 1
+    edges[-1] = n - 1
+    keep = np.empty(threshold, dtype=np.int64)
+    keep[0] = 0
+    keep[-1] = n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, stop = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            nextX = xf[stop:edges[i + 2]].mean()
+            nextY = yf[stop:edges[i + 2]].mean()
+        else:
+            nextX, nextY = xf[-1], yf[-1]
+        # Twice the triangle area, the factor does not change the largest one
+        areas = np.abs((xf[a] - nextX) * (yf[start:stop] - yf[a]) - (xf[a] - xf[start:stop]) * (nextY - yf[a]))
+        a = start + int(areas.argmax())
+        keep[i + 1] = a
+    return x[keep], y[keep]
+
+
+def decimate(x, y, points, method="minmax"):
+    """
+    Reduces a trace to about points points before it is plotted. Short traces are returned unchanged.
+
+        Parameters
+        ----------
+            x: array_like
+                the x values of the trace
+            y: array_like
+                the y values of the trace
+            points: int
+                the number of points the plot can show, e.g. two per pixel column of the axes
+            method: str
+                "minmax" for the min/max envelope, "lttb" for Largest-Triangle-Three-Buckets,
+                "none" to keep every point
+
+        Returns
+        -------
+            numpy.ndarray: the x values to plot
+            numpy.ndarray: the y values to plot
+    """
+    if method not in METHODS:
+        print(f"[WARNING]: Unknown decimation method {method}, expected one of {METHODS}")
+        raise ValueError(f"Unknown decimation method: {method}")
+    x = np.asarray(x)
+    y = np.asarray(y)
+    points = max(int(points), 4)
+    if method == "none" or len(y) <= points:
+        return x, y
+    if method == "minmax":
+        return minmax_envelope(x, y, points // 2 - 1)
+    return lttb(x, y, points)
@@ -0,0 +1,118 @@
+import os
+
+
+# Entries the runners never read: hidden files (e.g. the .<name>.part downloads of the collector) and temporary files
+IGNORED_SUFFIXES = (".part", ".tmp")
+
+
+class DirectoryIndex:
+    """
+    DirectoryIndex remembers the listing and newest file of the data directories
+
+    A directory is scanned once with os.scandir and the newest entry (by creation time, like
+    os.path.getctime) is found in the same pass, without sorting. Hidden and temporary files are left
+    out, a download in progress is never taken for the newest data file. The result is reused until the
+    modification time of the directory changes, which happens whenever a file is added, removed
+    or renamed in it. All channels and checks of a machine in one cycle share that single scan.
+
+    Attributes:
+    -----------
+    entries: dict
+        per directory path: (directory mtime_ns, list of names, path of the newest entry)
+
+    Methods:
+    --------
+    scan(dirPath):
+        Returns the cached (names, newest path) of a directory, rescanning it if it changed
+    names(dirPath):
+        Returns the names of the entries in a directory
+    newest(dirPath):
+        Returns the path of the most recently created entry in a directory
+    """
+
+
+    def __init__(self):
+        """
+        Constructor for the DirectoryIndex class
+
+            Parameters
+            -----------
+                None
+
+            Returns
+            -------
+                None
+        """
+        self.entries = {}
+
+
+    def scan(self, dirPath):
+        """
+        Returns the names and newest entry of a directory, rescanning it only if it changed.
+
+            Parameters
+            -----------
+                dirPath: str
+                    the path to the directory
+
+            Returns
+            -------
+                list: the names of the entries in the directory
+                str: the path of the newest entry, None if the directory is empty
+        """
+        mtime_ns = os.stat(dirPath).st_mtime_ns
+        cached = self.entries.get(dirPath)
+        if cached is not None and cached[0] == mtime_ns:
+            return cached[1], cached[2]
+
+        names = []
+        newest = None
+        newestTime = None
+        with os.scandir(dirPath) as it:
+            for entry in it:
+                if entry.name.startswith(".") or entry.name.endswith(IGNORED_SUFFIXES):
+                    continue
+                names.append(entry.name)
+                ctime = entry.stat().st_ctime
+                # Ties go to the later entry, like the stable sort this replaces
+                if newestTime is None or ctime >= newestTime:
+                    newest = entry.path
+                    newestTime = ctime
+        self.entries[dirPath] = (mtime_ns, names, newest)
+        return names, newest
+
+
+    def names(self, dirPath):
+        """
+        Returns the names of the entries in a directory.
+
+            Parameters
+            -----------
+                dirPath: str
+                    the path to the directory
+
+            Returns
+            -------
+                list: the names of the entries in the directory
+        """
+        return list(self.scan(dirPath)[0])
+
+
+    def newest(self, dirPath):
+        """
+        Returns the path of the most recently created entry in a directory.
+
+            Parameters
+            -----------
+                dirPath: str
+                    the path to the directory
+
+            Returns
+            -------
+                str: the path of the newest entry, None if the directory is empty
+        """
+        return self.scan(dirPath)[1]
+
+
+# Index shared by all runners in this process
+directory_index = DirectoryIndex()
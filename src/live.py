@@ -0,0 +1,405 @@
+import os
+import json
+import time
+import numpy as np
+
+
+# Folder inside data(<name>) that holds the state of the runs that are still being logged
+LIVE_DIR = ".live"
+# Folder inside data(<name>) for the live reports and plots, Output_Text and Output_Plots only hold finished runs
+LIVE_OUTPUT_DIR = "Live_Output"
+# Seconds between two refreshes of the live report and plots of a channel
+REFRESH_SECONDS = 60
+# Readings kept for the rolling base pressure, the same window sendData() averages
+RECENT_ROWS = 60
+# Bytes read per step when looking for the last complete line of a log
+TAIL_BLOCK = 64 * 1024
+
+
+class LiveRun:
+    """
+    LiveRun follows the log of a run that is still being written and keeps running statistics of it
+
+    Every update parses only the complete lines appended since the last one, through the parseLog()
+    method of the channel with a byte span, and folds them into per column statistics: first, last,
+    maximum and sum. The work per update is proportional to the new lines, never to the whole log.
+    The parsed rows are appended to a binary series file (float64, one row per reading), so the
+    live plots are drawn without parsing the text again. The state lives in data(<name>)/.live and
+    survives restarts and moves between worker processes. The series file is cut back to the rows of
+    the saved state before every append, an update interrupted between the two is not counted twice.
+    A log that was replaced or truncated is followed again from the top.
+
+    Attributes:
+    -----------
+    dataPath: str
+        the path to the data folder of the machine
+    kind: str
+        the channel of the log (Pressure, Heating, Plasma)
+    recent_column: str
+        the column whose last RECENT_ROWS readings are kept, None to keep none
+    path: str
+        the path to the followed log
+    inode: int
+        the inode of the followed log, a new inode means the log was replaced
+    offset: int
+        the byte offset after the last line that was parsed
+    rows: int
+        the number of readings parsed so far
+    meta: dict
+        values taken from the log besides the columns, e.g. the recipe name
+    layout: list
+        [name, width] of every column in the series file, width None for a 1-D column
+    stats: dict
+        per column name, {"first", "last", "max", "sum"} of the readings so far
+    recent: list
+        the last RECENT_ROWS readings of recent_column
+    extra: dict
+        values the channel derives from the readings itself, e.g. the cycles before plasma
+    refreshed: float
+        the time of the last refresh of the live report and plots
+    refreshed_rows: int
+        the number of readings at the last refresh
+
+    Methods:
+    --------
+    update(path, parser):
+        Parses the lines appended to a log since the last update
+    series():
+        Returns every reading so far, one array per column
+    completed_cycles():
+        Returns the completed and total cycles of the run so far
+    mean(name):
+        Returns the average of a column so far
+    due():
+        Returns True if the live report and plots should be refreshed
+    write_report(name, text):
+        Writes a live report to the live output folder
+    mark_refreshed():
+        Remembers that the live report and plots were refreshed
+    """
+
+
+    def __init__(self, dataPath, kind, recent_column=None):
+        """
+        Constructor for the LiveRun class, loads the saved state of the channel if there is one
+
+            Parameters
+            -----------
+                dataPath: str
+                    the path to the data folder of the machine
+                kind: str
+                    the channel of the log (Pressure, Heating, Plasma)
+                recent_column: str
+                    the column whose last RECENT_ROWS readings are kept, None to keep none
+
+            Returns
+            -------
+                None
+        """
+        self.dataPath = dataPath
+        self.kind = kind
+        self.recent_column = recent_column
+        self.state_path = os.path.join(dataPath, LIVE_DIR, kind + ".json")
+        self.series_path = os.path.join(dataPath, LIVE_DIR, kind + ".f8")
+        self.output_path = os.path.join(dataPath, LIVE_OUTPUT_DIR)
+        self.reset(None, None)
+        self.load()
+
+
+    def reset(self, path, inode):
+        """
+        Forgets the state and the series file, the log is followed from the top.
+
+            Parameters
+            -----------
+                path: str
+                    the path to the log followed from now on, None only clears the state in memory
+                inode: int
+                    the inode of that log
+
+            Returns
+            -------
+                None
+        """
+        self.path = path
+        self.inode = inode
+        self.offset = 0
+        self.rows = 0
+        self.meta = {}
+        self.layout = []
+        self.stats = {}
+        self.recent = []
+        self.extra = {}
+        self.refreshed = 0.0
+        self.refreshed_rows = 0
+        if path is None:
+            return
+        try:
+            os.remove(self.series_path)
+        except FileNotFoundError:
+            pass
+
+
+    def load(self):
+        """
+        Loads the saved state of the channel, a missing or unreadable state starts over.
+
+            Parameters
+            -----------
+                None
+
+            Returns
+            -------
+                None
+        """
+        try:
+            with open(self.state_path, "r") as file:
+                state = json.load(file)
+        except (OSError, ValueError):
+            return
+        for name in ("path", "inode", "offset", "rows", "meta", "layout", "stats", "recent", "extra", "refreshed", "refreshed_rows"):
+            if name in state:
+                setattr(self, name, state[name])
+
+
+    def save(self):
+        """
+        Saves the state of the channel, written under a temporary name and moved into place.
+
+            Parameters
+            -----------
+                None
+
+            Returns
+            -------
+                None
+        """
+        state = {name: getattr(self, name) for name in ("path", "inode", "offset", "rows", "meta", "layout", "stats",
+                                                         "recent", "extra", "refreshed", "refreshed_rows")}
+        temp = f"{self.state_path}.{os.getpid()}.tmp"
+        os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+        with open(temp, "w") as file:
+            json.dump(state, file)
+        os.replace(temp, self.state_path)
+
+
+    def line_end(self, path, start, size):
+        """
+        Returns the offset after the last complete line of a log, a line still being written is left for later.
+
+            Parameters
+            -----------
+                path: str
+                    the path to the log
+                start: int
+                    the offset the search stops at
+                size: int
+                    the size of the log
+
+            Returns
+            -------
+                int: the offset after the last newline, start if there is none after it
+        """
+        with open(path, "rb") as file:
+            pos = size
+            while pos > start:
+                block = max(start, pos - TAIL_BLOCK)
+                file.seek(block)
+                newline = file.read(pos - block).rfind(b"\n")
+                if newline != -1:
+                    return block + newline + 1
+                pos = block
+        return start
+
+
+    def update(self, path, parser):
+        """
+        Parses the lines appended to a log since the last update and adds them to the statistics.
+
+            Parameters
+            -----------
+                path: str
+                    the path to the log
+                parser: function
+                    the parseLog() method of the channel, called with the path and a (start, end) byte span,
+                    returns (columns dict, meta dict)
+
+            Returns
+            -------
+                dict: per column name, the readings of the new lines, None if there were no new lines
+        """
+        stat = os.stat(path)
+        if path != self.path or stat.st_ino != self.inode or stat.st_size < self.offset:
+            self.reset(path, stat.st_ino)
+        end = self.line_end(path, self.offset, stat.st_size)
+        if end <= self.offset:
+            return None
+        columns, meta = parser(path, (self.offset, end))
+        columns = {name: np.asarray(values) for name, values in columns.items()}
+        rows = len(next(iter(columns.values()))) if columns else 0
+        if rows > 0:
+            layout = [[name, values.shape[1] if values.ndim == 2 else None] for name, values in columns.items()]
+            if not self.layout:
+                self.layout = layout
+                self.meta = meta
+            elif layout != self.layout:
+                # The columns changed within the log (e.g. another precursor count), follow it again from the top
+                print(f"[WARNING]: Column layout of {path} changed, following it again from the top")
+                self.reset(path, stat.st_ino)
+                return self.update(path, parser)
+            self.consume(columns, rows)
+        self.offset = end
+        self.save()
+        return columns
+
+
+    def consume(self, columns, rows):
+        """
+        Adds the readings of new lines to the statistics and the series file, one reduction per column.
+
+            Parameters
+            -----------
+                columns: dict
+                    per column name, the readings of the new lines
+                rows: int
+                    the number of new readings
+
+            Returns
+            -------
+                None
+        """
+        for name, values in columns.items():
+            values = values.astype(np.float64)
+            stat = self.stats.get(name)
+            if stat is None:
+                stat = {"first": values[0].tolist(), "max": values.max(axis=0).tolist(), "sum": 0.0}
+                self.stats[name] = stat
+            else:
+                stat["max"] = np.maximum(stat["max"], values.max(axis=0)).tolist()
+            # Added up in file order after the previous sum, so the averages match the ones of the finished run
+            previous = np.broadcast_to(np.asarray(stat["sum"], dtype=np.float64), (1,) + values.shape[1:])
+            stat["sum"] = np.cumsum(np.concatenate((previous, values)), axis=0)[-1].tolist()
+            stat["last"] = values[-1].tolist()
+        if self.recent_column in columns:
+            self.recent = (self.recent + columns[self.recent_column][-RECENT_ROWS:].tolist())[-RECENT_ROWS:]
+
+        block = np.column_stack([values.reshape(rows, -1).astype(np.float64) for values in columns.values()])
+        os.makedirs(os.path.dirname(self.series_path), exist_ok=True)
+        with open(self.series_path, "ab") as file:
+            # Rows appended by an update that stopped before save() are parsed again, drop them first
+            file.truncate(self.rows * block.shape[1] * block.itemsize)
+            block.tofile(file)
+        self.rows += rows
+
+
+    def series(self):
+        """
+        Returns every reading so far, read back from the series file.
+
+            Parameters
+            -----------
+                None
+
+            Returns
+            -------
+                dict: per column name, a numpy array of the readings (the cycles as integers)
+        """
+        widths = [1 if width is None else width for name, width in self.layout]
+        try:
+            block = np.fromfile(self.series_path, dtype=np.float64)
+        except FileNotFoundError:
+            block = np.empty(0, dtype=np.float64)
+        block = block[:self.rows * sum(widths)].reshape(-1, sum(widths))
+        columns = {}
+        start = 0
+        for (name, width), size in zip(self.layout, widths):
+            columns[name] = block[:, start] if width is None else block[:, start:start + width]
+            start += size
+        if "cycles" in columns:
+            columns["cycles"] = columns["cycles"].astype(np.int64)
+        return columns
+
+
+    def completed_cycles(self):
+        """
+        Returns the completed and total cycles of the run so far, the cycles count down like in the logs.
+
+            Parameters
+            -----------
+                None
+
+            Returns
+            -------
+                int: the completed cycles, at most the total
+                int: the total cycles of the recipe
+        """
+        total = int(self.stats["cycles"]["first"])
+        return min(total - int(self.stats["cycles"]["last"]) + 1, total), total
+
+
+    def mean(self, name):
+        """
+        Returns the average of a column so far.
+
+            Parameters
+            -----------
+                name: str
+                    the column name
+
+            Returns
+            -------
+                float: the average (list of floats, one per column, for a block)
+        """
+        return (np.asarray(self.stats[name]["sum"]) / self.rows).tolist()
+
+
+    def due(self):
+        """
+        Returns True if there are new readings and the last refresh is REFRESH_SECONDS old.
+
+            Parameters
+            -----------
+                None
+
+            Returns
+            -------
+                bool: True if the live report and plots should be refreshed
+        """
+        return self.rows > self.refreshed_rows and time.time() - self.refreshed >= REFRESH_SECONDS
+
+
+    def write_report(self, name, text):
+        """
+        Writes a live report to the live output folder.
+
+            Parameters
+            -----------
+                name: str
+                    the file name of the report
+                text: str
+                    the report
+
+            Returns
+            -------
+                None
+        """
+        os.makedirs(self.output_path, exist_ok=True)
+        with open(os.path.join(self.output_path, name), "w") as file:
+            file.write(text)
+
+
+    def mark_refreshed(self):
+        """
+        Remembers that the live report and plots were refreshed with the readings so far.
+
+            Parameters
+            -----------
+                None
+
+            Returns
+            -------
+                None
+        """
+        self.refreshed = time.time()
+        self.refreshed_rows = self.rows
+        self.save()
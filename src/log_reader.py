@@ -0,0 +1,309 @@
+import io
+import os
+import mmap
+import numpy as np
+
+
+# Bytes handed to the parser per read from the memory map
+CHUNK_SIZE = 1024 * 1024
+
+
+class MappedStream(io.RawIOBase):
+    """
+    MappedStream is a read-only stream over a memory mapped file
+
+    np.loadtxt reads the log through it in CHUNK_SIZE pieces straight from the page cache,
+    the file is never copied into a Python string or split into line objects.
+
+    Attributes:
+    -----------
+    mm: mmap.mmap
+        the memory map of the file
+    pos: int
+        the offset of the next read
+    end: int
+        the offset the stream ends at
+    """
+
+
+    def __init__(self, mm, pos=0, end=None):
+        """
+        Constructor for the MappedStream class
+
+            Parameters
+            -----------
+                mm: mmap.mmap
+                    the memory map of the file
+                pos: int
+                    the offset to start reading at
+                end: int
+                    the offset to stop reading at, the end of the file if None
+
+            Returns
+            -------
+                None
+        """
+        self.mm = mm
+        self.pos = pos
+        self.end = len(mm) if end is None else end
+
+
+    def readable(self):
+        return True
+
+
+    def readinto(self, buffer):
+        n = max(0, min(len(buffer), self.end - self.pos))
+        buffer[:n] = self.mm[self.pos:self.pos + n]
+        self.pos += n
+        return n
+
+
+def first_data_line(mm, header, start=0, end=None):
+    """
+    Finds the first data line of a log, skipping blank and header lines.
+
+        Parameters
+        ----------
+            mm: mmap.mmap
+                the memory map of the log
+            header: str
+                the first token of header lines
+            start: int
+                the offset to start looking at, the start of a line
+            end: int
+                the offset to stop looking at, the end of the file if None
+
+        Returns
+        -------
+            list: the tokens of the line, empty if the log has no data
+            int: the offset of the line in the file
+    """
+    end = len(mm) if end is None else end
+    mm.seek(start)
+    offset = start
+    for line in iter(mm.readline, b""):
+        if offset >= end:
+            break
+        tokens = line.decode("latin-1").split()
+        if tokens and tokens[0] != header:
+            return tokens, offset
+        offset += len(line)
+    return [], offset
+
+
+class LogFormat:
+    """
+    LogFormat describes the layout of one kind of machine log and parses it
+
+    Every pressure, plasma and heating log of every tool is read by parse(), the tools only differ
+    in their spec: the header token, the leading numeric columns, an optional block of columns whose
+    width changes from log to log (the precursors of MVD and Savannah, ended by the first value at
+    or above 1000), the columns after that block and where the recipe name starts. The spec is compiled once per column layout into a structured dtype and
+    the field positions to load, the log is then memory mapped and parsed by np.loadtxt in one pass
+    without copying it into Python strings.
+
+    Attributes:
+    -----------
+    header: str
+        the first token of header lines ("Pressure", "RF", "Heater")
+    columns: list
+        (name, field, dtype) of each leading column, field counts the values of a line without the separators
+    separator: str
+        the token between the values (" - " separated logs), None if the values are only separated by spaces
+    block: tuple
+        (name, first field, end marker, meta key) of the variable block, None if the layout is fixed.
+        The block runs up to the first field whose value is at or above the end marker, its width goes
+        into the meta dict under the meta key
+    tail: list
+        (name, offset, dtype) of each column after the block, offset counts from the end of the block
+    recipe: int
+        the field the recipe name starts at (counted from the end of the block if there is one),
+        the field after the last column if None
+    compiled: dict
+        per column layout, the dtype, the field positions to load and the field the recipe starts at
+
+    Methods:
+    --------
+    names():
+        Returns the column names in file order
+    empty():
+        Returns the result of a log without data
+    compile(positions, index):
+        Compiles the spec for one column layout
+    parse(path, span=None):
+        Parses a log
+    """
+
+
+    def __init__(self, header, columns, separator=None, block=None, tail=(), recipe=None):
+        """
+        Constructor for the LogFormat class
+
+            Parameters
+            -----------
+                header: str
+                    the first token of header lines
+                columns: list
+                    (name, field, dtype) of each leading column
+                separator: str
+                    the token between the values, None if there is none
+                block: tuple
+                    (name, first field, end marker, meta key) of the variable block, None if there is none
+                tail: list
+                    (name, offset from the end of the block, dtype) of each column after the block
+                recipe: int
+                    the field the recipe name starts at, the field after the last column if None
+
+            Returns
+            -------
+                None
+        """
+        self.header = header
+        self.columns = list(columns)
+        self.separator = separator
+        self.block = block
+        self.tail = list(tail)
+        self.recipe = recipe
+        self.compiled = {}
+
+
+    def names(self):
+        """
+        Returns the column names in file order, the block between the leading columns and the tail.
+
+            Parameters
+            -----------
+                None
+
+            Returns
+            -------
+                list: the column names
+        """
+        block = [] if self.block is None else [self.block[0]]
+        return [name for name, field, kind in self.columns] + block + [name for name, offset, kind in self.tail]
+
+
+    def empty(self):
+        """
+        Returns the result of a log without data lines, empty columns of the right types.
+
+            Parameters
+            -----------
+                None
+
+            Returns
+            -------
+                dict: per column name, an empty numpy array
+                dict: the empty recipe name, and a block width of 0
+        """
+        columns = {name: np.empty(0, dtype=kind) for name, field, kind in self.columns}
+        meta = {"recipe": ""}
+        if self.block is not None:
+            columns[self.block[0]] = np.empty((0, 0), dtype=np.float64)
+            meta[self.block[3]] = 0
+        columns.update({name: np.empty(0, dtype=kind) for name, offset, kind in self.tail})
+        return columns, meta
+
+
+    def compile(self, positions, index):
+        """
+        Compiles the spec for one column layout, the result is kept for the next log with the same layout.
+
+            Parameters
+            -----------
+                positions: list
+                    the token position of every field of the first data line, separators left out
+                index: int
+                    the field the variable block ends at, None if there is no block
+
+            Returns
+            -------
+                numpy.dtype: the structured dtype of a data line, the block as one subarray field
+                list: the token positions to load, in the order of the dtype fields
+                int: the field the recipe name starts at
+        """
+        key = (tuple(positions), index)
+        if key in self.compiled:
+            return self.compiled[key]
+        fields = [(name, kind) for name, field, kind in self.columns]
+        wanted = [field for name, field, kind in self.columns]
+        recipe = max(wanted, default=-1) + 1
+        if self.block is not None:
+            name, start, end, count = self.block
+            if index > start:
+                fields.append((name, "f8", (index - start,)))
+                wanted.extend(range(start, index))
+            fields.extend((name, kind) for name, offset, kind in self.tail)
+            wanted.extend(index + offset for name, offset, kind in self.tail)
+            recipe = max([index - 1] + wanted) + 1
+        if self.recipe is not None:
+            recipe = self.recipe if self.block is None else index + self.recipe
+        if max(wanted, default=-1) >= len(positions):
+            print(f"[WARNING]: A {self.header} log line has {len(positions)} values, the log format needs {max(wanted) + 1}")
+            raise ValueError(f"{self.header} log line has {len(positions)} values, expected at least {max(wanted) + 1}")
+        self.compiled[key] = (np.dtype(fields), [positions[field] for field in wanted], recipe)
+        return self.compiled[key]
+
+
+    def parse(self, path, span=None):
+        """
+        Parses a log, or only the whole lines inside a byte span of it. Header lines (first token
+        equal to header) and blank lines are skipped, the layout and the recipe name are taken from
+        the first data line.
+
+            Parameters
+            -----------
+                path: str
+                    the path to the log
+                span: tuple
+                    (start, end) byte offsets of whole lines to read, the whole file if None
+
+            Returns
+            -------
+                dict: per column name, a numpy array of that column (views into one record array),
+                      the block as a 2-D array with one column per field
+                dict: the recipe name, and the block width under the meta key of the block
+        """
+        if os.path.getsize(path) == 0:
+            return self.empty()
+
+        with open(path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            start, end = span if span is not None else (0, len(mm))
+            tokens, offset = first_data_line(mm, self.header, start, end)
+            if not tokens:
+                return self.empty()
+            # Token positions of the values, skipping the separators
+            positions = [i for i, token in enumerate(tokens) if token != self.separator]
+            values = [tokens[i] for i in positions]
+            index = None
+            if self.block is not None:
+                index = self.block[1]
+                while index < len(values) and float(values[index]) < self.block[2]:
+                    index += 1
+            dtype, usecols, recipe = self.compile(positions, index)
+
+            # Parsing starts at the first data line. If the header word shows up again further down
+            # (a restarted log, or a recipe name containing it) those lines are dropped as comments,
+            # which numpy handles more slowly, the header word can only appear after the numeric columns
+            comments = self.header if mm.find(self.header.encode(), offset, end) != -1 else None
+            with io.TextIOWrapper(io.BufferedReader(MappedStream(mm, offset, end), CHUNK_SIZE), encoding="latin-1") as text:
+                records = np.loadtxt(text, dtype=dtype, usecols=usecols, comments=comments, ndmin=1)
+
+        meta = {"recipe": " ".join(values[recipe:])}
+        columns = {}
+        for name in self.names():
+            if name in dtype.names:
+                columns[name] = records[name]
+            else:
+                # A block without fields, e.g. a heating log without precursors
+                columns[name] = np.empty((len(records), 0), dtype=np.float64)
+        if self.block is not None:
+            meta[self.block[3]] = index - self.block[1]
+        return columns, meta
+
+
+# Layout of the pressure logs of every machine: time - pressure - cycle - recipe name
+PRESSURE_LOG = LogFormat("Pressure", [("pTime", 0, "f8"), ("Pressure", 1, "f8"), ("cycles", 2, "i4")], separator="-")
+# Layout of the plasma logs of the Fiji machines: time - power - reflected power - cycle - recipe name
+PLASMA_LOG = LogFormat("RF", [("rfTime", 0, "f8"), ("Plasma", 1, "f8"), ("PlasmaReflect", 2, "f8"), ("cycles", 3, "i4")], separator="-")
@@ -1,62 +1,257 @@
 import subprocess
 import os
+import sys
+import time
 import timeit
+import logging
 from datetime import datetime
+from src.Machines.registry import read_register, get_runner
+from src.scheduler import Scheduler
+from src.collector import get_collector
+from src.uploader import get_upload_queue
+from src.blob_store import prune_blobs
+from src.processed_index import compact
 
-def main():
+
+# Worker pool shared by all cycles in "parallel" dispatch mode
+_scheduler = None
+
+# Seconds between two runs of the housekeeping of maintain() in the same process
+MAINTENANCE_INTERVAL = 86400
+# Time of the last maintain() of this process
+_maintained = None
+
+# Hosts and directories fetched at the same time by collect(), None keeps the forks of ansible.cfg
+COLLECT_FORKS = None
+# Fact cache of the "persistent" collection mode, relative to the repository root
+FACT_CACHE_DIR = os.path.join("ansible", ".facts")
+# Settings of the "persistent" collection mode: facts are gathered once a day instead of every cycle,
+# the SSH master connection of a host stays open between cycles and modules are piped through it
+PERSISTENT_ANSIBLE = {
+    "ANSIBLE_GATHERING": "smart",
+    "ANSIBLE_CACHE_PLUGIN": "jsonfile",
+    "ANSIBLE_CACHE_PLUGIN_TIMEOUT": "86400",
+    "ANSIBLE_SSH_ARGS": "-C -o ControlMaster=auto -o ControlPersist=15m",
+    "ANSIBLE_PIPELINING": "True",
+}
+
+
+def run_machine_type(machineType, register):
     """
-    Main function to run the entire data collection, processing, and uploading pipeline
+    Runs the runner of one machine type inside the current interpreter and times it.
+    Errors are logged so one failing machine type does not stop the others.
 
         Parameters
         ----------
-            None
+            machineType: str
+                the machine type as written in register.txt (e.g. Fiji200)
+            register: list
+                the parsed register entries passed on to the runner
+
+        Returns
+        -------
+            float: the wall time of the runner in seconds
+    """
+    start = timeit.default_timer()
+    try:
+        runner = get_runner(machineType)()
+        runner.run(register)
+    except Exception as e:
+        print(f"[WARNING]: {machineType} runner failed: {e}")
+        logging.error(f"Exception occured in {machineType} runner: {e}", exc_info=True)
+    finally:
+        # Figures are freed on process exit in subprocess mode, close them here instead
+        if "matplotlib.pyplot" in sys.modules:
+            sys.modules["matplotlib.pyplot"].close("all")
+    return timeit.default_timer() - start
+
+
+def run_machine_subprocess(machineType):
+    """
+    Runs the runner of one machine type in a fresh python3 interpreter and times it.
+
+        Parameters
+        ----------
+            machineType: str
+                the machine type as written in register.txt (e.g. Fiji200)
+
+        Returns
+        -------
+            float: the wall time of the runner in seconds
+    """
+    start = timeit.default_timer()
+    subprocess.run(f"pwd", shell=True)
+    runner_path = os.path.join('src', 'Machines', machineType, f"{machineType}.py")
+    subprocess.run(f"python3 {runner_path}", shell=True)
+    return timeit.default_timer() - start
+
+
+def collect(mode="persistent", forks=COLLECT_FORKS):
+    """
+    Runs the ansible playbook that copies the newest data files from every host to the collector
+
+        Parameters
+        ----------
+            mode: str
+                "persistent" caches the host facts between runs and keeps the SSH connections open
+                between cycles (ControlPersist) with pipelining, "fresh" uses the plain ansible.cfg settings,
+                "sftp" skips ansible and pulls the files with the built-in SFTP collector (src/collector.py),
+                "tail" is "sftp" that only pulls the bytes appended to logs that are still being written
+            forks: int
+                the number of hosts and directories fetched at the same time, the forks of ansible.cfg
+                (or the transfers of the SFTP collector) if None
 
         Returns
         -------
             None
     """
+    if mode in ("sftp", "tail"):
+        collector = get_collector(tail=mode == "tail")
+        if forks:
+            collector.transfers = forks
+        collector.collect()
+        return
+
     # ANSIBLE
     current_directory = os.getcwd()
     ansible_command = ['ansible-playbook', '-i', os.path.join('ansible', 'hosts.yml'), os.path.join('ansible', 'playbook.yml')]
+    if forks:
+        ansible_command += ['--forks', str(forks)]
+    env = dict(os.environ)
+    if mode == "persistent":
+        env.update(PERSISTENT_ANSIBLE)
+        env["ANSIBLE_CACHE_PLUGIN_CONNECTION"] = os.path.join(current_directory, FACT_CACHE_DIR)
+    elif mode != "fresh":
+        print(f"[WARNING]: Unknown collection mode {mode}, expected persistent, fresh, sftp or tail")
+        raise ValueError(f"Unknown collection mode: {mode}")
 
     try:
-        result = subprocess.run(ansible_command, cwd=current_directory, capture_output=True, text=True)
+        result = subprocess.run(ansible_command, cwd=current_directory, capture_output=True, text=True, env=env)
         print('Errors:', result.stderr)
         print('Output:', result.stdout)
     except Exception as e:
         raise e
 
 
+def process(register=None, dispatch="parallel", workers=None):
+    """
+    Runs the algorithms for the registered machines and uploads the results
+
+        Parameters
+        ----------
+            register: list
+                the register entries to process, all of register.txt if None
+                (the "subprocess" mode always processes all of register.txt)
+            dispatch: str
+                "parallel" processes independent machines concurrently on a pool of worker processes,
+                "inprocess" imports every runner once and runs the machine types one after another,
+                "subprocess" starts one python3 interpreter per machine type
+            workers: int
+                the size of the worker pool in "parallel" mode, defaults to the number of CPUs (at most 4)
+
+        Returns
+        -------
+            dict: the wall time in seconds of each machine (parallel) or machine type that was run
+    """
+    global _scheduler
+    # Uploads run on the upload thread of this process while the machines are processed
+    uploads = get_upload_queue()
+    uploads.start()
     # Loops through all machines registered in the register.txt file
     start = timeit.default_timer()
-    with open(os.path.join('src', 'register.txt'), 'r') as file:
-        runMachine = []
-        for line in file:
-            values = line.strip().split()
-            runMachine.append(tuple(values))
-        if not runMachine:
-            raise Exception("No machines registered in register.txt")
-
-        # Each machine named .py file will process all of that type of machine, we don't want to run the same machine twice
-        donepile = []
-        for machine in runMachine:
-            subprocess.run(f"pwd", shell=True)
-            # MAYBE CHANGE THIS TO CALLING MAIN FUNC INSTEAD OF RUNNING THE FILE
-            if machine[0] not in donepile:
-                try:
-                    runner_path = os.path.join('src', 'Machines', machine[0], f"{machine[0]}.py")
-                    subprocess.run(f"python3 {runner_path}", shell=True)
-                    print("---------------------------------------\n")
-                    print(f"Finished {machine[0]} at: " + datetime.now().strftime("%m:%d:%Y") +  "~" + datetime.now().strftime("%H:%M:%S") + "\n")
-                    print("---------------------------------------")
-                    donepile.append(machine[0])
-                except Exception as e:
-                    raise e
-                
-    file.close()
+    runMachine = register
+    if runMachine is None:
+        runMachine = read_register(os.path.join('src', 'register.txt'))
+    if not runMachine:
+        raise Exception("No machines registered in register.txt")
+
+    if dispatch == "parallel":
+        if _scheduler is None or (workers and _scheduler.workers != workers):
+            if _scheduler is not None:
+                _scheduler.close()
+            _scheduler = Scheduler(workers)
+        timings = _scheduler.run(runMachine)
+        # The workers only spool their uploads, pick them up now
+        uploads.notify()
+        stop = timeit.default_timer()
+        print('Runtime of Algs: ', stop - start)
+        for machine, elapsed in sorted(timings.items()):
+            print(f"  {machine}: {elapsed:.3f}s")
+        return timings
+
+    # Each machine named .py file will process all of that type of machine, we don't want to run the same machine twice
+    timings = {}
+    for machine in runMachine:
+        if machine[0] in timings:
+            continue
+        if dispatch == "subprocess":
+            timings[machine[0]] = run_machine_subprocess(machine[0])
+        else:
+            timings[machine[0]] = run_machine_type(machine[0], runMachine)
+        print("---------------------------------------\n")
+        print(f"Finished {machine[0]} at: " + datetime.now().strftime("%m:%d:%Y") +  "~" + datetime.now().strftime("%H:%M:%S") + "\n")
+        print(f"{machine[0]} Runtime: {timings[machine[0]]:.3f}s\n")
+        print("---------------------------------------")
+
+    uploads.notify()
     stop = timeit.default_timer()
     print('Runtime of Algs: ', stop - start)
+    for machineType, elapsed in timings.items():
+        print(f"  {machineType}: {elapsed:.3f}s")
+    return timings
+
+
+def maintain(interval=MAINTENANCE_INTERVAL):
+    """
+    Cleans up the state that grows with every run: removes the blobs no Output_Data folder uses any more
+    and compacts the processed index. Runs after process(), while no worker is using the index.
+    Runs at most once per interval in the same process, errors are logged so they never stop the pipeline.
+
+        Parameters
+        ----------
+            interval: float
+                seconds between two runs of the housekeeping
+
+        Returns
+        -------
+            None
+    """
+    global _maintained
+    if _maintained is not None and time.monotonic() - _maintained < interval:
+        return
+    _maintained = time.monotonic()
+    try:
+        prune_blobs()
+        compact()
+    except Exception as e:
+        print(f"[WARNING]: Housekeeping failed: {e}")
+        logging.error(f"Exception occured in housekeeping: {e}", exc_info=True)
+
+
+def main(dispatch="parallel", workers=None, collection="persistent"):
+    """
+    Main function to run the entire data collection, processing, and uploading pipeline
+
+        Parameters
+        ----------
+            dispatch: str
+                "parallel", "inprocess" or "subprocess", see process()
+            workers: int
+                the size of the worker pool in "parallel" mode
+            collection: str
+                "persistent", "fresh", "sftp" or "tail", see collect()
+
+        Returns
+        -------
+            dict: the wall time in seconds of each machine (parallel) or machine type that was run
+    """
+    collect(collection)
+    timings = process(None, dispatch, workers)
+    maintain()
+    # One pass over the pipeline, finish the uploads before exiting
+    get_upload_queue().close()
+    return timings
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
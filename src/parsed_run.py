@@ -0,0 +1,314 @@
+import os
+import json
+import numpy as np
+from collections import OrderedDict
+from src.checksum import checksum
+
+
+# Folder inside data(<name>) that holds the parsed run sidecars
+SIDECAR_DIR = ".parsed"
+# Bumped whenever a parser changes what it returns, older sidecars are then parsed again
+SIDECAR_VERSION = 1
+
+
+class ParsedRun:
+    """
+    ParsedRun holds the parsed contents of one version of a machine log
+
+    The arrays are made read-only, so one ParsedRun can be shared by the report, plot,
+    base pressure and upload steps without any of them changing what the others see.
+
+    Attributes:
+    -----------
+    path: str
+        the path to the log
+    key: tuple
+        (path, kind, size, mtime_ns) of the log when it was parsed
+    columns: dict
+        per column name, a read-only numpy array
+    meta: dict
+        values taken from the log besides the columns, e.g. the recipe name
+    """
+
+
+    def __init__(self, path, key, columns, meta):
+        """
+        Constructor for the ParsedRun class
+
+            Parameters
+            -----------
+                path: str
+                    the path to the log
+                key: tuple
+                    (path, kind, size, mtime_ns) of the log when it was parsed
+                columns: dict
+                    per column name, a numpy array
+                meta: dict
+                    values taken from the log besides the columns
+
+            Returns
+            -------
+                None
+        """
+        for column in columns.values():
+            column.flags.writeable = False
+        self.path = path
+        self.key = key
+        self.columns = columns
+        self.meta = meta
+
+
+def sidecar_path(path):
+    """
+    Returns the path of the sidecar of a log: data(<name>)/.parsed/<channel dir>/<log name>.npz
+
+        Parameters
+        ----------
+            path: str
+                the path to the log, inside a channel directory of data(<name>)
+
+        Returns
+        -------
+            str: the path to the sidecar file
+    """
+    channelDir = os.path.dirname(os.path.abspath(path))
+    return os.path.join(os.path.dirname(channelDir), SIDECAR_DIR, os.path.basename(channelDir), os.path.basename(path) + ".npz")
+
+
+def load_sidecar(path, kind, fileSum):
+    """
+    Loads the parsed columns of a log from its sidecar, if the sidecar matches the log.
+
+        Parameters
+        ----------
+            path: str
+                the path to the log
+            kind: str
+                the channel of the log (Pressure, Heating, Plasma)
+            fileSum: str
+                the checksum of the log now
+
+        Returns
+        -------
+            tuple: (columns dict, meta dict), None if there is no valid sidecar
+    """
+    try:
+        with np.load(sidecar_path(path), allow_pickle=False) as sidecar:
+            header = json.loads(str(sidecar["__header__"]))
+            if header.get("version") != SIDECAR_VERSION or header.get("kind") != kind or header.get("checksum") != fileSum:
+                return None
+            columns = {name: sidecar[name] for name in header["columns"]}
+    except (OSError, ValueError, KeyError):
+        return None
+    return columns, header["meta"]
+
+
+def save_sidecar(path, kind, fileSum, columns, meta):
+    """
+    Saves the parsed columns of a log to its sidecar. The file is written under a temporary
+    name and moved into place, so readers never see half a sidecar.
+
+        Parameters
+        ----------
+            path: str
+                the path to the log
+            kind: str
+                the channel of the log (Pressure, Heating, Plasma)
+            fileSum: str
+                the checksum of the log that was parsed
+            columns: dict
+                per column name, a numpy array
+            meta: dict
+                values taken from the log besides the columns, must be JSON serializable
+
+        Returns
+        -------
+            None
+    """
+    target = sidecar_path(path)
+    temp = f"{target}.{os.getpid()}.tmp"
+    header = {"version": SIDECAR_VERSION, "kind": kind, "checksum": fileSum, "columns": list(columns), "meta": meta}
+    try:
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(temp, "wb") as file:
+            np.savez(file, __header__=np.array(json.dumps(header)), **columns)
+        os.replace(temp, target)
+        prune_sidecars(path)
+    except OSError as e:
+        print(f"[WARNING]: Could not write parsed run sidecar {target}: {e}")
+        try:
+            os.remove(temp)
+        except OSError:
+            pass
+
+
+def remove_sidecar(path):
+    """
+    Removes the sidecar of a log, e.g. when the log is renamed.
+
+        Parameters
+        ----------
+            path: str
+                the path to the log
+
+        Returns
+        -------
+            None
+    """
+    try:
+        os.remove(sidecar_path(path))
+    except FileNotFoundError:
+        pass
+
+
+def prune_sidecars(path):
+    """
+    Removes the sidecars of the logs that are gone from the channel directory of a log (renamed raw
+    logs, deleted logs), so the sidecar folder only holds the logs that are still there.
+    Runs whenever a new sidecar is written.
+
+        Parameters
+        ----------
+            path: str
+                the path to a log of the channel directory
+
+        Returns
+        -------
+            int: the number of sidecars removed
+    """
+    channelDir = os.path.dirname(os.path.abspath(path))
+    folder = os.path.dirname(sidecar_path(path))
+    removed = 0
+    for name in os.listdir(folder):
+        if name.endswith(".npz") and not os.path.exists(os.path.join(channelDir, name[:-len(".npz")])):
+            try:
+                os.remove(os.path.join(folder, name))
+                removed += 1
+            except FileNotFoundError:
+                pass
+    return removed
+
+
+class RunCache:
+    """
+    RunCache parses each version of a log once and hands out the same ParsedRun afterwards
+
+    Entries are keyed by (path, kind, size, mtime_ns), a log that grew or was rewritten is
+    parsed again. The least recently used runs are dropped past max_entries, since a run of a
+    long recipe can hold millions of rows.
+    Runs that are not in memory are first looked up in the .npz sidecar of the log, which is
+    only used if it was written from a log with the same checksum. Logs that have to be parsed
+    get a sidecar, so restarts and re-processing load binary columns instead of the text.
+
+    Attributes:
+    -----------
+    entries: OrderedDict
+        per key, the ParsedRun
+    max_entries: int
+        the number of runs remembered
+    sidecars: bool
+        True to read and write the .npz sidecars
+
+    Methods:
+    --------
+    get(path, kind, parser):
+        Returns the ParsedRun of the current version of a log, parsing it if needed
+    clear():
+        Forgets all runs
+    """
+
+
+    def __init__(self, max_entries=8, sidecars=True):
+        """
+        Constructor for the RunCache class
+
+            Parameters
+            -----------
+                max_entries: int
+                    the number of runs remembered
+                sidecars: bool
+                    True to read and write the .npz sidecars
+
+            Returns
+            -------
+                None
+        """
+        self.entries = OrderedDict()
+        self.max_entries = max_entries
+        self.sidecars = sidecars
+
+
+    def get(self, path, kind, parser):
+        """
+        Returns the ParsedRun of the current version of a log, parsing it if needed.
+
+            Parameters
+            -----------
+                path: str
+                    the path to the log
+                kind: str
+                    the channel of the log (Pressure, Heating, Plasma), part of the key
+                parser: function
+                    called with the path, returns (columns dict, meta dict)
+
+            Returns
+            -------
+                ParsedRun: the parsed log
+        """
+        stat = os.stat(path)
+        key = (path, kind, stat.st_size, stat.st_mtime_ns)
+        run = self.entries.get(key)
+        if run is None:
+            loaded = None
+            if self.sidecars:
+                fileSum = checksum(path)
+                loaded = load_sidecar(path, kind, fileSum)
+            if loaded is None:
+                loaded = parser(path)
+                if self.sidecars:
+                    save_sidecar(path, kind, fileSum, *loaded)
+            run = ParsedRun(path, key, *loaded)
+            self.entries[key] = run
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        self.entries.move_to_end(key)
+        return run
+
+
+    def clear(self):
+        """
+        Forgets all runs.
+
+            Parameters
+            -----------
+                None
+
+            Returns
+            -------
+                None
+        """
+        self.entries.clear()
+
+
+# Runs parsed by this process
+_cache = RunCache()
+
+
+def parsed_run(path, kind, parser):
+    """
+    Returns the ParsedRun of a log using the run cache of this process.
+
+        Parameters
+        ----------
+            path: str
+                the path to the log
+            kind: str
+                the channel of the log (Pressure, Heating, Plasma)
+            parser: function
+                called with the path on a cache miss, returns (columns dict, meta dict)
+
+        Returns
+        -------
+            ParsedRun: the parsed log
+    """
+    return _cache.get(path, kind, parser)
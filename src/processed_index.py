@@ -0,0 +1,249 @@
+import os
+import time
+import sqlite3
+from src.checksum import checksum
+
+
+# Index shared by all machines on the collector
+INDEX_PATH = os.path.join("src", "processed.db")
+
+# Data directory of each channel, used to sort old process_stack.txt entries into channels
+CHANNEL_DIRS = {"Pressure-Data": "Pressure", "Heating-Data": "Heating", "Plasma-Data": "Plasma"}
+
+
+class ProcessedIndex:
+    """
+    ProcessedIndex records which data files have already been processed, replacing process_stack.txt
+
+    Entries are keyed by (machine, channel, file path, checksum) in a SQLite table, so lookups are
+    a primary key search instead of a scan of every file ever processed. The database runs in WAL
+    mode with a busy timeout, claims are a single INSERT OR IGNORE, so worker processes can share it.
+
+    Attributes:
+    -----------
+    path: str
+        the path to the SQLite database
+    conn: sqlite3.Connection
+        the connection of the current process
+    pid: int
+        the process that opened conn, forked workers open their own connection
+    imported: set
+        machines whose process_stack.txt was already checked by this process
+
+    Methods:
+    --------
+    connect():
+        Returns the connection of this process, creating the tables on first use
+    contains(machine, channel, path, checksum):
+        Checks if a file was already processed
+    claim(machine, channel, path, checksum):
+        Marks a file as processed, returns False if it already was
+    import_stack(machine, stack_path):
+        Imports the entries of an old process_stack.txt file
+    compact():
+        Drops superseded checksums and gives the free space back to the file system
+    """
+
+
+    def __init__(self, path=INDEX_PATH):
+        """
+        Constructor for the ProcessedIndex class
+
+            Parameters
+            -----------
+                path: str
+                    the path to the SQLite database
+
+            Returns
+            -------
+                None
+        """
+        self.path = path
+        self.conn = None
+        self.pid = None
+        self.imported = set()
+
+
+    def connect(self):
+        """
+        Returns the connection of this process, creating the tables on first use.
+
+            Parameters
+            -----------
+                None
+
+            Returns
+            -------
+                sqlite3.Connection: the connection to the index
+        """
+        if self.conn is None or self.pid != os.getpid():
+            self.conn = sqlite3.connect(self.path, timeout=30)
+            self.pid = os.getpid()
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            with self.conn:
+                self.conn.execute("CREATE TABLE IF NOT EXISTS processed ("
+                                  "machine TEXT, channel TEXT, path TEXT, checksum TEXT, processed_at REAL, "
+                                  "PRIMARY KEY (machine, channel, path, checksum)) WITHOUT ROWID")
+                self.conn.execute("CREATE TABLE IF NOT EXISTS imported (machine TEXT PRIMARY KEY)")
+        return self.conn
+
+
+    def contains(self, machine, channel, path, checksum):
+        """
+        Checks if a file was already processed.
+        Entries imported from process_stack.txt without a checksum match any checksum.
+
+            Parameters
+            -----------
+                machine: str
+                    the data folder of the machine
+                channel: str
+                    Pressure, Heating or Plasma
+                path: str
+                    the path to the data file
+                checksum: str
+                    the checksum of the data file
+
+            Returns
+            -------
+                bool: True if the file was already processed, False otherwise
+        """
+        row = self.connect().execute("SELECT 1 FROM processed WHERE machine = ? AND channel = ? AND path = ? AND checksum IN (?, '')",
+                                     (machine, channel, path, checksum)).fetchone()
+        return row is not None
+
+
+    def claim(self, machine, channel, path, checksum):
+        """
+        Marks a file as processed.
+
+            Parameters
+            -----------
+                machine: str
+                    the data folder of the machine
+                channel: str
+                    Pressure, Heating or Plasma
+                path: str
+                    the path to the data file
+                checksum: str
+                    the checksum of the data file
+
+            Returns
+            -------
+                bool: True if the file is new and now marked, False if it was already processed
+        """
+        if self.contains(machine, channel, path, checksum):
+            return False
+        conn = self.connect()
+        with conn:
+            cursor = conn.execute("INSERT OR IGNORE INTO processed VALUES (?, ?, ?, ?, ?)",
+                                  (machine, channel, path, checksum, time.time()))
+        # Another worker may have inserted the same row in between
+        return cursor.rowcount == 1
+
+
+    def import_stack(self, machine, stack_path):
+        """
+        Imports the entries of an old process_stack.txt file, once per machine.
+        The channel is taken from the data directory in each path, the checksum is
+        calculated for files that still exist and left empty otherwise.
+
+            Parameters
+            -----------
+                machine: str
+                    the data folder of the machine
+                stack_path: str
+                    the path to the process_stack.txt file
+
+            Returns
+            -------
+                int: the number of entries imported
+        """
+        conn = self.connect()
+        if conn.execute("SELECT 1 FROM imported WHERE machine = ?", (machine,)).fetchone() is not None:
+            return 0
+        rows = []
+        if os.path.exists(stack_path):
+            with open(stack_path, "r") as file:
+                for line in file:
+                    path = line.strip()
+                    if not path:
+                        continue
+                    channel = CHANNEL_DIRS.get(os.path.basename(os.path.dirname(path)), "")
+                    fileSum = checksum(path) if os.path.isfile(path) else ""
+                    rows.append((machine, channel, path, fileSum, os.path.getmtime(stack_path)))
+        with conn:
+            conn.executemany("INSERT OR IGNORE INTO processed VALUES (?, ?, ?, ?, ?)", rows)
+            conn.execute("INSERT OR IGNORE INTO imported VALUES (?)", (machine,))
+        return len(rows)
+
+
+    def compact(self):
+        """
+        Keeps only the newest checksum of every (machine, channel, path), then vacuums the database
+        and truncates the write-ahead log.
+
+            Parameters
+            -----------
+                None
+
+            Returns
+            -------
+                int: the number of entries removed
+        """
+        conn = self.connect()
+        with conn:
+            cursor = conn.execute("DELETE FROM processed WHERE processed_at < "
+                                  "(SELECT MAX(p.processed_at) FROM processed p WHERE p.machine = processed.machine "
+                                  "AND p.channel = processed.channel AND p.path = processed.path)")
+        conn.execute("VACUUM")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return cursor.rowcount
+
+
+# Index shared by all runners in this process
+_index = ProcessedIndex()
+
+
+def claim(dataPath, channel, path):
+    """
+    Marks a data file of a machine as processed, importing the machine's old process_stack.txt first.
+
+        Parameters
+        ----------
+            dataPath: str
+                the path to the data folder of the machine
+            channel: str
+                Pressure, Heating or Plasma
+            path: str
+                the path to the data file
+
+        Returns
+        -------
+            bool: True if the file is new and now marked, False if it was already processed or there is no file
+    """
+    if path is None:
+        return False
+    if dataPath not in _index.imported:
+        _index.import_stack(dataPath, os.path.join(dataPath, "process_stack.txt"))
+        _index.imported.add(dataPath)
+    return _index.claim(dataPath, channel, path, checksum(path))
+
+
+def compact():
+    """
+    Compacts the index shared by the runners of this process, see ProcessedIndex.compact().
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            int: the number of entries removed
+    """
+    removed = _index.compact()
+    if removed:
+        print(f"[NOTICE]: Removed {removed} superseded entries from the processed index")
+    return removed
@@ -0,0 +1,391 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from src.decimate import decimate
+
+
+# matplotlib is only imported once a figure is built. Any later pyplot import in this process
+# gets Agg straight away instead of probing for a GUI backend
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+# Threads that lay out and encode the PNG files of a process. matplotlib is not thread-safe (the font and
+# text layout caches are shared), one thread overlaps the rendering with the parsing of the next channel
+RENDER_WORKERS = 1
+# Idle figures kept per layout, more figures of a layout are dropped once rendered
+POOL_SIZE = 2
+# Decimation of long traces before plotting: "minmax" envelope, "lttb" or "none"
+DECIMATION = "minmax"
+# Points kept per pixel column of an axes, two hold the minimum and maximum of the column
+POINTS_PER_PIXEL = 2
+
+
+class PlotTemplate:
+    """
+    PlotTemplate is a figure that was laid out once and is reused for every plot of the same layout
+
+    The axes, titles and labels are created by a build function when the template is made.
+    Plotting only replaces the data of the lines and rescales the axes.
+
+    Attributes:
+    -----------
+    key: tuple
+        the layout of the figure, e.g. ("Pressure", 3)
+    fig: matplotlib.figure.Figure
+        the figure, drawn on its own Agg canvas and never registered with pyplot
+    axes: list
+        the axes of the figure
+    lines: dict
+        per name, the Line2D objects whose data is replaced
+    decimation: str
+        the decimation method of set_line(), see src/decimate.py
+    points_per_pixel: int
+        the points kept per pixel column of an axes
+
+    Methods:
+    --------
+    set_line(name, x, y):
+        Decimates a trace to the width of its axes and sets it as the data of a line
+    rescale():
+        Fits the view of every axes to its new data
+    reset():
+        Drops the data of every line
+    """
+
+
+    def __init__(self, key, fig, axes, lines, decimation=DECIMATION, points_per_pixel=POINTS_PER_PIXEL):
+        """
+        Constructor for the PlotTemplate class
+
+            Parameters
+            -----------
+                key: tuple
+                    the layout of the figure
+                fig: matplotlib.figure.Figure
+                    the figure
+                axes: list
+                    the axes of the figure
+                lines: dict
+                    per name, the Line2D objects whose data is replaced
+                decimation: str
+                    the decimation method of set_line()
+                points_per_pixel: int
+                    the points kept per pixel column of an axes
+
+            Returns
+            -------
+                None
+        """
+        self.key = key
+        self.fig = fig
+        self.axes = axes
+        self.lines = lines
+        self.decimation = decimation
+        self.points_per_pixel = points_per_pixel
+
+
+    def set_line(self, name, x, y):
+        """
+        Decimates a trace to the width of its axes and sets it as the data of a line.
+        An 8 inch figure only has a few hundred pixel columns per axes, a trace of a long run
+        with hundreds of thousands of samples is reduced to what can be seen before Agg draws it.
+
+            Parameters
+            -----------
+                name: str
+                    the key of the line in lines
+                x: array_like
+                    the x values of the trace
+                y: array_like
+                    the y values of the trace
+
+            Returns
+            -------
+                None
+        """
+        line = self.lines[name]
+        points = line.axes.bbox.width * self.points_per_pixel
+        line.set_data(*decimate(x, y, points, self.decimation))
+
+
+    def rescale(self):
+        """
+        Fits the view of every axes to its new data.
+
+            Parameters
+            -----------
+                None
+
+            Returns
+            -------
+                None
+        """
+        for ax in self.axes:
+            ax.relim()
+            ax.autoscale_view()
+
+
+    def reset(self):
+        """
+        Drops the data of every line so an idle template does not hold on to the arrays.
+
+            Parameters
+            -----------
+                None
+
+            Returns
+            -------
+                None
+        """
+        for line in self.lines.values():
+            line.set_data([], [])
+
+
+class PlotRenderer:
+    """
+    PlotRenderer hands out figure templates and writes them to PNG files on worker threads
+
+    The figures use the Agg canvas directly instead of pyplot, so no GUI backend is loaded
+    and nothing piles up in the pyplot figure registry. A template is owned by one caller from
+    acquire() until its PNG is written, then it goes back to the pool (or is dropped if the pool
+    is full). The runner keeps parsing the next channel or machine while the PNG files are encoded,
+    flush() waits for them before the output folders are copied. Building a figure and rendering
+    one never run at the same time, the drawing lock keeps matplotlib to one thread at a time.
+
+    Attributes:
+    -----------
+    workers: int
+        the number of render threads
+    pool_size: int
+        the number of idle figures kept per layout
+    decimation: str
+        the decimation method of the templates
+    points_per_pixel: int
+        the points kept per pixel column of an axes
+    idle: dict
+        per layout, the idle templates
+    pending: list
+        the futures of the PNG files that are not written yet
+    lock: threading.Lock
+        guards idle and pending, templates are released from the render threads
+    drawing: threading.Lock
+        held while matplotlib builds or renders a figure
+    executor: ThreadPoolExecutor
+        the render threads of the current process
+    pid: int
+        the process that started the render threads, forked workers start their own
+
+    Methods:
+    --------
+    acquire(key, build):
+        Returns an idle template of a layout, building a new one if there is none
+    submit(plot, path):
+        Writes a template to a PNG file on a render thread
+    flush():
+        Waits until all submitted PNG files are written
+    close():
+        Waits for the PNG files and stops the render threads
+    """
+
+
+    def __init__(self, workers=RENDER_WORKERS, pool_size=POOL_SIZE, decimation=DECIMATION, points_per_pixel=POINTS_PER_PIXEL):
+        """
+        Constructor for the PlotRenderer class
+
+            Parameters
+            -----------
+                workers: int
+                    the number of render threads
+                pool_size: int
+                    the number of idle figures kept per layout
+                decimation: str
+                    the decimation method of the templates, "minmax", "lttb" or "none"
+                points_per_pixel: int
+                    the points kept per pixel column of an axes
+
+            Returns
+            -------
+                None
+        """
+        self.workers = workers
+        self.pool_size = pool_size
+        self.decimation = decimation
+        self.points_per_pixel = points_per_pixel
+        self.idle = {}
+        self.pending = []
+        self.lock = threading.Lock()
+        self.drawing = threading.Lock()
+        self.executor = None
+        self.pid = None
+
+
+    def acquire(self, key, build):
+        """
+        Returns an idle template of a layout, building a new one if there is none.
+
+            Parameters
+            -----------
+                key: tuple
+                    the layout of the figure
+                build: function
+                    called with a new Figure, creates its axes and lines and returns (axes list, lines dict)
+
+            Returns
+            -------
+                PlotTemplate: the template, owned by the caller until it is submitted
+        """
+        self.check_process()
+        with self.lock:
+            idle = self.idle.get(key)
+            if idle:
+                return idle.pop()
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        with self.drawing:
+            fig = Figure()
+            FigureCanvasAgg(fig)
+            axes, lines = build(fig)
+        return PlotTemplate(key, fig, axes, lines, self.decimation, self.points_per_pixel)
+
+
+    def check_process(self):
+        """
+        Helper: A forked worker inherits the render state of its parent but not its threads, start over.
+        """
+        if self.pid != os.getpid():
+            self.lock = threading.Lock()
+            self.drawing = threading.Lock()
+            self.executor = None
+            self.pending = []
+            self.pid = os.getpid()
+
+
+    def release(self, plot):
+        """
+        Helper: Puts a rendered template back into the pool, or drops it if the pool of its layout is full.
+        """
+        plot.reset()
+        with self.lock:
+            idle = self.idle.setdefault(plot.key, [])
+            if len(idle) < self.pool_size:
+                idle.append(plot)
+
+
+    def render(self, plot, path):
+        """
+        Helper: Lays out a template and writes it to a PNG file, runs on a render thread.
+        """
+        try:
+            with self.drawing:
+                plot.fig.tight_layout()
+                plot.fig.savefig(path)
+        finally:
+            self.release(plot)
+
+
+    def submit(self, plot, path):
+        """
+        Writes a template to a PNG file on a render thread. The caller must not touch the template afterwards.
+
+            Parameters
+            -----------
+                plot: PlotTemplate
+                    the template with its new data
+                path: str
+                    the path of the PNG file
+
+            Returns
+            -------
+                None
+        """
+        self.check_process()
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="render")
+        future = self.executor.submit(self.render, plot, path)
+        with self.lock:
+            self.pending.append(future)
+
+
+    def flush(self):
+        """
+        Waits until all submitted PNG files are written. Raises the first error of a render thread.
+
+            Parameters
+            -----------
+                None
+
+            Returns
+            -------
+                None
+        """
+        self.check_process()
+        with self.lock:
+            pending, self.pending = self.pending, []
+        errors = [future.exception() for future in pending]
+        for error in errors:
+            if error is not None:
+                raise error
+
+
+    def close(self):
+        """
+        Waits for the PNG files and stops the render threads.
+
+            Parameters
+            -----------
+                None
+
+            Returns
+            -------
+                None
+        """
+        try:
+            self.flush()
+        finally:
+            if self.executor is not None and self.pid == os.getpid():
+                self.executor.shutdown()
+            self.executor = None
+
+
+def empty_figure(title, xlabel, ylabel):
+    """
+    Returns the build function of a figure without axes, used when a log has no data to plot.
+
+        Parameters
+        ----------
+            title: str
+                the title of the figure
+            xlabel: str
+                the label below the figure
+            ylabel: str
+                the label left of the figure
+
+        Returns
+        -------
+            function: the build function for PlotRenderer.acquire()
+    """
+    def build(fig):
+        fig.suptitle(title)
+        fig.set_size_inches(8, 8)
+        fig.supxlabel(xlabel)
+        fig.supylabel(ylabel)
+        return [], {}
+    return build
+
+
+# Renderer shared by all runners in this process
+_renderer = PlotRenderer()
+
+
+def get_renderer():
+    """
+    Returns the plot renderer of this process.
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            PlotRenderer: the renderer
+    """
+    return _renderer
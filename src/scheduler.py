@@ -0,0 +1,163 @@
+import os
+import sys
+import timeit
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from src.Machines.registry import RUNNERS, get_runner
+
+
+# Start method of the worker processes. The main process runs the upload thread, a forked worker could
+# inherit a lock (stdout, SQLite) that thread held at the time, forkserver starts the workers from a clean process
+START_METHOD = "forkserver"
+
+
+def run_machine(machine):
+    """
+    Worker entry point, runs the algorithms for a single registered machine.
+
+        Parameters
+        ----------
+            machine: tuple
+                the register entry of the machine
+
+        Returns
+        -------
+            float: the wall time of the machine in seconds
+    """
+    start = timeit.default_timer()
+    try:
+        runner = get_runner(machine[0])()
+        runner.process(machine, runner.is_raw(machine))
+    finally:
+        # Workers are reused between cycles, so free the figures of this machine
+        if "matplotlib.pyplot" in sys.modules:
+            sys.modules["matplotlib.pyplot"].close("all")
+    return timeit.default_timer() - start
+
+
+class Scheduler:
+    """
+    Scheduler processes independent machines concurrently on a bounded pool of worker processes
+
+    Attributes:
+    -----------
+    workers: int
+        the maximum number of machines processed at the same time
+    pool: ProcessPoolExecutor
+        the worker processes, kept alive between cycles and started with START_METHOD
+
+    Methods:
+    --------
+    jobs(register):
+        Returns the register entries that can be scheduled, one per data folder
+    run(register):
+        Processes every machine in the register and waits for all of them to finish
+    close():
+        Shuts down the worker processes
+    """
+
+
+    def __init__(self, workers=None):
+        """
+        Constructor for the Scheduler class
+
+            Parameters
+            -----------
+                workers: int
+                    the maximum number of machines processed at the same time,
+                    defaults to the number of CPUs (at most 4)
+
+            Returns
+            -------
+                None
+        """
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self.pool = None
+
+
+    def jobs(self, register):
+        """
+        Returns the register entries that can be scheduled.
+        Each data folder (machine type and name) is only scheduled once per cycle so that its
+        state files (metadata.txt, base pressure history, Output folders) are only used by one worker.
+
+            Parameters
+            -----------
+                register: list
+                    the parsed register entries
+
+            Returns
+            -------
+                list: the register entries to process
+        """
+        jobs = []
+        seen = set()
+        for machine in register:
+            if machine[0] not in RUNNERS:
+                print(f"[WARNING]: No runner registered for machine type {machine[0]}, skipping {machine[1]}")
+                continue
+            if (machine[0], machine[1]) in seen:
+                continue
+            seen.add((machine[0], machine[1]))
+            jobs.append(machine)
+        return jobs
+
+
+    def run(self, register):
+        """
+        Processes every machine in the register on the worker pool and waits for all of them to finish.
+        A failing machine is logged and does not stop the others.
+
+            Parameters
+            -----------
+                register: list
+                    the parsed register entries
+
+            Returns
+            -------
+                dict: the wall time in seconds of each machine, keyed by "<type> <name>"
+        """
+        if self.pool is None:
+            method = START_METHOD if START_METHOD in multiprocessing.get_all_start_methods() else "spawn"
+            context = multiprocessing.get_context(method)
+            if method == "forkserver":
+                # The server imports the runners once, every worker forked from it starts with them loaded
+                context.set_forkserver_preload(["src.scheduler"])
+            self.pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+        futures = {self.pool.submit(run_machine, machine): machine for machine in self.jobs(register)}
+        timings = {}
+        broken = False
+        for future in as_completed(futures):
+            machine = futures[future]
+            try:
+                timings[f"{machine[0]} {machine[1]}"] = future.result()
+            except BrokenProcessPool as e:
+                broken = True
+                print(f"[WARNING]: Worker died while processing {machine[0]} {machine[1]}: {e}")
+                logging.error(f"Worker died processing {machine[0]} {machine[1]}: {e}", exc_info=True)
+            except Exception as e:
+                print(f"[WARNING]: Processing failed for {machine[0]} {machine[1]}: {e}")
+                logging.error(f"Exception occured processing {machine[0]} {machine[1]}: {e}", exc_info=True)
+        # A dead worker breaks the whole pool, start a new one next cycle
+        if broken:
+            self.close()
+        return timings
+
+
+    def close(self):
+        """
+        Shuts down the worker processes
+
+            Parameters
+            -----------
+                None
+
+            Returns
+            -------
+                None
+        """
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
@@ -0,0 +1,212 @@
+import os
+from collections import deque
+
+
+class StabilityTracker:
+    """
+    StabilityTracker remembers the checksums of the last few cycles of a machine's data files
+
+    The history is a fixed size ring buffer held in memory. It is mirrored to a small snapshot file
+    (metadata.txt, one checksum per line, oldest first) that never grows past channels * cycles lines,
+    so it survives restarts and can be picked up by whichever worker processes the machine next.
+
+    Attributes:
+    -----------
+    path: str
+        the path to the snapshot file
+    channels: int
+        the number of files checked per cycle (Fiji 3, MVD/Savannah 2, SmartCam 1)
+    history: deque
+        a tuple of checksums per cycle, at most cycles entries
+    stamp: tuple
+        (size, mtime_ns) of the snapshot file when it was last read or written by this tracker
+
+    Methods:
+    --------
+    record(checksums):
+        Adds a cycle and returns True if the last cycles all have the same checksums
+    count(channel, checksum):
+        Returns how often a checksum was seen for a channel in the remembered cycles
+    changed(checksum):
+        Single-file check that returns True once the checksum differs from the remembered one
+    clear():
+        Forgets the history
+    """
+
+
+    def __init__(self, path, channels, cycles):
+        """
+        Constructor for the StabilityTracker class
+
+            Parameters
+            -----------
+                path: str
+                    the path to the snapshot file
+                channels: int
+                    the number of files checked per cycle
+                cycles: int
+                    the number of cycles remembered
+
+            Returns
+            -------
+                None
+        """
+        self.path = path
+        self.channels = channels
+        self.history = deque(maxlen=cycles)
+        self.stamp = None
+
+
+    def _stat(self):
+        """
+        Helper: Returns the (size, mtime_ns) of the snapshot file, None if it does not exist.
+        """
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_size, stat.st_mtime_ns)
+
+
+    def _load(self):
+        """
+        Helper: Reloads the history if the snapshot file was changed by someone else.
+        Older, unbounded metadata.txt files use the same format, only their last cycles are kept.
+        """
+        stamp = self._stat()
+        if stamp == self.stamp:
+            return
+        self.history.clear()
+        if stamp is not None:
+            with open(self.path, "r") as file:
+                sums = file.read().split()
+            # Cycles are aligned from the end of the file, each cycle wrote one line per channel
+            start = len(sums) % self.channels
+            for i in range(start, len(sums), self.channels):
+                self.history.append(tuple(sums[i:i + self.channels]))
+        self.stamp = stamp
+
+
+    def _save(self):
+        """
+        Helper: Writes the history to the snapshot file.
+        """
+        with open(self.path, "w") as file:
+            for cycle in self.history:
+                for checksum in cycle:
+                    file.write(checksum + "\n")
+        self.stamp = self._stat()
+
+
+    def record(self, checksums):
+        """
+        Adds the checksums of this cycle and checks if the files stopped updating.
+        When they did, the history is cleared so the next file starts counting from zero.
+
+            Parameters
+            -----------
+                checksums: tuple
+                    one checksum per channel for this cycle
+
+            Returns
+            -------
+                bool: True if all remembered cycles (a full history) match this cycle, False otherwise
+        """
+        self._load()
+        checksums = tuple(checksums)
+        self.history.append(checksums)
+        stable = len(self.history) == self.history.maxlen and all(cycle == checksums for cycle in self.history)
+        if stable:
+            self.clear()
+        else:
+            self._save()
+        return stable
+
+
+    def count(self, channel, checksum):
+        """
+        Returns how often a checksum was seen for a channel in the remembered cycles.
+
+            Parameters
+            -----------
+                channel: int
+                    the index of the channel in the checksums tuple
+                checksum: str
+                    the checksum to count
+
+            Returns
+            -------
+                int: the number of remembered cycles with that checksum
+        """
+        self._load()
+        return sum(1 for cycle in self.history if cycle[channel] == checksum)
+
+
+    def changed(self, checksum):
+        """
+        Single-file check: remembers the first checksum it sees and reports once the file differs from it.
+
+            Parameters
+            -----------
+                checksum: str
+                    the checksum of the file this cycle
+
+            Returns
+            -------
+                None: if nothing was remembered yet (the checksum is remembered now)
+                False: if the checksum matches the remembered one
+                True: if the checksum differs, the history is cleared
+        """
+        self._load()
+        if not self.history:
+            self.history.append((checksum,))
+            self._save()
+            return None
+        if self.history[0][0] == checksum:
+            return False
+        self.clear()
+        return True
+
+
+    def clear(self):
+        """
+        Forgets the history and empties the snapshot file.
+
+            Parameters
+            -----------
+                None
+
+            Returns
+            -------
+                None
+        """
+        self.history.clear()
+        self._save()
+
+
+# Trackers of this process, one per snapshot file
+_trackers = {}
+
+
+def get_tracker(path, channels, cycles):
+    """
+    Returns the tracker for a snapshot file, creating it on first use.
+
+        Parameters
+        ----------
+            path: str
+                the path to the snapshot file (metadata.txt of the machine)
+            channels: int
+                the number of files checked per cycle
+            cycles: int
+                the number of cycles remembered
+
+        Returns
+        -------
+            StabilityTracker: the tracker of the snapshot file
+    """
+    tracker = _trackers.get(path)
+    if tracker is None or tracker.channels != channels or tracker.history.maxlen != cycles:
+        tracker = StabilityTracker(path, channels, cycles)
+        _trackers[path] = tracker
+    return tracker
@@ -0,0 +1,132 @@
+import os
+import shutil
+
+
+# Ways to place a file, in the order they are tried. A hard link and a reflink take no extra disk
+# space and no data is copied, copy_file_range and sendfile copy inside the kernel (and may reflink
+# on their own), the plain copy streams the file through Python
+METHODS = ("link", "reflink", "copy_file_range", "sendfile", "copy")
+# ioctl request of the Linux FICLONE reflink (btrfs, XFS, bcachefs, ...)
+FICLONE = 0x40049409
+# Bytes asked of copy_file_range and sendfile per call
+CHUNK_SIZE = 64 * 1024 * 1024
+
+
+def reflink(src, dst):
+    """
+    Clones a file with the FICLONE ioctl, the clone shares the data blocks of the source until one is written.
+
+        Parameters
+        ----------
+            src: str
+                the path to the file
+            dst: str
+                the path of the clone
+
+        Returns
+        -------
+            None
+    """
+    import fcntl
+    with open(src, "rb") as source, open(dst, "wb") as target:
+        fcntl.ioctl(target.fileno(), FICLONE, source.fileno())
+
+
+def copy_range(src, dst):
+    """
+    Copies a file with os.copy_file_range, the data never leaves the kernel.
+
+        Parameters
+        ----------
+            src: str
+                the path to the file
+            dst: str
+                the path of the copy
+
+        Returns
+        -------
+            None
+    """
+    with open(src, "rb") as source, open(dst, "wb") as target:
+        remaining = os.fstat(source.fileno()).st_size
+        while remaining > 0:
+            copied = os.copy_file_range(source.fileno(), target.fileno(), min(remaining, CHUNK_SIZE))
+            if copied == 0:
+                break
+            remaining -= copied
+
+
+def send(src, dst):
+    """
+    Copies a file with os.sendfile, the data never leaves the kernel.
+
+        Parameters
+        ----------
+            src: str
+                the path to the file
+            dst: str
+                the path of the copy
+
+        Returns
+        -------
+            None
+    """
+    with open(src, "rb") as source, open(dst, "wb") as target:
+        offset = 0
+        size = os.fstat(source.fileno()).st_size
+        while offset < size:
+            sent = os.sendfile(target.fileno(), source.fileno(), offset, min(size - offset, CHUNK_SIZE))
+            if sent == 0:
+                break
+            offset += sent
+
+
+def stage_file(src, dst, methods=METHODS):
+    """
+    Places a file at dst with the first of methods that works. A method that is not supported
+    (another filesystem for a link, no reflink support, an old kernel) falls through to the next one,
+    so the file is only copied through Python when nothing else works. The copies keep the
+    modification time and permissions of the source like shutil.copy2.
+
+        Parameters
+        ----------
+            src: str
+                the path to the file
+            dst: str
+                the path to place it at, replaced if it exists
+            methods: tuple
+                the methods to try, in order, out of METHODS. Leave out "link" when the source
+                is rewritten in place later on, a hard link would change along with it
+
+        Returns
+        -------
+            str: the method that placed the file
+    """
+    for method in methods:
+        if method not in METHODS:
+            print(f"[WARNING]: Unknown staging method {method}, expected one of {METHODS}")
+            raise ValueError(f"Unknown staging method: {method}")
+    if os.path.lexists(dst):
+        os.remove(dst)
+    for method in methods:
+        try:
+            if method == "link":
+                os.link(src, dst)
+                return method
+            if method == "reflink":
+                reflink(src, dst)
+            elif method == "copy_file_range":
+                copy_range(src, dst)
+            elif method == "sendfile":
+                send(src, dst)
+            else:
+                shutil.copyfile(src, dst)
+            shutil.copystat(src, dst)
+            return method
+        except (OSError, AttributeError):
+            # AttributeError: os.copy_file_range and os.sendfile are missing on some platforms
+            if method == methods[-1]:
+                raise
+            if method != "link" and os.path.lexists(dst):
+                os.remove(dst)
+    return None
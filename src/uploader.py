@@ -1,4 +1,45 @@
+import os
+import json
+import time
+import shutil
+import threading
 import subprocess
+from src.blob_store import get_blob_store, MANIFEST_NAME
+from src.staging import stage_file
+
+
+# Upload jobs waiting for the queue, relative to the repository root
+SPOOL_DIR = os.path.join("src", ".uploads")
+# Files rclone uploads at the same time
+TRANSFERS = 8
+# Files rclone checks against the remote at the same time
+CHECKERS = 16
+# Attempts per batch before its jobs are left in the spool for the next round
+RETRIES = 4
+# Seconds before the first retry, doubled after every failed attempt
+BACKOFF_SECONDS = 5
+# Seconds the queue waits for more jobs before it starts a batch
+BATCH_WAIT = 2
+# Seconds between two looks at the spool, jobs spooled by other processes are picked up then
+POLL_SECONDS = 10
+
+
+def remote_join(root, relative):
+    """
+    Returns the rclone path of a file under an rclone root.
+
+        Parameters
+        ----------
+            root: str
+                the rclone root, e.g. remote: or remote:Tool-Data
+            relative: str
+                the path of the file under root
+
+        Returns
+        -------
+            str: the rclone path of the file
+    """
+    return root + relative if root.endswith((":", "/")) else root + "/" + relative
 
 
 class Uploader:
@@ -77,6 +118,494 @@ class Uploader:
         return
 
 
+class UploadQueue:
+    """
+    UploadQueue uploads the new Output_Data folders of all machines in batches, in the background
+
+    The runners only spool a job (local folder, remote root, remote path) as a small JSON file, so
+    submitting works the same from worker processes and never waits for the network. The process
+    that started the queue uploads the spooled jobs on a background thread while the next machines
+    are processed: all jobs for one remote root are linked into one staging tree and sent with a
+    single "rclone copy --files-from" invocation, so rclone keeps one session and runs TRANSFERS
+    uploads in parallel instead of one rclone process per machine. Files whose contents were already
+    uploaded to the same root (see src/blob_store.py) are not sent again, the remote copies them into
+    the new run folder itself (server side), so every run folder is complete. A file that cannot be
+    copied on the remote (its first upload was moved or deleted there) is forgotten by the store and
+    uploaded again. Failed batches are retried with exponential backoff, jobs that still fail stay in
+    the spool for the next round.
+
+    Attributes:
+    -----------
+    spool: str
+        the folder holding the job files and the staging trees
+    transfers: int
+        files rclone uploads at the same time
+    checkers: int
+        files rclone checks at the same time
+    retries: int
+        attempts per batch
+    backoff: float
+        seconds before the first retry
+    thread: threading.Thread
+        the upload thread, None until start()
+    wake: threading.Event
+        set to look at the spool before POLL_SECONDS are over
+    stopping: bool
+        True once close() was called
+
+    Methods:
+    --------
+    submit(local_dir, root, remote_path, archived=None):
+        Spools a folder for upload
+    pending():
+        Returns the spooled jobs
+    upload_pending():
+        Uploads every spooled job, one batch per remote root
+    start():
+        Starts the upload thread of this process
+    notify():
+        Wakes the upload thread
+    close():
+        Uploads what is left and stops the upload thread
+    """
+
+
+    def __init__(self, spool=SPOOL_DIR, transfers=TRANSFERS, checkers=CHECKERS, retries=RETRIES, backoff=BACKOFF_SECONDS):
+        """
+        Constructor for the UploadQueue class
+
+            Parameters
+            -----------
+                spool: str
+                    the folder holding the job files and the staging trees
+                transfers: int
+                    files rclone uploads at the same time
+                checkers: int
+                    files rclone checks at the same time
+                retries: int
+                    attempts per batch
+                backoff: float
+                    seconds before the first retry
+
+            Returns
+            -------
+                None
+        """
+        self.spool = spool
+        self.transfers = transfers
+        self.checkers = checkers
+        self.retries = retries
+        self.backoff = backoff
+        self.thread = None
+        self.pid = None
+        self.wake = threading.Event()
+        self.lock = threading.Lock()
+        self.stopping = False
+
+
+    def submit(self, local_dir, root, remote_path, archived=None):
+        """
+        Spools a folder for upload, the file is written under a temporary name and moved into place.
+
+            Parameters
+            -----------
+                local_dir: str
+                    the local folder to upload, e.g. data(<name>)/Output_Data/<dirname>
+                root: str
+                    the rclone root from rclone.txt, e.g. remote:Tool-Data
+                remote_path: str
+                    the folder under root the files go to, e.g. <type>/<name>/<dirname>
+                archived: list
+                    [bytes of the logs, bytes of the archive] if the folder holds a compressed archive of
+                    raw logs, used to report the upload time the compression saved
+
+            Returns
+            -------
+                None
+        """
+        os.makedirs(self.spool, exist_ok=True)
+        name = f"{time.time_ns()}-{os.getpid()}.json"
+        temp = os.path.join(self.spool, name + ".tmp")
+        with open(temp, "w") as file:
+            job = {"local": local_dir, "root": root, "remote": remote_path}
+            if archived is not None:
+                job["archived"] = list(archived)
+            json.dump(job, file)
+        os.replace(temp, os.path.join(self.spool, name))
+        self.notify()
+
+
+    def pending(self):
+        """
+        Returns the spooled jobs, oldest first.
+
+            Parameters
+            -----------
+                None
+
+            Returns
+            -------
+                list: (job file path, job dict) of every spooled job
+        """
+        try:
+            names = sorted(name for name in os.listdir(self.spool) if name.endswith(".json"))
+        except FileNotFoundError:
+            return []
+        jobs = []
+        for name in names:
+            path = os.path.join(self.spool, name)
+            try:
+                with open(path, "r") as file:
+                    jobs.append((path, json.load(file)))
+            except (OSError, ValueError) as e:
+                print(f"[WARNING]: Dropping unreadable upload job {path}: {e}")
+                os.remove(path)
+        return jobs
+
+
+    def stage(self, jobs, root, staging):
+        """
+        Links the files of a batch into one staging tree laid out like the remote, so a single
+        rclone invocation can copy them. Hard links cost no copy, files on another filesystem are
+        reflinked or copied in the kernel.
+        Files whose checksum (from the manifest.json of their folder) was already uploaded to root are
+        left out, they are copied on the remote from where their contents already are.
+
+            Parameters
+            -----------
+                jobs: list
+                    the job dicts of the batch
+                root: str
+                    the rclone root of the batch
+                staging: str
+                    the folder of the staging tree
+
+            Returns
+            -------
+                list: the paths of the staged files, relative to staging
+                int: the bytes staged
+                dict: per checksum of a staged file, its path relative to root
+                list: (path of the contents on the remote, path of the left out file, checksum) of every
+                      left out file, relative to root
+                int: the bytes left out
+        """
+        store = get_blob_store()
+        files = []
+        size = 0
+        uploads = {}
+        copies = []
+        copiedSize = 0
+        for job in jobs:
+            if not os.path.isdir(job["local"]):
+                print(f"[WARNING]: Upload folder {job['local']} does not exist, skipping it")
+                continue
+            digests = store.read_manifest(job["local"])
+            manifest = {}
+            for dirpath, dirnames, filenames in os.walk(job["local"]):
+                for filename in filenames:
+                    src = os.path.join(dirpath, filename)
+                    name = os.path.relpath(src, job["local"])
+                    if name == MANIFEST_NAME:
+                        continue
+                    relative = os.path.join(job["remote"], name)
+                    digest = digests.get(name)
+                    if digest is not None:
+                        remote = uploads.get(digest) or store.remote_path(root, digest)
+                        if remote is not None:
+                            # Same contents as a file that is (or is about to be) on the remote, copied there after the upload
+                            manifest[name] = {"digest": digest, "remote": relative}
+                            copies.append((remote, relative, digest))
+                            copiedSize += os.path.getsize(src)
+                            continue
+                        uploads[digest] = relative
+                        manifest[name] = {"digest": digest, "remote": relative}
+                    dst = os.path.join(staging, relative)
+                    os.makedirs(os.path.dirname(dst), exist_ok=True)
+                    stage_file(src, dst)
+                    files.append(relative)
+                    size += os.path.getsize(src)
+            if digests:
+                relative = os.path.join(job["remote"], MANIFEST_NAME)
+                os.makedirs(os.path.join(staging, job["remote"]), exist_ok=True)
+                with open(os.path.join(staging, relative), "w") as file:
+                    json.dump({"files": manifest}, file, indent=1, sort_keys=True)
+                files.append(relative)
+        return files, size, uploads, copies, copiedSize
+
+
+    def rclone(self, staging, root, list_path):
+        """
+        Runs one rclone copy of a staging tree.
+
+            Parameters
+            -----------
+                staging: str
+                    the folder of the staging tree
+                root: str
+                    the rclone root
+                list_path: str
+                    the file listing the staged files, one per line
+
+            Returns
+            -------
+                bool: True if rclone succeeded
+        """
+        return self.run_rclone(["rclone", "copy", staging, root, "--files-from", list_path, "--no-traverse",
+                                "--transfers", str(self.transfers), "--checkers", str(self.checkers), "--stats-log-level", "NOTICE"])
+
+
+    def server_copy(self, root, copies, list_path):
+        """
+        Copies files that are already on the remote to their place in the new run folders, the data
+        stays on the remote side (a server side copy where the remote supports it, e.g. Google Drive).
+        Files that keep their name are copied with one rclone copy per pair of folders, the others with rclone copyto.
+
+            Parameters
+            -----------
+                root: str
+                    the rclone root
+                copies: list
+                    (path of the contents, path of the copy, checksum) of every file, relative to root
+                list_path: str
+                    a file to list the names of a pair of folders in
+
+            Returns
+            -------
+                list: the copies that failed, empty if every copy succeeded
+        """
+        failed = []
+        folders = {}
+        for copy in copies:
+            source, target, digest = copy
+            if os.path.basename(source) == os.path.basename(target):
+                folders.setdefault((os.path.dirname(source), os.path.dirname(target)), []).append(copy)
+            elif not self.run_rclone(["rclone", "copyto", remote_join(root, source), remote_join(root, target)]):
+                failed.append(copy)
+        for (source, target), group in folders.items():
+            with open(list_path, "w") as file:
+                file.write("".join(os.path.basename(copy[0]) + "\n" for copy in group))
+            if not self.run_rclone(["rclone", "copy", remote_join(root, source), remote_join(root, target),
+                                    "--files-from", list_path, "--no-traverse", "--checkers", str(self.checkers)]):
+                failed.extend(group)
+        return failed
+
+
+    def run_rclone(self, command):
+        """
+        Helper: Runs an rclone command, returns True if it succeeded.
+        """
+        try:
+            result = subprocess.run(command, capture_output=True, text=True)
+        except OSError as e:
+            print(f"[WARNING]: Could not start rclone: {e}")
+            return False
+        if result.returncode != 0:
+            print(f"[WARNING]: rclone exited with {result.returncode}: {result.stderr.strip()}")
+            return False
+        return True
+
+
+    def upload_batch(self, root, batch):
+        """
+        Uploads the jobs of one remote root with one rclone invocation, retried with exponential backoff.
+
+            Parameters
+            -----------
+                root: str
+                    the rclone root of the jobs
+                batch: list
+                    (job file path, job dict) of every job of the batch
+
+            Returns
+            -------
+                bool: True if the batch was uploaded and its jobs removed from the spool
+        """
+        store = get_blob_store()
+        staging = os.path.join(self.spool, f"batch-{time.time_ns()}")
+        list_path = staging + ".files"
+        try:
+            files = None
+            for attempt in range(self.retries):
+                if files is None:
+                    shutil.rmtree(staging, ignore_errors=True)
+                    files, size, uploads, copies, copiedSize = self.stage([job for path, job in batch], root, staging)
+                    with open(list_path, "w") as file:
+                        file.write("".join(relative + "\n" for relative in files))
+                start = time.monotonic()
+                # The copies come second, some of them copy files this batch uploads
+                if not files or self.rclone(staging, root, list_path):
+                    failed = self.server_copy(root, copies, staging + ".copies") if copies else []
+                    if not failed:
+                        break
+                    # Copies of an earlier upload that is no longer on the remote, forget it and upload the files again
+                    gone = {digest for source, target, digest in failed if uploads.get(digest) != source}
+                    if gone:
+                        print(f"[WARNING]: {len(gone)} files are no longer where they were uploaded to {root}, uploading them again")
+                        store.forget(root, gone)
+                        files = None
+                        continue
+                if attempt + 1 < self.retries:
+                    delay = self.backoff * 2 ** attempt
+                    print(f"[WARNING]: Upload to {root} failed, retrying in {delay}s ({attempt + 1}/{self.retries})")
+                    time.sleep(delay)
+            else:
+                print(f"[WARNING]: Upload to {root} failed {self.retries} times, {len(batch)} folders stay queued")
+                return False
+            elapsed = time.monotonic() - start
+            store.record(root, uploads)
+            for path, job in batch:
+                os.remove(path)
+            if files:
+                rate = size / (1024 * 1024) / max(elapsed, 1e-6)
+                print(f"[NOTICE]: Uploaded {len(batch)} folders ({len(files)} files, {size / (1024 * 1024):.1f} MiB) "
+                      f"to {root} in {elapsed:.1f}s, {rate:.2f} MiB/s, "
+                      f"{len(copies)} unchanged files ({copiedSize / (1024 * 1024):.1f} MiB) copied on the remote")
+                archived = [job["archived"] for path, job in batch if "archived" in job]
+                original = sum(sizes[0] for sizes in archived)
+                compressed = sum(sizes[1] for sizes in archived)
+                if original > compressed:
+                    # The logs would have gone up at the same rate without the compression
+                    print(f"[NOTICE]: Compressing the raw logs saved {(original - compressed) / (1024 * 1024):.1f} MiB "
+                          f"({original / max(compressed, 1):.1f}x), about {(original - compressed) / (1024 * 1024) / rate:.1f}s of upload")
+            return True
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+            for path in (staging + ".files", staging + ".copies"):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+
+    def upload_pending(self):
+        """
+        Uploads every spooled job, one batch per remote root.
+
+            Parameters
+            -----------
+                None
+
+            Returns
+            -------
+                bool: True if nothing is left in the spool
+        """
+        with self.lock:
+            batches = {}
+            for path, job in self.pending():
+                batches.setdefault(job["root"], []).append((path, job))
+            done = True
+            for root, batch in batches.items():
+                done = self.upload_batch(root, batch) and done
+            return done
+
+
+    def loop(self):
+        """
+        Body of the upload thread: waits for jobs, lets a batch fill up and uploads it.
+
+            Parameters
+            -----------
+                None
+
+            Returns
+            -------
+                None
+        """
+        while True:
+            self.wake.wait(POLL_SECONDS)
+            self.wake.clear()
+            if self.stopping:
+                break
+            if not self.pending():
+                continue
+            # Machines finishing at about the same time go into the same batch
+            time.sleep(BATCH_WAIT)
+            try:
+                self.upload_pending()
+            except Exception as e:
+                print(f"[WARNING]: Upload queue failed: {e}")
+        self.upload_pending()
+
+
+    def start(self):
+        """
+        Starts the upload thread of this process, if it is not running yet.
+
+            Parameters
+            -----------
+                None
+
+            Returns
+            -------
+                None
+        """
+        if self.thread is not None and self.thread.is_alive() and self.pid == os.getpid():
+            return
+        self.stopping = False
+        self.pid = os.getpid()
+        self.thread = threading.Thread(target=self.loop, name="upload-queue", daemon=True)
+        self.thread.start()
+
+
+    def notify(self):
+        """
+        Wakes the upload thread, jobs are then picked up without waiting for the next poll.
+
+            Parameters
+            -----------
+                None
+
+            Returns
+            -------
+                None
+        """
+        self.wake.set()
+
+
+    def close(self):
+        """
+        Uploads the jobs that are left and stops the upload thread. Without a running thread
+        (e.g. a runner started on its own) the jobs are uploaded right here.
+
+            Parameters
+            -----------
+                None
+
+            Returns
+            -------
+                None
+        """
+        if self.thread is None or self.pid != os.getpid():
+            self.upload_pending()
+            return
+        self.stopping = True
+        self.wake.set()
+        self.thread.join()
+        self.thread = None
+
+
+# Upload queue of this process
+_queue = None
+
+
+def get_upload_queue():
+    """
+    Returns the upload queue of this process, creating it on first use.
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            UploadQueue: the upload queue
+    """
+    global _queue
+    if _queue is None:
+        _queue = UploadQueue()
+    return _queue
+
+
 def main():
     up = Uploader("src/Machines/Savannah/data/Output_Text", "SNF-Root-Test:Home")
     up.rclone()
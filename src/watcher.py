@@ -0,0 +1,161 @@
+import os
+import time
+from src.Machines.registry import read_register
+
+
+# Directories inside data(<name>) that ansible copies machine logs into
+WATCHED_DIRS = ["Pressure-Data", "Heating-Data", "Plasma-Data"]
+
+
+class DataWatcher:
+    """
+    DataWatcher polls the data folders of all registered machines and reports which ones need processing
+
+    A data folder is due once its files have stopped changing for the debounce time.
+    It then stays due for settle_cycles polls, because has_stopped_updating() in the runners
+    needs that many unchanged checksums in a row before it processes a file.
+    With a live_interval, a folder whose files keep changing is also due once per live_interval,
+    so the runners can refresh the live reports of the runs in progress (see src/live.py).
+
+    Attributes:
+    -----------
+    interval: float
+        seconds to sleep between polls when nothing is due (idle interval)
+    debounce: float
+        seconds a folder has to be quiet after a change before it is due
+    settle_cycles: int
+        number of polls a quiet folder stays due
+    live_interval: float
+        seconds between two dispatches of a folder whose files are still changing, None to wait until they settle
+    register_path: str
+        the path to the register.txt file
+    state: dict
+        per data folder: [signature, time of last change, remaining due polls, time of last live dispatch]
+
+    Methods:
+    --------
+    data_path(machine):
+        Returns the data folder of a register entry
+    signature(dataPath):
+        Returns a cheap fingerprint of the files in the watched directories
+    poll():
+        Returns the register entries whose data folders are due
+    """
+
+
+    def __init__(self, interval=30, debounce=10, settle_cycles=3, register_path=os.path.join("src", "register.txt"),
+                 live_interval=None):
+        """
+        Constructor for the DataWatcher class
+
+            Parameters
+            -----------
+                interval: float
+                    seconds to sleep between polls when nothing is due
+                debounce: float
+                    seconds a folder has to be quiet after a change before it is due
+                settle_cycles: int
+                    number of polls a quiet folder stays due, matches max_no_change_cycles of the runners
+                register_path: str
+                    the path to the register.txt file
+                live_interval: float
+                    seconds between two dispatches of a folder whose files are still changing,
+                    None to only dispatch folders that settled
+
+            Returns
+            -------
+                None
+        """
+        self.interval = interval
+        self.debounce = debounce
+        self.settle_cycles = settle_cycles
+        self.register_path = register_path
+        self.live_interval = live_interval
+        self.state = {}
+
+
+    def data_path(self, machine):
+        """
+        Returns the data folder of a register entry
+
+            Parameters
+            -----------
+                machine: tuple
+                    the register entry of the machine
+
+            Returns
+            -------
+                str: the path to the data folder of the machine
+        """
+        return os.path.join("src", "Machines", machine[0], f"data({machine[1]})")
+
+
+    def signature(self, dataPath):
+        """
+        Returns a fingerprint of the files in the watched directories of a data folder.
+        Only uses the directory listing and stat data, no file contents are read.
+
+            Parameters
+            -----------
+                dataPath: str
+                    the path to the data folder of the machine
+
+            Returns
+            -------
+                tuple: (directory, file name, size, modification time) of every watched file
+        """
+        files = []
+        for folder in WATCHED_DIRS:
+            try:
+                with os.scandir(os.path.join(dataPath, folder)) as entries:
+                    for entry in entries:
+                        if entry.is_file():
+                            stat = entry.stat()
+                            files.append((folder, entry.name, stat.st_size, stat.st_mtime_ns))
+            except FileNotFoundError:
+                continue
+        return tuple(sorted(files))
+
+
+    def poll(self):
+        """
+        Checks every registered data folder once and returns the ones that are due.
+        A folder seen for the first time counts as changed, so files copied while the
+        collector was down still get processed.
+
+            Parameters
+            -----------
+                None
+
+            Returns
+            -------
+                list: the register entries whose data folders are due
+        """
+        now = time.monotonic()
+        due = []
+        seen = set()
+        for machine in read_register(self.register_path):
+            dataPath = self.data_path(machine)
+            if dataPath in seen:
+                continue
+            seen.add(dataPath)
+            signature = self.signature(dataPath)
+            state = self.state.get(dataPath)
+            if state is None or state[0] != signature:
+                # New or changed files, wait for them to settle
+                lastLive = float("-inf") if state is None else state[3]
+                self.state[dataPath] = [signature, now, self.settle_cycles, lastLive]
+                # Files that keep changing still get their live reports refreshed now and then
+                if state is not None and self.live_interval is not None and now - lastLive >= self.live_interval:
+                    self.state[dataPath][3] = now
+                    due.append(machine)
+                continue
+            if state[2] > 0 and now - state[1] >= self.debounce:
+                state[2] -= 1
+                due.append(machine)
+        # Forget folders that were removed from the register
+        for dataPath in list(self.state):
+            if dataPath not in seen:
+                del self.state[dataPath]
+        return due
+
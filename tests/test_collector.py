@@ -0,0 +1,80 @@
+import os
+import pytest
+from src.collector import Collector, Host, LocalSession
+from src.dir_index import DirectoryIndex
+
+
+def write(path, text, mtime):
+    """
+    Writes a file and sets its modification time.
+    """
+    with open(path, "w") as file:
+        file.write(text)
+    os.utime(path, (mtime, mtime))
+
+
+@pytest.fixture
+def tool(tmp_path):
+    """
+    Returns a local host whose data directory is tool/, collected into dest/.
+    """
+    src = tmp_path / "tool"
+    dest = tmp_path / "dest"
+    src.mkdir()
+    host = Host("host1", {"ansible_connection": "local", "directories": [{"src": str(src), "dest": str(dest)}]})
+    return host, host.directories[0], src, dest
+
+
+def test_fetch_takes_the_newest_file_and_skips_unchanged(tool):
+    host, directory, src, dest = tool
+    write(src / "old.txt", "1\n2\n", 1000)
+    write(src / "new.txt", "3\n4\n5\n", 2000)
+    collector = Collector()
+    assert collector.fetch(host, directory) == 6
+    assert os.listdir(dest) == ["new.txt"]
+    assert (dest / "new.txt").read_text() == "3\n4\n5\n"
+    # Same size and modification time as last cycle, nothing is downloaded
+    assert collector.fetch(host, directory) == 0
+
+
+def test_append_falls_back_to_a_full_fetch_when_the_log_was_rewritten(tool):
+    host, directory, src, dest = tool
+    write(src / "log.txt", "1\n2\n3\n", 1000)
+    collector = Collector(tail=True)
+    assert collector.fetch(host, directory) == 6
+    # Only appended to, the new lines are added to the local copy
+    write(src / "log.txt", "1\n2\n3\n4\n", 1100)
+    assert collector.fetch(host, directory) == 2
+    assert (dest / "log.txt").read_text() == "1\n2\n3\n4\n"
+    # Rewritten from the top, the overlap no longer matches and the log is fetched in full
+    write(src / "log.txt", "9\n8\n7\n6\n5\n", 1200)
+    assert collector.fetch(host, directory) == 10
+    assert (dest / "log.txt").read_text() == "9\n8\n7\n6\n5\n"
+
+
+def test_failed_download_leaves_no_partial_file(tool, monkeypatch):
+    host, directory, src, dest = tool
+    write(src / "first.txt", "1\n", 1000)
+    collector = Collector()
+    collector.fetch(host, directory)
+    write(src / "second.txt", "2\n", 2000)
+
+    def broken(self, remotepath, localpath):
+        with open(localpath, "w") as file:
+            file.write("half")
+        raise OSError("connection lost")
+
+    monkeypatch.setattr(LocalSession, "get", broken)
+    with pytest.raises(OSError):
+        collector.fetch(host, directory)
+    assert os.listdir(dest) == ["first.txt"]
+
+
+def test_newest_skips_hidden_and_temporary_files(tmp_path):
+    write(tmp_path / "run.txt", "1\n", 1000)
+    # Created after the data file, so they would be the newest entries
+    write(tmp_path / ".run2.txt.part", "2\n", 1000)
+    write(tmp_path / "run3.txt.tmp", "3\n", 1000)
+    index = DirectoryIndex()
+    assert index.newest(str(tmp_path)) == str(tmp_path / "run.txt")
+    assert index.names(str(tmp_path)) == ["run.txt"]
@@ -0,0 +1,57 @@
+import os
+import pytest
+from src.renderer import PlotRenderer
+import src.Machines.Fiji200.Heating as fiji200_heating
+import src.Machines.MVD.Heating as mvd_heating
+
+
+class RecordingRenderer(PlotRenderer):
+    """
+    Renderer that remembers the grid of the axes every PNG file was drawn on.
+    """
+
+    def __init__(self):
+        super().__init__(workers=1)
+        self.grids = {}
+
+    def render(self, plot, path):
+        if plot.axes:
+            self.grids[os.path.basename(path)] = plot.axes[0].get_subplotspec().get_geometry()[:2]
+        super().render(plot, path)
+
+
+def heating(module, folder, line):
+    """
+    Returns a Heating object of a machine module loaded from a small heating log.
+    """
+    os.makedirs(os.path.join(folder, "Output_Plots"))
+    path = os.path.join(folder, "heating.txt")
+    with open(path, "w") as file:
+        file.write("Heater Time Log\n")
+        for i in range(10):
+            file.write(f"{i}.0 {line} {100 - i} Test Recipe\n")
+    h = module.Heating(folder)
+    h.loadColumns(*h.parseLog(path))
+    h.numPrecursors = 5
+    return h
+
+
+@pytest.mark.parametrize("order", [("fiji", "mvd"), ("mvd", "fiji")])
+def test_precursor_templates_keep_their_layout(tmp_path, monkeypatch, order):
+    renderer = RecordingRenderer()
+    monkeypatch.setattr(fiji200_heating, "get_renderer", lambda: renderer)
+    monkeypatch.setattr(mvd_heating, "get_renderer", lambda: renderer)
+    machines = {
+        # 6 heaters, 5 precursors, apc and 3 more columns before the cycles
+        "fiji": heating(fiji200_heating, str(tmp_path / "fiji"), "1 2 3 4 5 6 7 8 9 10 11 12 13 14 15"),
+        # 5 heaters, 5 precursors, then the 1500 that ends them, mfc1 and 1 more column
+        "mvd": heating(mvd_heating, str(tmp_path / "mvd"), "1 2 3 4 5 6 7 8 9 10 1500.0 20.5 3.0"),
+    }
+    # Twice, the second round reuses the pooled templates of the first
+    for _ in range(2):
+        for name in order:
+            machines[name].plotHeating()
+            renderer.flush()
+            precursors = renderer.grids.pop("Precursor Heating Data.png")
+            assert precursors == ((3, 2) if name == "fiji" else (5, 1))
+    renderer.close()